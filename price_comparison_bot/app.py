@@ -1,10 +1,18 @@
 import streamlit as st
-import subprocess
-import sys
 import json
 import os
+import threading
 import pandas as pd
-import time
+
+from utils import exporter, matcher
+from utils.alerts import AlertEngine
+from utils.autocomplete import Autocomplete
+from utils.image_cache import ImageCache
+from utils.jobs import JobManager
+from utils.pricedb import PriceDB
+from utils.product import price_label
+from orchestrator.runner import SCRAPERS, run_orchestrator
+from orchestrator.warmer import CacheWarmer
 
 # Page Config
 st.set_page_config(page_title="Price Comparison Bot", layout="wide", page_icon="🤖")
@@ -104,6 +112,300 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# ========================
+# HELPERS
+# ========================
+SITE_STATUS_ICONS = {
+    "pending": "⏳",
+    "searching": "🔎",
+    "catalog": "⚡",
+    "details": "📄",
+    "done": "✅",
+    "empty": "➖",
+    "failed": "❌",
+}
+
+AVAILABILITY_LABELS = {
+    "in_stock": "✅ In stock",
+    "out_of_stock": "⛔ Out of stock",
+    "preorder": "🕒 Pre-order",
+}
+
+
+@st.cache_resource
+def get_job_manager():
+    """
+    One background search runner shared by every session and rerun.
+    """
+    return JobManager(run_orchestrator, sites=[s["name"] for s in SCRAPERS])
+
+
+@st.cache_resource
+def start_cache_warmer():
+    """
+    With WARM_CACHE=1, keeps trending queries warm in the background while
+    no search is running, so most searches are answered from fresh prices.
+    Price drops it records are checked against the watches like a search's.
+    """
+    if os.environ.get("WARM_CACHE", "0") != "1":
+        return None
+    jobs = get_job_manager()
+    warmer = CacheWarmer(busy=lambda: not jobs.idle, alert_engine=AlertEngine.load())
+    threading.Thread(target=warmer.run_forever, name="cache-warmer", daemon=True).start()
+    return warmer
+
+
+@st.fragment(run_every=1)
+def search_progress(job_id):
+    """
+    Polls the background search: real per-site status plus the best match of
+    every site that has finished. A full rerun renders the final results.
+    """
+    job = get_job_manager().snapshot(job_id)
+    if job is None or job.finished:
+        st.rerun()
+
+    label = "Waiting for the previous search..." if job.status == "queued" else "Searching stores..."
+    with st.status(label, expanded=True):
+        for site, status in job.sites.items():
+            st.write(f"{SITE_STATUS_ICONS.get(status, '🔎')} {site}: {status}")
+
+    for site, product in job.partial.items():
+        st.markdown(
+            f"<span class='site-badge'>{site}</span> {product.title} · "
+            f"<span class='price-tag'>{price_label(product.price_paise)}</span>",
+            unsafe_allow_html=True,
+        )
+
+
+@st.cache_resource
+def get_price_db():
+    return PriceDB()
+
+
+@st.cache_resource(ttl=3600)
+def get_autocomplete():
+    """
+    Prefix index over catalog products and past searches, rebuilt hourly.
+    """
+    return Autocomplete.build(get_price_db())
+
+
+def use_suggestion(suggestion, input_key):
+    # Runs before the rerun, so the search box can still be rewritten
+    st.session_state[input_key] = suggestion
+    st.session_state.suggestion_chosen = True
+
+
+def show_suggestions(query, input_key):
+    """
+    Canonical completions of the typed query as one-click searches.
+    st.text_input only reruns on Enter or when the box loses focus, so the
+    suggestions follow the submitted text, not every keystroke.
+    """
+    typed = matcher.product_key(matcher.canonical_query(query))
+    suggestions = [s for s in get_autocomplete().suggest(query, limit=5) if s != typed] if query else []
+    if not suggestions:
+        return
+    for column, suggestion in zip(st.columns(len(suggestions)), suggestions):
+        column.button(
+            suggestion,
+            key=f"suggest_{input_key}_{suggestion}",
+            on_click=use_suggestion,
+            args=(suggestion, input_key),
+            use_container_width=True,
+        )
+
+
+@st.cache_resource
+def get_image_cache():
+    return ImageCache()
+
+
+def fallback_images(data):
+    """
+    Image per canonical product (with and without storage), so a listing
+    missing its image borrows one from the same product on another site.
+    """
+    images = {}
+    for d in data:
+        image = d.get("image")
+        if image and image.startswith("http"):
+            key = matcher.product_key(d.get("title"))
+            images.setdefault(key, image)
+            images.setdefault(matcher.base_key(key), image)
+    return images
+
+
+@st.cache_data(max_entries=32)
+def load_results(query, run_id):
+    """
+    Comparison results of one finished search, read once per (query, run)
+    from that run's own export: reruns and widget interactions reuse the
+    parsed list, and another session's search cannot replace it.
+    """
+    json_path = os.path.join(exporter.run_dir(run_id), exporter.JSON_FILE)
+    if not os.path.exists(json_path):
+        return None
+    with open(json_path, "r", encoding="utf-8") as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            return []
+
+
+@st.cache_data(max_entries=32)
+def load_listings(query, run_id):
+    """
+    Every matched listing of one finished search as a DataFrame, with the
+    canonical variant and a normalized title column for filtering.
+    """
+    path = os.path.join(exporter.run_dir(run_id), exporter.LISTINGS_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        listings = pd.DataFrame(json.load(f))
+    if listings.empty:
+        return listings
+    listings["price"] = listings["price_paise"] / 100
+    listings["variant"] = listings["title"].map(matcher.product_key)
+    listings["search_text"] = listings["title"].map(matcher.normalize)
+    return listings
+
+
+@st.cache_data(max_entries=32)
+def load_variant_matrix(query, run_id):
+    """
+    Lowest price (₹) of every variant on every site among one search's
+    listings: rows are canonical product keys, columns are sites.
+    """
+    listings = load_listings(query, run_id)
+    if listings is None or listings.empty:
+        return None
+    return listings.pivot_table(index="variant", columns="site", values="price", aggfunc="min")
+
+
+def variant_view(query, run_id):
+    """
+    The search's variant matrix, each variant a one-click follow-up search.
+    Follow-ups are answered from the catalog this search just filled, with
+    no new scrape while its prices are fresh.
+    """
+    matrix = load_variant_matrix(query, run_id)
+    if matrix is None or len(matrix) < 2:
+        return
+    st.markdown("### 🧩 Variants")
+    st.dataframe(
+        matrix,
+        use_container_width=True,
+        column_config={site: st.column_config.NumberColumn(site, format="₹%.0f") for site in matrix.columns},
+    )
+    variants = [v for v in matrix.index if v != query]
+    columns = st.columns(min(len(variants), 4) or 1)
+    for i, variant in enumerate(variants):
+        columns[i % len(columns)].button(
+            variant,
+            key=f"variant_{run_id}_{variant}",
+            on_click=use_suggestion,
+            args=(variant, "search_bar_top"),
+            use_container_width=True,
+        )
+
+
+LISTING_SORTS = {
+    "Price: low to high": ("price", True),
+    "Price: high to low": ("price", False),
+    "Best match": ("match_score", False),
+    "Site": ("site", True),
+}
+PAGE_SIZES = [25, 50, 100]
+
+
+@st.fragment
+def listings_view(query, run_id):
+    """
+    All matched listings with server-side filtering, sorting and paging.
+    Only the visible page is sent to the grid, and filter changes rerun
+    this fragment alone.
+    """
+    listings = load_listings(query, run_id)
+    if listings is None or listings.empty:
+        st.info("No other listings matched this search.")
+        return
+
+    f1, f2, f3 = st.columns([2, 2, 1])
+    sites = f1.multiselect("Sites", sorted(listings["site"].unique()), key=f"listing_sites_{run_id}")
+    variants = f2.multiselect("Variants", sorted(listings["variant"].unique()), key=f"listing_variants_{run_id}")
+    sort = f3.selectbox("Sort by", list(LISTING_SORTS), key=f"listing_sort_{run_id}")
+    text = st.text_input("Filter titles", placeholder="e.g. 256gb blue", key=f"listing_text_{run_id}")
+
+    view = listings
+    if sites:
+        view = view[view["site"].isin(sites)]
+    if variants:
+        view = view[view["variant"].isin(variants)]
+    for token in matcher.normalize(text).split():
+        view = view[view["search_text"].str.contains(token, regex=False)]
+    column, ascending = LISTING_SORTS[sort]
+    view = view.sort_values(column, ascending=ascending, kind="stable", na_position="last")
+
+    p1, p2, p3 = st.columns([1, 1, 3])
+    page_size = p1.selectbox("Rows per page", PAGE_SIZES, key=f"listing_page_size_{run_id}")
+    pages = max(1, -(-len(view) // page_size))
+    page_key = f"listing_page_{run_id}"
+    # Narrower filters can leave the current page past the end
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+    page = p2.number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+    p3.caption(f"{len(view)} listings · page {page} of {pages}")
+
+    start = (page - 1) * page_size
+    st.dataframe(
+        view.iloc[start:start + page_size][["site", "title", "variant", "price", "match_score", "url"]],
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "price": st.column_config.NumberColumn("Price (₹)", format="%.2f"),
+            "match_score": st.column_config.NumberColumn("Match", format="%.0f"),
+            "url": st.column_config.LinkColumn("Link", display_text="View ↗"),
+        },
+    )
+
+
+@st.cache_data(max_entries=32)
+def load_export(fmt, query, run_id):
+    """
+    (bytes, filename, mime) of one export format for a finished search.
+    """
+    export = exporter.export_stream(fmt, output_dir=exporter.run_dir(run_id))
+    if export is None:
+        return None
+    stream, filename, mime = export
+    return stream.getvalue(), filename, mime
+
+
+@st.cache_data(max_entries=32, ttl=600)
+def load_price_trend(winners, run_id, days=365):
+    """
+    Per-site lowest price (₹) per bucket from the pre-computed rollups, for
+    each site's winning product: `winners` is ((site, product_key), ...), as
+    stored keys carry the storage the query may not name. Forward-filled
+    since a bucket is only written when a price changed (or once a day).
+    """
+    if not winners or not os.path.exists("data/prices.db"):
+        return None
+    db = get_price_db()
+    points = []
+    for site, key in winners:
+        chart = db.price_chart(key, days=days, per_site=True)
+        points += [p for p in chart["points"] if p["site"] == site]
+    if not points:
+        return None
+    trend = pd.DataFrame(points)
+    trend["bucket"] = pd.to_datetime(trend["bucket"])
+    return trend.pivot(index="bucket", columns="site", values="min_paise").ffill() / 100
+
+
 # ========================
 # HEADER & SEARCH
 # ========================
@@ -114,6 +416,8 @@ col1, col2, col3 = st.columns([1, 2, 1])
 if 'search_performed' not in st.session_state:
     st.session_state.search_performed = False
 
+start_cache_warmer()
+
 # ========================
 # LOGIC
 # ========================
@@ -122,6 +426,10 @@ if 'search_performed' not in st.session_state:
 if st.session_state.search_performed:
     st.markdown("<h2 style='text-align: center;'>🤖 Price Comparison Bot</h2>", unsafe_allow_html=True)
     query = st.text_input("", placeholder="Search for a product (e.g., iPhone 17)", key="search_bar_top")
+    # Enter only refreshes the suggestions; the button or a suggestion searches
+    show_suggestions(query, "search_bar_top")
+    search_pressed = st.button("🔍 Search", key="search_button_top", use_container_width=True)
+    search_pressed = search_pressed or st.session_state.pop("suggestion_chosen", False)
 else:
     # Hero Section for Empty State
     st.markdown("""
@@ -133,56 +441,49 @@ else:
     
     c1, c2, c3 = st.columns([1,2,1])
     with c2:
-        query = st.text_input("Product Name", placeholder="e.g. iPhone 17 Pro", label_visibility="collapsed")
+        query = st.text_input("Product Name", placeholder="e.g. iPhone 17 Pro", label_visibility="collapsed", key="search_bar_hero")
+        show_suggestions(query, "search_bar_hero")
         search_pressed = st.button("🔍 Find Best Price", use_container_width=True, type="primary")
+        search_pressed = search_pressed or st.session_state.pop("suggestion_chosen", False)
 
 # Interaction Handler
-if query and (st.session_state.search_performed or (not st.session_state.search_performed and 'search_pressed' in locals() and search_pressed)):
-    
+if query and search_pressed:
+    if not st.session_state.search_performed:
+        # The top bar replaces the hero box from the next rerun on
+        st.session_state.search_bar_top = query
     st.session_state.search_performed = True
-    
-    # Progress UI
-    progress_col1, progress_col2 = st.columns([1, 10])
-    with progress_col1:
-        spinner = st.spinner("")
-    with progress_col2:
-        status_text = st.empty()
-        
-    status_text.markdown("#### 🚀 Scouring the web for the best deals...")
-    
-    # Run Orchestrator
-    cmd = [sys.executable, "orchestrator/runner.py", query]
-    
-    # Run script
-    # We use a placeholder to simulate "working" UI since subprocess blocks
+
+    # A new search once the shown one has finished (refreshing its prices);
+    # while it runs, the same query under any spelling only polls it
+    jobs = get_job_manager()
+    current = jobs.snapshot(st.session_state.get("job_id"))
+    if current is None or current.finished or current.key != matcher.query_key(query):
+        job = jobs.submit(query)
+        st.session_state.job_id = job.id
+        st.session_state.job_text = job.query
+
+# Widget interactions rerun the script; they keep showing the current job
+if st.session_state.get("job_id"):
+    jobs = get_job_manager()
+    job = jobs.snapshot(st.session_state.job_id)
+    # The job's query text (its first spelling); caches below key on the run
+    query = st.session_state.job_text
+
     try:
-        with st.status("Searching stores...", expanded=True) as status:
-            st.write("🔎 Connecting to Amazon...")
-            time.sleep(0.5)
-            st.write("🔎 Pinging Flipkart...")
-            time.sleep(0.5)
-            st.write("🔎 Checking Reliance & Croma...")
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, cwd=os.getcwd())
-            
-            if result.returncode != 0:
-                status.update(label="❌ Failed to fetch prices", state="error")
-                st.error("Orchestration failed.")
-                with st.expander("Error Log"):
-                    st.code(result.stderr)
-            else:
-                status.update(label="✅ Search Complete!", state="complete")
-        
-        # Load Results
-        json_path = "data/combined_results.json"
-        
-        if os.path.exists(json_path):
-            with open(json_path, "r", encoding="utf-8") as f:
-                try:
-                    data = json.load(f)
-                except json.JSONDecodeError:
-                    data = []
-            
+        if job is not None and not job.finished:
+            search_progress(job.id)
+            st.stop()
+
+        if job is not None and job.status == "failed":
+            st.error("Orchestration failed.")
+            with st.expander("Error Log"):
+                st.code(job.error)
+
+        # Load Results (cached per query and run)
+        run_id = st.session_state.job_id
+        data = load_results(query, run_id)
+
+        if data is not None:
             if not data:
                 st.warning("⚠️ No matching products found. Try a more specific keyword.")
                 # Show trending/examples if empty
@@ -190,13 +491,13 @@ if query and (st.session_state.search_performed or (not st.session_state.search_
                 st.markdown("### 🏷️ Comparison Results")
                 st.write("")
                 
-                # Find a fallback image from any result that has one
-                fallback_image = None
-                for d in data:
-                    if d.get("image") and d.get("image").startswith("http"):
-                        fallback_image = d.get("image")
-                        break
-                
+                # Fallback images come from the same canonical product only
+                fallbacks = fallback_images(data)
+
+                # Card thumbnails are fetched and downsized once into the local
+                # cache, concurrently, then served from disk
+                local_images = get_image_cache().prefetch(d.get("image") for d in data)
+
                 # LIST VIEW LAYOUT
                 for item in data:
                     is_recommended = item.get("recommended", False)
@@ -212,11 +513,12 @@ if query and (st.session_state.search_performed or (not st.session_state.search_
                         with c_img:
                             img_url = item.get("image")
                             # Use fallback if current image is missing/invalid
-                            if not (img_url and img_url.startswith("http")) and fallback_image:
-                                img_url = fallback_image
+                            if not (img_url and img_url.startswith("http")):
+                                key = matcher.product_key(item.get("title"))
+                                img_url = fallbacks.get(key) or fallbacks.get(matcher.base_key(key))
                             
                             if img_url and img_url.startswith("http"):
-                                st.image(img_url, use_container_width=True)
+                                st.image(local_images.get(img_url) or img_url, use_container_width=True)
                             else:
                                 st.markdown("🖼️ No Image")
                         
@@ -231,22 +533,44 @@ if query and (st.session_state.search_performed or (not st.session_state.search_
                         
                         # --- Price Column ---
                         with c_price:
-                            price = item.get("price")
-                            st.markdown(f"<div class='price-tag'>₹{price}</div>", unsafe_allow_html=True)
+                            st.markdown(f"<div class='price-tag'>{price_label(item.get('price_paise'))}</div>", unsafe_allow_html=True)
+                            mrp = item.get("mrp_paise")
+                            if mrp and item.get("price_paise") and mrp > item["price_paise"]:
+                                off = round(100 * (mrp - item["price_paise"]) / mrp)
+                                st.markdown(f"<s>₹{mrp / 100:,.0f}</s> · {off}% off", unsafe_allow_html=True)
+                            if item.get("availability"):
+                                st.caption(AVAILABILITY_LABELS.get(item["availability"], item["availability"]))
                             st.link_button("View Deal ↗", item.get("url"), type="primary" if is_recommended else "secondary", use_container_width=True)
                         
                         st.divider()
 
-                # Downloads Section
+                # Variant x site prices from the same search
+                variant_view(query, run_id)
+
+                # Every matched listing (variants, storage sizes, sites), paged
+                st.markdown("### 📋 All Listings")
+                listings_view(query, run_id)
+
+                # Price Trend (rollup query, no raw observation scan)
+                winners = tuple(sorted({(d.get("site"), matcher.product_key(d.get("title"))) for d in data}))
+                trend = load_price_trend(winners, run_id)
+                if trend is not None:
+                    st.markdown("### 📈 Price Trend")
+                    st.line_chart(trend)
+
+                # Downloads Section (rendered in memory, cached per query and run)
                 st.markdown("### 📥 Export Data")
                 dl1, dl2, dl3 = st.columns(3)
                 
-                with open("data/combined_results.json", "rb") as f:
-                    dl1.download_button("📄 Download JSON", f, "results.json", "application/json", use_container_width=True)
-                    
-                if os.path.exists("data/results.csv"):
-                    with open("data/results.csv", "rb") as f:
-                        dl2.download_button("📊 Download CSV", f, "results.csv", "text/csv", use_container_width=True)
+                for column, fmt, label in [
+                    (dl1, "json", "📄 Download JSON"),
+                    (dl2, "csv", "📊 Download CSV"),
+                    (dl3, "xlsx", "📗 Download Excel"),
+                ]:
+                    export = load_export(fmt, query, run_id)
+                    if export:
+                        content, filename, mime = export
+                        column.download_button(label, content, filename, mime, use_container_width=True)
                         
     except Exception as e:
         st.error(f"Critical Error: {e}")
@@ -0,0 +1,138 @@
+import sys
+import os
+import importlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Ensure we can import from utils / scrapers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.pricedb import PriceDB, listing_key
+from orchestrator.scheduler import SITE_CLIENTS, SITE_LIMITS, SiteLimiter
+
+log = logging.getLogger("Crawler")
+
+CATEGORIES_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "categories.json"
+)
+CHECKPOINT_PATH = os.path.join("data", "crawl_state.json")
+
+# A finished category is walked again once its last crawl is this old
+RECRAWL_SECONDS = 86400
+
+
+def load_categories(path=CATEGORIES_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class CategoryCrawler:
+    """
+    Walks category result pages on every site and stores each listing in the
+    local catalog (price database). Sites are crawled in parallel, each one
+    page at a time within its SiteLimiter; progress is checkpointed after
+    every page so an interrupted crawl resumes where it stopped.
+    """
+
+    def __init__(self, db=None, categories=None, sites=None, checkpoint_path=CHECKPOINT_PATH):
+        self.db = db or PriceDB()
+        self.categories = categories or load_categories()
+        self.sites = list(sites or SITE_CLIENTS)
+        self.checkpoint_path = checkpoint_path
+        self.state = self._load_state()
+        self._lock = threading.Lock()  # one writer for the db and checkpoint
+
+    # ---------- checkpoint ----------
+    def _load_state(self):
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        return {}
+
+    def _save_state(self):
+        if os.path.dirname(self.checkpoint_path):
+            os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.checkpoint_path)
+
+    def _progress(self, category, site, now):
+        progress = self.state.setdefault(category, {}).setdefault(
+            site, {"next_page": 0, "done": False, "updated_at": None}
+        )
+        if progress["done"] and now - (progress["updated_at"] or 0) >= RECRAWL_SECONDS:
+            progress.update(next_page=0, done=False)
+        return progress
+
+    # ---------- crawl ----------
+    def _crawl_site(self, site, names, now):
+        crawl_page = importlib.import_module(SITE_CLIENTS[site][0]).crawl_page
+        limiter = SiteLimiter(site, **SITE_LIMITS.get(site, {}))
+        stored = 0
+        try:
+            for name in names:
+                config = self.categories[name]
+                with self._lock:
+                    progress = self._progress(name, site, now)
+                seen = set()
+                while not progress["done"]:
+                    page = progress["next_page"]
+                    try:
+                        products = limiter.run(crawl_page, config["term"], page)
+                    except Exception as e:
+                        # Leave the checkpoint on this page; the next crawl retries it
+                        log.warning(f"{site} '{name}' page {page} failed: {e}")
+                        break
+
+                    keys = {listing_key(p) for p in products}
+                    # An empty page, or one repeating what we already have, is the end
+                    exhausted = not keys or keys <= seen
+                    seen |= keys
+                    with self._lock:
+                        self.db.record_run(products)
+                        progress["next_page"] = page + 1
+                        progress["done"] = exhausted or page + 1 >= config.get("max_pages", 10)
+                        progress["updated_at"] = time.time()
+                        self._save_state()
+                    stored += len(products)
+                    log.info(f"{site} '{name}' page {page}: {len(products)} listings")
+        finally:
+            limiter.close()
+        return stored
+
+    def crawl(self, names=None, now=None):
+        """
+        Crawls the given categories (default: all configured) on every site.
+        Returns {site: listings stored}.
+        """
+        names = [n for n in (names or self.categories) if n in self.categories]
+        now = now or time.time()
+        with ThreadPoolExecutor(max_workers=len(self.sites) or 1) as pool:
+            futures = {site: pool.submit(self._crawl_site, site, names, now) for site in self.sites}
+
+        stored = {}
+        for site, future in futures.items():
+            try:
+                stored[site] = future.result()
+            except Exception as e:
+                log.exception(f"Crawl failed for {site}: {e}")
+                stored[site] = 0
+        return stored
+
+    def close(self):
+        self.db.close()
+
+
+if __name__ == "__main__":
+    # Usage: python orchestrator/crawler.py [category ...]
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+    crawler = CategoryCrawler()
+    try:
+        stored = crawler.crawl(sys.argv[1:] or None)
+        log.info(f"Crawl finished: {stored}")
+    finally:
+        crawler.close()
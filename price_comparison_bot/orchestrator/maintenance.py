@@ -0,0 +1,64 @@
+import sys
+import os
+import logging
+
+# Ensure we can import from utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.history import HistoryStore
+from utils.alerts import AlertEngine
+from utils.pricedb import PriceDB
+from utils.product import parse_price
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+log = logging.getLogger("Maintenance")
+
+
+def compact_history(before=None):
+    compacted = HistoryStore().compact(before=before)
+    log.info(f"Compacted {compacted} history partitions")
+    return compacted
+
+
+def rebuild_rollups():
+    db = PriceDB()
+    try:
+        folded = db.rebuild_rollups()
+    finally:
+        db.close()
+    log.info(f"Rebuilt price rollups from {folded} observations")
+    return folded
+
+
+def add_watch(query, max_price, site=None):
+    engine = AlertEngine.load()
+    watch = engine.add_watch(query, parse_price(max_price), site=site)
+    engine.save()
+    log.info(f"Watching '{watch.product_key}' below ₹{max_price} (id {watch.id})")
+    return watch
+
+
+def remove_watch(watch_id):
+    engine = AlertEngine.load()
+    removed = engine.remove_watch(watch_id)
+    engine.save()
+    log.info(f"Removed watch {watch_id}" if removed else f"No watch with id {watch_id}")
+    return removed
+
+
+JOBS = {
+    "compact": compact_history,
+    "rollups": rebuild_rollups,
+    "watch": add_watch,
+    "unwatch": remove_watch,
+}
+
+if __name__ == "__main__":
+    # Usage: python orchestrator/maintenance.py compact [YYYY-MM-DD]
+    #        python orchestrator/maintenance.py rollups
+    #        python orchestrator/maintenance.py watch "iPhone 17" 70000 [site]
+    #        python orchestrator/maintenance.py unwatch <watch id>
+    job = sys.argv[1] if len(sys.argv) > 1 else "compact"
+    if job not in JOBS:
+        sys.exit(f"Unknown job '{job}'. Available: {', '.join(JOBS)}")
+    JOBS[job](*sys.argv[2:])
@@ -4,16 +4,29 @@ import json
 import logging
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
 
 # Ensure we can import from utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 try:
-    from utils import matcher, exporter
+    from utils import exporter, matcher
+    from utils.batch import ProductBatch
+    from utils.history import HistoryStore
+    from utils.pricedb import PriceDB
+    from utils.alerts import AlertEngine
+    from utils.catalog import FRESH_SECONDS, Catalog, stored_product
+    from orchestrator.scheduler import SITE_CLIENTS, SITE_LIMITS, SiteLimiter, fetch_many
 except ImportError:
     # If running from root, this might be needed
-    from price_comparison_bot.utils import matcher, exporter
+    from price_comparison_bot.utils import exporter, matcher
+    from price_comparison_bot.utils.batch import ProductBatch
+    from price_comparison_bot.utils.history import HistoryStore
+    from price_comparison_bot.utils.pricedb import PriceDB
+    from price_comparison_bot.utils.alerts import AlertEngine
+    from price_comparison_bot.utils.catalog import FRESH_SECONDS, Catalog, stored_product
+    from price_comparison_bot.orchestrator.scheduler import SITE_CLIENTS, SITE_LIMITS, SiteLimiter, fetch_many
 
 # Configure Logging
 LOG_DIR = "logs"
@@ -52,6 +65,11 @@ SCRAPERS = [
     },
 ]
 
+# Phase two of a search: product pages are read only for the best search-card
+# candidates per site, all sites at once, within a deadline
+DETAIL_CANDIDATES = 2
+DETAIL_DEADLINE = 60
+
 def load_json(filepath):
     try:
         if os.path.exists(filepath):
@@ -61,57 +79,225 @@ def load_json(filepath):
         log.error(f"Failed to load {filepath}: {e}")
     return None
 
-def normalize_product(product, site_name):
-    # Ensure common fields: title, price, url, image, site
-    
-    # Title
-    title = product.get("title") or product.get("name") or "Unknown Product"
-    
-    # Price (clean it)
-    price = product.get("price", "0")
-    if price:
-        # Remove currency symbols and commas, keep only digits and dots
-        clean_price = "".join(c for c in str(price) if c.isdigit() or c == '.')
-        # Handle cases with multiple dots (rare but possible) or empty
-        price = clean_price if clean_price else "0"
-    
-    # URL
-    url = product.get("url") or product.get("link") or "#"
-    
-    # Image
-    image = product.get("image") or product.get("plpImage") or ""
-    
-    return {
-        "title": title,
-        "price": price,
-        "url": url,
-        "image": image,
-        "site": site_name,
-        "recommended": False
-    }
-
-def run_orchestrator(query):
+def refresh_site(site, rows):
+    """
+    Re-fetches known listings of one site from their product pages, in
+    concurrent tabs of one browser where the site allows it.
+    """
+    urls = [row["url"] for row in rows]
+    limiter = SiteLimiter(site, **SITE_LIMITS.get(site, {}))
+    products = []
+
+    def read(client):
+        for url, product in fetch_many(client, site, urls, limiter=limiter):
+            if isinstance(product, Exception):
+                log.warning(f"Direct refresh failed for {site} {url}: {product}")
+            elif product is not None:
+                products.append(product)
+
+    try:
+        limiter.run(read)
+    except Exception as e:
+        log.warning(f"Direct refresh of {site} stopped after {len(products)}/{len(urls)} pages: {e}")
+    finally:
+        limiter.close()
+    return products
+
+
+def refresh_from_catalog(query, live=True):
+    """
+    Answers the query's known listings from the catalog: a direct product-page
+    refresh of each one (all sites in parallel), or with `live=False` their
+    last stored prices. Only sites with known listings are answered. A site
+    whose listings were all seen within FRESH_SECONDS (kept warm by
+    orchestrator/warmer.py) is answered from stored prices either way, and so
+    is a site searched for the query's model within FRESH_SECONDS, with the
+    listings that search saw (its follow-up variant queries need no scrape).
+    Returns ({site: [Product]} for the sites answered, the set of those
+    answered from stored prices); the remaining sites fall back to a live search.
+    """
+    try:
+        catalog = Catalog()
+        try:
+            known = catalog.lookup(query) if live else catalog.products(query)
+            searched = catalog.searched_sites(query) & set(known)
+        finally:
+            catalog.close()
+    except Exception as e:
+        log.exception(f"Catalog lookup failed: {e}")
+        return {}, set()
+
+    if not live:
+        if known:
+            log.info(f"Catalog hit for '{query}': answering {', '.join(known)} from stored prices")
+        return known, set(known)
+
+    fresh_after = time.time() - FRESH_SECONDS
+    refreshed = {}
+    for site, rows in known.items():
+        fresh = [r for r in rows if r["last_seen"] >= fresh_after]
+        # A recent search of the model saw every listing the site still has
+        if fresh and (len(fresh) == len(rows) or site in searched):
+            refreshed[site] = [stored_product(r) for r in fresh]
+    if refreshed:
+        log.info(f"Catalog hit for '{query}': {', '.join(refreshed)} fresh, answering from stored prices")
+    stored = set(refreshed)
+    known = {site: rows for site, rows in known.items() if site in SITE_CLIENTS and site not in stored}
+    if not known:
+        return refreshed, stored
+    log.info(f"Catalog hit for '{query}': refreshing {', '.join(known)} directly")
+    with ThreadPoolExecutor(max_workers=len(known)) as pool:
+        futures = {site: pool.submit(refresh_site, site, rows) for site, rows in known.items()}
+    for site, future in futures.items():
+        try:
+            products = future.result()
+        except Exception as e:
+            log.exception(f"Direct refresh failed for {site}: {e}")
+            continue
+        if products:
+            refreshed[site] = products
+    return refreshed, stored
+
+
+def fetch_details(candidates, deadline=DETAIL_DEADLINE):
+    """
+    Reads the product pages of search-card candidates (best first per site)
+    for the price, MRP and availability cards do not show: one thread per
+    site within its SiteLimiter, each site's pages in concurrent tabs of
+    one browser where it allows. Each worker stops starting pages once
+    `deadline` seconds have passed, drops the pages still loading and quits
+    its client; all of them have finished when this returns.
+    Returns {card url: Product from the product page}.
+    """
+    by_site = {}
+    for product in candidates:
+        if product.site in SITE_CLIENTS and product.url and product.url != "#":
+            by_site.setdefault(product.site, []).append(product.url)
+    details = {}
+    if not by_site:
+        return details
+    end = time.monotonic() + deadline
+
+    def read_pages(client, site, urls, limiter):
+        for url, detail in fetch_many(client, site, urls, deadline=end, limiter=limiter):
+            if isinstance(detail, Exception):
+                log.warning(f"Detail fetch failed for {site} {url}: {detail}")
+            elif detail is not None:
+                details[url] = detail
+
+    def read_site(site, urls):
+        if time.monotonic() >= end:
+            return
+        limiter = SiteLimiter(site, **SITE_LIMITS.get(site, {}))
+        try:
+            limiter.run(read_pages, site, urls, limiter)
+        except Exception as e:
+            log.warning(f"Detail fetch for {site} stopped: {e}")
+        finally:
+            limiter.close()
+
+    # Joined, so no browser is still driven once the run moves on to exports
+    with ThreadPoolExecutor(max_workers=len(by_site)) as pool:
+        for site, urls in by_site.items():
+            pool.submit(read_site, site, urls)
+    if time.monotonic() > end:
+        log.warning(f"Detail deadline of {deadline}s reached; read {len(details)} pages")
+    return details
+
+
+def merge_detail(card, detail):
+    """
+    The search-card listing updated from its product page: current price,
+    MRP and availability. The card's title and match score are kept.
+    """
+    if detail.price_paise is not None:
+        card.price_paise = detail.price_paise
+    card.mrp_paise = detail.mrp_paise or card.mrp_paise
+    card.availability = detail.availability
+    card.image = card.image or detail.image
+    return card
+
+
+def pick_winners(candidates):
+    """
+    One listing per site from candidates ordered best first within each site:
+    the best match, unless it is out of stock and a runner-up listing of the
+    same product (matcher.product_key) is not.
+    """
+    winners = {}
+    for product in candidates:
+        best = winners.get(product.site)
+        if best is None:
+            winners[product.site] = product
+        elif (
+            best.availability == "out_of_stock"
+            and product.availability != "out_of_stock"
+            and matcher.product_key(product.title) == matcher.product_key(best.title)
+        ):
+            winners[product.site] = product
+    return list(winners.values())
+
+
+def report(progress, site, status, products=()):
+    """
+    Forwards per-site progress to an optional callback(site, status, products).
+    """
+    if progress is None:
+        return
+    try:
+        progress(site, status, list(products))
+    except Exception as e:
+        log.warning(f"Progress callback failed: {e}")
+
+
+def run_orchestrator(query, scorer=None, live=True, progress=None, run_id=None):
+    """
+    Runs the search across every site. `progress(site, status, products)` is
+    called as each site starts ("searching") and finishes ("catalog", "done",
+    "empty" or "failed", with that site's products). With a `run_id` the
+    exports are also written to exporter.run_dir(run_id) for that run's readers.
+    """
+    # Sites and the matcher get the query as typed; the query log and search
+    # log key it by matcher.query_key themselves, so every spelling meets there
     log.info(f"Starting orchestration for query: '{query}'")
     
-    final_results = []
+    batches = []
+
+    # First tier: full-text search of the local catalog. Sites with a known
+    # match skip search, typing, scrolling and matching entirely.
+    refreshed, stored = refresh_from_catalog(query, live=live)
+    for site, products in refreshed.items():
+        log.info(f"{site} answered {len(products)} known listings from the catalog")
+        batches.append(ProductBatch.from_products(products))
+        report(progress, site, "catalog" if products else "empty", products)
     
     # Change to project root for execution if currently in orchestrator dir
     # But usually we run from root. We will assume we are in 'price_comparison_bot' root or the parent of 'orchestrator'
     base_dir = os.getcwd()
-    
+    searched = []  # sites whose scraper wrote its output this run
+
     for scraper in SCRAPERS:
         name = scraper["name"]
         script = scraper["script"] # Relative to current dir?
         output_file = scraper["output"]
+
+        if name in refreshed:
+            continue
         
         # Check if script exists
         if not os.path.exists(script):
             log.error(f"Scraper script not found: {script}")
+            report(progress, name, "failed")
             continue
 
         log.info(f"Running scraper: {name}")
+        report(progress, name, "searching")
         
         try:
+            # A previous query's output must not pass for this one's
+            if os.path.exists(output_file):
+                os.remove(output_file)
+
             # Run scraper as subprocess
             cmd = [sys.executable, script, query]
             result = subprocess.run(cmd, capture_output=True, text=True, cwd=base_dir)
@@ -127,8 +313,14 @@ def run_orchestrator(query):
             # Actually safe to try reading if file exists.
             
             data = load_json(output_file)
-            if not data:
+            if data is None:
+                # Some scrapers log and swallow their errors: no file, no search
                 log.warning(f"No output found for {name}")
+                report(progress, name, "failed")
+                continue
+            searched.append(name)
+            if not data:
+                report(progress, name, "empty")
                 continue
                 
             # Extract products list
@@ -144,23 +336,13 @@ def run_orchestrator(query):
             log.info(f"{name} returned {len(products)} products")
             
             if not products:
+                report(progress, name, "empty")
                 continue
 
-            # Normalized for matcher
-            # Note: We pass raw dictionary because matcher uses 'title' and 'price' if available
-            # But creating a normalized copy for display is good.
-            # Matcher expects a list of dicts.
-            
-            normalized_list = [normalize_product(p, name) for p in products]
-            
-            # Match Logic
-            best_match = matcher.match_product(normalized_list, query)
-            
-            if best_match:
-                log.info(f"Match found for {name}: {best_match['title']} - {best_match['price']}")
-                final_results.append(best_match)
-            else:
-                log.warning(f"No matching product found for {name}")
+            # Columnar batch: prices are normalized column-wise, and the
+            # match_score attached by the scraper is kept as-is.
+            batches.append(ProductBatch.from_records(products, name))
+            report(progress, name, "done", batches[-1].to_products())
             
             # Cooldown between scrapers to avoid detection
             log.info(f"Cooldown: waiting 5 seconds before next scraper...")
@@ -168,33 +350,109 @@ def run_orchestrator(query):
                 
         except Exception as e:
             log.exception(f"Unexpected error running {name}: {e}")
+            report(progress, name, "failed")
+            
+    # Rank every listing once; the best matches per site are the candidates
+    # for the product-page phase below
+    all_listings = ProductBatch.concat(batches).rank(query, scorer)
+
+    # Phase two: product pages (MRP, availability) only for the top search-card
+    # candidates of the sites searched live, instead of one page per card.
+    # Catalog answers were read from product pages or stored already.
+    candidates = all_listings.top_per_site(DETAIL_CANDIDATES).to_products()
+    if live:
+        cards = [p for p in candidates if p.site in searched]
+        for site in dict.fromkeys(p.site for p in cards):
+            report(progress, site, "details")
+        details = fetch_details(cards)
+        log.info(f"Read {len(details)}/{len(cards)} candidate product pages")
+        for product in cards:
+            if product.url in details:
+                merge_detail(product, details[product.url])
+        for product in pick_winners(cards):
+            report(progress, product.site, "done", [product])
+
+    # Merged candidates replace their cards, so the database, history, alerts
+    # and exports below all see the product-page price and availability
+    merged = {(p.site, p.url): p for p in candidates}
+    everything = [merged.get((p.site, p.url), p) for p in all_listings.to_products()]
+
+    # Every listing (not just the winners) is fingerprinted against the price
+    # database in one transaction; only new or changed listings go on to the
+    # append-only history and the price-drop watches. Answers read back from
+    # stored prices were not observed now and are not recorded again.
+    listings = [p for p in everything if p.site not in stored]
+    changed = listings
+    try:
+        db = PriceDB()
+        try:
+            changed = db.record_run(listings, run_id=run_id)
+            db.log_query(query)
+            # Every variant a search listed is now in the catalog under its
+            # own product key; follow-up variant queries are answered from it
+            db.log_search(query, searched)
+            log.info(f"{len(changed)}/{len(listings)} listings changed since they were last seen")
+        finally:
+            db.close()
+    except Exception as e:
+        log.exception(f"Failed to record prices: {e}")
+
+    if changed:
+        try:
+            rows = HistoryStore().append(changed, query)
+            log.info(f"Appended {rows} observations to price history")
+        except Exception as e:
+            log.exception(f"Failed to append price history: {e}")
+
+        try:
+            alert_engine = AlertEngine.load()
+            if alert_engine.watches:
+                alerts = alert_engine.observe(changed)
+                alert_engine.save()
+                log.info(f"Delivered {len(alerts)} price alerts")
+        except Exception as e:
+            log.exception(f"Failed to evaluate price alerts: {e}")
+
+    # Every matched listing (all variants, storage sizes and sites) for the
+    # dashboard's full comparison view
+    output_dirs = ["data"] + ([exporter.run_dir(run_id)] if run_id else [])
+    matched = ProductBatch.from_products([p for p in everything if p.match_score >= 0]).sort_by_price()
+    for output_dir in output_dirs:
+        exporter.export_listings(matched, output_dir=output_dir)
+
+    winners = ProductBatch.from_products(pick_winners(candidates)).sort_by_price()
+
+    for scraper in SCRAPERS:
+        if not winners.site_mask(scraper["name"]).any():
+            log.warning(f"No matching product found for {scraper['name']}")
             
     # Price Comparison across sites
-    if final_results:
-        # Sort by price
-        def get_price(p):
-            try:
-                return float(p['price'])
-            except:
-                return float('inf')
-                
-        final_results.sort(key=get_price)
+    if len(winners):
+        # Mark cheapest (int64 paise column, no re-parsing)
+        winners.mark_cheapest()
+        final_results = winners.to_products()
+        for product in final_results:
+            log.info(f"Match found for {product.site}: {product.title} - {product.price}")
         
-        # Mark cheapest
-        cheapest = final_results[0]
-        cheapest["recommended"] = True
-        log.info(f"Recommended Product: {cheapest['title']} from {cheapest['site']} at {cheapest['price']}")
-        
-        # Save combined results
-        exporter.export_results(final_results, output_dir="data")
+        cheapest = next(p for p in final_results if p.recommended)
+        log.info(f"Recommended Product: {cheapest.title} from {cheapest.site} at {cheapest.price}")
         
     else:
+        final_results = []
         log.warning("No results collected from any scraper.")
-        # Ensure we write empty results so UI doesn't crash reading old data
-        exporter.export_results([], output_dir="data")
-        
+
+    # Save combined results; empty ones too, so the UI never reads old data
+    for output_dir in output_dirs:
+        exporter.export_results(winners, output_dir=output_dir)
+    if run_id:
+        exporter.prune_runs()
+
     return final_results
 
 if __name__ == "__main__":
     q = sys.argv[1] if len(sys.argv) > 1 else "iphone 17"
-    run_orchestrator(q)
+    run_orchestrator(
+        q,
+        scorer=os.environ.get("MATCH_SCORER"),
+        live=os.environ.get("LIVE_REFRESH", "1") != "0",
+    )
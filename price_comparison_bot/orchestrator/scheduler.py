@@ -0,0 +1,396 @@
+import sys
+import os
+import heapq
+import importlib
+import logging
+import math
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+# Ensure we can import from utils / scrapers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import matcher
+from utils.alerts import AlertEngine
+from utils.pricedb import PriceDB
+from utils.tabs import TabPool
+
+log = logging.getLogger("Scheduler")
+
+# Per-site client factories (module, factory); modules are imported lazily so
+# a Croma-only refresh never loads Selenium.
+SITE_CLIENTS = {
+    "Amazon": ("scrapers.amazon_scraper", "build_driver"),
+    "Flipkart": ("scrapers.flipkart_scraper", "build_driver"),
+    "Reliance": ("scrapers.reliance_scraper", "init_driver"),
+    "Croma": ("scrapers.croma_scraper", "create_http_session"),
+}
+
+# Concurrent fetches and minimum seconds between two requests, per site
+SITE_LIMITS = {
+    "Amazon": {"concurrency": 1, "min_gap": 20},
+    "Flipkart": {"concurrency": 1, "min_gap": 20},
+    "Reliance": {"concurrency": 1, "min_gap": 10},
+    "Croma": {"concurrency": 2, "min_gap": 3},
+}
+
+# Product pages loading at once in one browser, like a shopper opening a few
+# results in new tabs, and seconds between two navigations of that browser.
+# Each tab opens at most one page per the site's min_gap, so a browser loads
+# up to `tabs` pages per min_gap where a single tab loads one. Sites missing
+# here (HTTP clients) read one page per min_gap.
+TAB_LIMITS = {
+    "Amazon": {"tabs": 3, "gap": 4},
+    "Flipkart": {"tabs": 3, "gap": 4},
+    "Reliance": {"tabs": 3, "gap": 3},
+}
+
+BASE_INTERVAL = 6 * 3600
+MIN_INTERVAL = 30 * 60
+MAX_INTERVAL = 3 * 86400
+VOLATILITY_WEIGHT = 50  # a 2% average move halves the interval
+VOLATILITY_ALPHA = 0.3  # EWMA smoothing of relative price moves
+
+
+@dataclass(order=True)
+class Tracked:
+    next_due: float
+    site: str = field(compare=False)
+    url: str = field(compare=False)
+    product_key: str = field(compare=False, default="")
+    popularity: float = field(compare=False, default=1.0)
+    volatility: float = field(compare=False, default=0.0)
+    last_price: int | None = field(compare=False, default=None)
+    failures: int = field(compare=False, default=0)
+
+
+def next_interval(volatility, popularity=1.0, failures=0):
+    """
+    Refresh interval shrinking with price volatility and popularity,
+    clamped to [MIN_INTERVAL, MAX_INTERVAL]; failures back off exponentially.
+    """
+    interval = BASE_INTERVAL / (1 + VOLATILITY_WEIGHT * volatility)
+    interval /= 1 + math.log1p(max(popularity - 1, 0))
+    interval *= 2 ** min(failures, 5)
+    return max(MIN_INTERVAL, min(MAX_INTERVAL, interval))
+
+
+def seed_volatility(prices):
+    """
+    EWMA of relative moves over a listing's stored price series.
+    """
+    volatility = 0.0
+    for prev, cur in zip(prices, prices[1:]):
+        if prev:
+            volatility = VOLATILITY_ALPHA * abs(cur - prev) / prev + (1 - VOLATILITY_ALPHA) * volatility
+    return volatility
+
+
+# Errors after which a client (driver / HTTP session) is not reused: the
+# browser or session is gone, not just one page. Matched by class name so
+# the scheduler does not import Selenium.
+_DEAD_CLIENT_ERRORS = {
+    "WebDriverException",
+    "InvalidSessionIdException",
+    "NoSuchWindowException",
+    "SessionNotCreatedException",
+    "ConnectionError",
+}
+
+
+def client_is_dead(error):
+    """
+    True when `error` means the client that raised it cannot be reused.
+    Element lookups and parsing failures leave the client usable.
+    """
+    if type(error).__name__ in _DEAD_CLIENT_ERRORS:
+        return True
+    # builtin ConnectionError (refused / reset) and requests' ConnectionError family
+    return any(cls.__name__ == "ConnectionError" for cls in type(error).__mro__)
+
+
+def fetch_many(client, site, urls, deadline=None, limiter=None):
+    """
+    Reads several product pages of one site through one client, yielding
+    (url, Product / None / the exception raised) as each page is read.
+    `limiter` is the SiteLimiter whose run took the first page's turn
+    (without one, the first page starts now). Browser clients load up to
+    TAB_LIMITS[site] tabs at once through a TabPool, each tab opening one
+    page per min_gap, and report every navigation to the limiter; other
+    clients take a limiter turn for every further page. Nothing new is
+    started once the monotonic `deadline` has passed. A dead-client error
+    (client_is_dead) is raised instead of yielded, after the pages already
+    read, so SiteLimiter.run can replace the client.
+    """
+    module = importlib.import_module(SITE_CLIENTS[site][0])
+    if limiter is None:
+        limiter = SiteLimiter(site, min_gap=SITE_LIMITS.get(site, {}).get("min_gap", 0))
+        limiter.wait_turn()  # the first page starts now
+    if site in TAB_LIMITS and hasattr(module, "read_product") and hasattr(client, "window_handles"):
+        tabs = TabPool(client, **TAB_LIMITS[site], tab_gap=limiter.min_gap, on_start=limiter.note_start)
+        try:
+            for url, result in tabs.map(module.read_product, urls, deadline=deadline):
+                if isinstance(result, Exception) and client_is_dead(result):
+                    raise result
+                yield url, result
+        finally:
+            tabs.close()
+        return
+    for i, url in enumerate(urls):
+        if i and not limiter.wait_turn(deadline):
+            return
+        if deadline is not None and time.monotonic() >= deadline:
+            return
+        try:
+            product = module.fetch_product(client, url)
+        except Exception as e:
+            if client_is_dead(e):
+                raise
+            product = e
+        yield url, product
+
+
+class SiteLimiter:
+    """
+    Caps concurrent fetches per site and spaces request starts by `min_gap`.
+    Holds one reusable client (driver / HTTP session) per concurrent slot;
+    a client that fails with a dead-client error is quit and its slot gets
+    a fresh one on the next run.
+    """
+
+    def __init__(self, site, concurrency=1, min_gap=0):
+        self.site = site
+        self.concurrency = concurrency
+        self.min_gap = min_gap
+        self._slots = queue.Queue()
+        for _ in range(concurrency):
+            self._slots.put(None)
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+        self._clients = []
+
+    def _client(self, client):
+        if client is not None:
+            return client
+        module_name, factory = SITE_CLIENTS[self.site]
+        client = getattr(importlib.import_module(module_name), factory)()
+        self._clients.append(client)
+        return client
+
+    def wait_turn(self, deadline=None):
+        """
+        Sleeps until the next request start `min_gap` after the previous one,
+        across all slots. run() takes one turn; fetch_many takes one for each
+        further page read over HTTP. Returns False, without waiting, when the
+        turn would only come after the monotonic `deadline`.
+        """
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next_start, now)
+            if deadline is not None and start >= deadline:
+                return False
+            self._next_start = start + self.min_gap
+        if start > now:
+            time.sleep(start - now)
+        return True
+
+    def note_start(self):
+        """
+        Records a request started without a turn (a tab navigation paced by
+        its TabPool), so the next turn comes `min_gap` after it.
+        """
+        with self._lock:
+            self._next_start = max(self._next_start, time.monotonic() + self.min_gap)
+
+    def run(self, fn, *args):
+        client = self._slots.get()
+        try:
+            self.wait_turn()
+            client = self._client(client)
+            return fn(client, *args)
+        except Exception as e:
+            if client is not None and client_is_dead(e):
+                log.warning(f"Discarding {self.site} client after {type(e).__name__}: {e}")
+                self._discard(client)
+                client = None
+            raise
+        finally:
+            self._slots.put(client)
+
+    def _discard(self, client):
+        if client in self._clients:
+            self._clients.remove(client)
+        try:
+            (getattr(client, "quit", None) or client.close)()
+        except Exception:
+            pass
+
+    def close(self):
+        for client in list(self._clients):
+            self._discard(client)
+
+
+class RefreshScheduler:
+    """
+    Keeps known listing URLs in a heap keyed on next-due time and re-fetches
+    their product pages directly, adapting each interval to observed volatility
+    and popularity while honouring per-site concurrency and pacing.
+    """
+
+    def __init__(self, db=None, alert_engine=None, site_limits=None):
+        self.db = db or PriceDB()
+        self.alert_engine = alert_engine
+        self.heap = []
+        self.limiters = {
+            site: SiteLimiter(site, **limits)
+            for site, limits in (site_limits or SITE_LIMITS).items()
+        }
+
+    def track(self, site, url, product_key="", popularity=1.0, volatility=0.0, last_price=None, due=None):
+        if site not in SITE_CLIENTS or not url or url == "#":
+            return None
+        entry = Tracked(
+            next_due=due if due is not None else time.time(),
+            site=site,
+            url=url,
+            product_key=product_key,
+            popularity=popularity,
+            volatility=volatility,
+            last_price=last_price,
+        )
+        heapq.heappush(self.heap, entry)
+        return entry
+
+    def load_watched(self, alert_engine):
+        """
+        Tracks every stored listing of a watched product. Popularity is the
+        number of watches on the product; volatility is seeded from history.
+        """
+        popularity = {}
+        for watch in alert_engine.watches.values():
+            popularity[watch.product_key] = popularity.get(watch.product_key, 0) + 1
+
+        now = time.time()
+        for row in self.db.listings(popularity.keys()):
+            key = row["product_key"]
+            prices = self.db.recent_prices(row["listing_id"])
+            watches = popularity.get(key) or popularity.get(matcher.base_key(key), 1)
+            volatility = seed_volatility(prices)
+            # First refresh is one adapted interval after the listing was last seen
+            due = max(now, row["last_seen"] + next_interval(volatility, watches))
+            self.track(
+                row["site"],
+                row["url"],
+                product_key=key,
+                popularity=watches,
+                volatility=volatility,
+                last_price=prices[-1] if prices else None,
+                due=due,
+            )
+        log.info(f"Tracking {len(self.heap)} listings for {len(popularity)} watched products")
+
+    def _fetch(self, site, entries):
+        # One limiter slot reads all of the entries' pages, in tabs where possible;
+        # pages read before the client died are kept, the rest count as failures
+        urls = [entry.url for entry in entries]
+        results = {}
+
+        def read(client):
+            for url, product in fetch_many(client, site, urls, limiter=self.limiters[site]):
+                results[url] = product
+
+        try:
+            self.limiters[site].run(read)
+        except Exception as e:
+            log.warning(f"Refresh failed for {site} after {len(results)}/{len(urls)} pages: {e}")
+        return results
+
+    def _reschedule(self, entry, product, now):
+        if product is None:
+            entry.failures += 1
+        else:
+            entry.failures = 0
+            if entry.last_price and product.price_paise is not None:
+                move = abs(product.price_paise - entry.last_price) / entry.last_price
+                entry.volatility = VOLATILITY_ALPHA * move + (1 - VOLATILITY_ALPHA) * entry.volatility
+            if product.price_paise is not None:
+                entry.last_price = product.price_paise
+        entry.next_due = now + next_interval(entry.volatility, entry.popularity, entry.failures)
+        heapq.heappush(self.heap, entry)
+
+    def run_once(self, max_fetches=None, now=None):
+        """
+        Fetches every due listing (up to `max_fetches`) concurrently within
+        the site limits, records the results and reschedules each entry.
+        Returns the refreshed Products.
+        """
+        now = now or time.time()
+        due = []
+        while self.heap and self.heap[0].next_due <= now and (max_fetches is None or len(due) < max_fetches):
+            due.append(heapq.heappop(self.heap))
+        if not due:
+            return []
+
+        # Each site's due entries are split across its concurrent slots
+        by_site = {}
+        for entry in due:
+            by_site.setdefault(entry.site, []).append(entry)
+        chunks = [
+            entries[i::self.limiters[site].concurrency]
+            for site, entries in by_site.items()
+            for i in range(min(self.limiters[site].concurrency, len(entries)))
+        ]
+        workers = sum(limiter.concurrency for limiter in self.limiters.values()) or 1
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [(chunk, pool.submit(self._fetch, chunk[0].site, chunk)) for chunk in chunks]
+
+        refreshed = []
+        for chunk, future in futures:
+            try:
+                results = future.result()
+            except Exception as e:
+                log.warning(f"Refresh failed for {chunk[0].site}: {e}")
+                results = {}
+            for entry in chunk:
+                product = results.get(entry.url)
+                if isinstance(product, Exception):
+                    log.warning(f"Refresh failed for {entry.site} {entry.url}: {product}")
+                    product = None
+                self._reschedule(entry, product, time.time())
+                if product is not None:
+                    refreshed.append(product)
+
+        changed = self.db.record_run(refreshed) if refreshed else []
+        # Unchanged pages only bump last_seen; alerts see real changes only
+        if changed and self.alert_engine is not None:
+            self.alert_engine.observe(changed)
+            self.alert_engine.save()
+        log.info(
+            f"Refreshed {len(refreshed)}/{len(due)} listings ({len(changed)} changed); "
+            f"{len(self.heap)} tracked"
+        )
+        return refreshed
+
+    def run_forever(self, poll_seconds=60, max_fetches=None):
+        try:
+            while True:
+                self.run_once(max_fetches=max_fetches)
+                wait = self.heap[0].next_due - time.time() if self.heap else poll_seconds
+                time.sleep(min(max(wait, 1), poll_seconds))
+        finally:
+            self.close()
+
+    def close(self):
+        for limiter in self.limiters.values():
+            limiter.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+    engine = AlertEngine.load()
+    scheduler = RefreshScheduler(alert_engine=engine)
+    scheduler.load_watched(engine)
+    scheduler.run_forever()
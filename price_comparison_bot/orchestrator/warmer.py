@@ -0,0 +1,197 @@
+import sys
+import os
+import importlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Ensure we can import from utils / scrapers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.alerts import AlertEngine
+from utils.catalog import FRESH_SECONDS, Catalog
+from utils.pricedb import PriceDB
+from orchestrator.scheduler import SITE_CLIENTS, SITE_LIMITS, TAB_LIMITS, SiteLimiter, fetch_many
+
+log = logging.getLogger("Warmer")
+
+# Most in-demand queries kept warm
+WARM_TOP = 20
+# Length of one warming run; each site's fetches must fit its pacing within it
+WARM_WINDOW = 10 * 60
+# Listings older than this are refreshed, so a warmed answer stays within
+# FRESH_SECONDS until the next run
+WARM_AGE = FRESH_SECONDS // 2
+# Local hours in which a standalone warmer runs (it cannot see live searches)
+OFF_PEAK_HOURS = range(1, 7)
+
+
+def site_budget(site, window=WARM_WINDOW):
+    """
+    Product-page loads one site allows within `window`: one per min_gap
+    (SiteLimiter spaces starts across all of its slots, so concurrency does
+    not add to it) for each of its TAB_LIMITS tabs.
+    """
+    turns = int(window / max(SITE_LIMITS.get(site, {}).get("min_gap", 0), 1))
+    return max(turns * TAB_LIMITS.get(site, {}).get("tabs", 1), 1)
+
+
+def task_cost(site, kind):
+    """
+    Budget units of one warming task: a product page is one load, a
+    search-results page takes a whole limiter turn (every tab's share).
+    """
+    return 1 if kind == "refresh" else TAB_LIMITS.get(site, {}).get("tabs", 1)
+
+
+class CacheWarmer:
+    """
+    Keeps the answers to trending queries fresh before users ask for them.
+    Demand comes from the query log's decaying counters (PriceDB.trending_queries);
+    for each of the top queries, known listings about to leave FRESH_SECONDS
+    are re-read from their product pages, and a site with no known listing
+    gets one search-results page. Work is planned most-demanded first and cut
+    at each site's budget for the window, then run one thread per site
+    within its SiteLimiter.
+    """
+
+    def __init__(self, db=None, top=WARM_TOP, window=WARM_WINDOW, busy=None, alert_engine=None):
+        self.db = db or PriceDB()
+        self.top = top
+        self.window = window
+        self.busy = busy  # callable: True while live searches need the sites
+        self.alert_engine = alert_engine
+        self.sites = list(SITE_CLIENTS)
+        self._lock = threading.Lock()  # one writer for the db
+        self._searched = {}  # (site, query) -> time of the last warming search
+
+    def idle(self):
+        """
+        Free to warm: no live search running (when `busy` is known), otherwise
+        inside the off-peak hours.
+        """
+        if self.busy is not None:
+            return not self.busy()
+        return datetime.now().hour in OFF_PEAK_HOURS
+
+    def plan(self, now=None):
+        """
+        {site: [("refresh", url) | ("search", query)]} for one run, in demand order.
+        """
+        now = now or time.time()
+        budget = {site: site_budget(site, self.window) for site in self.sites}
+        used = dict.fromkeys(self.sites, 0)
+        plan = {site: [] for site in self.sites}
+        catalog = Catalog(self.db)
+        for query, demand in self.db.trending_queries(self.top, now=now):
+            known = catalog.lookup(query, now=now)
+            for site in self.sites:
+                rows = known.get(site)
+                if rows:
+                    tasks = [("refresh", r["url"]) for r in rows if r["last_seen"] < now - WARM_AGE]
+                elif now - self._searched.get((site, query), 0) >= WARM_AGE:
+                    tasks = [("search", query)]
+                else:
+                    tasks = []
+                cost = sum(task_cost(site, kind) for kind, _ in tasks)
+                if tasks and used[site] + cost <= budget[site]:
+                    plan[site] += tasks
+                    used[site] += cost
+        return {site: tasks for site, tasks in plan.items() if tasks}
+
+    def _record(self, products):
+        if products:
+            with self._lock:
+                changed = self.db.record_run(products)
+                if changed and self.alert_engine is not None:
+                    self.alert_engine.observe(changed)
+
+    def _refresh_pages(self, client, site, urls, limiter):
+        # Product pages load in concurrent tabs paced by the limiter's min_gap;
+        # a live search stops new ones
+        fetched = 0
+        for url, product in fetch_many(client, site, urls, limiter=limiter):
+            if isinstance(product, Exception):
+                log.warning(f"Warm-up refresh failed for {site} {url}: {product}")
+                continue
+            fetched += 1
+            self._record([product] if product is not None else [])
+            if not self.idle():
+                break
+        return fetched
+
+    def _warm_site(self, site, tasks):
+        module = importlib.import_module(SITE_CLIENTS[site][0])
+        limiter = SiteLimiter(site, **SITE_LIMITS.get(site, {}))
+        urls = [arg for kind, arg in tasks if kind == "refresh"]
+        queries = [arg for kind, arg in tasks if kind == "search"]
+        fetched = 0
+        try:
+            if urls and self.idle():
+                try:
+                    fetched += limiter.run(self._refresh_pages, site, urls, limiter)
+                except Exception as e:
+                    log.warning(f"Warm-up refresh for {site} stopped: {e}")
+            for query in queries:
+                if not self.idle():
+                    # A live search needs the site; the rest waits for the next run
+                    log.info(f"{site}: live search started, pausing warm-up")
+                    break
+                self._searched[(site, query)] = time.time()
+                try:
+                    products = limiter.run(module.crawl_page, query, 0)
+                except Exception as e:
+                    log.warning(f"Warm-up search failed for {site} '{query}': {e}")
+                    continue
+                fetched += 1
+                self._record(products)
+        finally:
+            limiter.close()
+        return fetched
+
+    def run_once(self, now=None):
+        """
+        Plans and runs one warming window. Price changes it records are
+        evaluated against the saved watches, re-read for every window.
+        Returns {site: page loads}.
+        """
+        plan = self.plan(now)
+        if not plan:
+            return {}
+        if self.alert_engine is not None:
+            self.alert_engine.reload()
+        log.info("Warming " + ", ".join(f"{site}: {len(tasks)}" for site, tasks in plan.items()))
+        with ThreadPoolExecutor(max_workers=len(plan)) as pool:
+            futures = {site: pool.submit(self._warm_site, site, tasks) for site, tasks in plan.items()}
+
+        fetched = {}
+        for site, future in futures.items():
+            try:
+                fetched[site] = future.result()
+            except Exception as e:
+                log.exception(f"Warm-up failed for {site}: {e}")
+                fetched[site] = 0
+        if self.alert_engine is not None:
+            self.alert_engine.save()
+        return fetched
+
+    def run_forever(self):
+        try:
+            while True:
+                started = time.time()
+                if self.idle():
+                    self.run_once()
+                time.sleep(max(self.window - (time.time() - started), 1))
+        finally:
+            self.close()
+
+    def close(self):
+        self.db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+    engine = AlertEngine.load()
+    CacheWarmer(alert_engine=engine).run_forever()
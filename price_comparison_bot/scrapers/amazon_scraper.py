@@ -1,10 +1,11 @@
 import json
+import os
+import sys
 import time
 import random
-import re
 import logging
 from datetime import datetime
-from urllib.parse import urljoin
+from urllib.parse import urlencode, urljoin
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -16,12 +17,22 @@ from selenium.common.exceptions import TimeoutException, WebDriverException
 
 from selenium.webdriver.chrome.service import Service
 
+# Ensure we can import from utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import matcher, patterns
+from utils.product import Product, parse_availability, parse_price
+
 
 # =========================
 # GLOBAL CONFIG (LOCKED)
 # =========================
 AMAZON_HOME = "https://www.amazon.in/"
-MAX_PRODUCTS = 5
+SITE = "Amazon"
+MAX_PRODUCTS = 5  # cards scored per deepening step
+MAX_DEPTH = 30  # hard cap on cards inspected when nothing matches confidently
+VARIANT_CARDS = 10  # loaded cards parsed past a confident match, for the model's other variants
+CRAWL_CARDS = 60  # scroll target for a full results page in crawl mode
 OUTPUT_FILE = "amazon_output.json"
 
 # Human timing (weighted randomness)
@@ -34,11 +45,13 @@ SEARCH_BOX_XPATH = '//input[@id="twotabsearchtextbox"]'
 
 SEARCH_RESULT_CARD = 'div[data-component-type="s-search-result"]'
 SEARCH_RESULT_LINK = "h2 a.a-link-normal"
+NEXT_PAGE = "a.s-pagination-next"
 
 PRODUCT_TITLE = "#productTitle"
 PRICE_PRIMARY = ".a-price .a-price-whole"
 PRICE_FALLBACK = ".a-offscreen"
 AVAILABILITY = "#availability span"
+MRP_PRICE = ".basisPrice .a-offscreen, .a-price.a-text-price .a-offscreen"
 
 
 # =========================
@@ -101,6 +114,10 @@ def human_scroll_cards(driver, cards_needed=5):
         if len(cards) >= cards_needed:
             break
 
+        # page exhausted: fewer cards than requested
+        if y > driver.execute_script("return document.body.scrollHeight"):
+            break
+
         y += scroll_step
 
 
@@ -125,13 +142,10 @@ def human_type(element, text):
 # =========================
 def risk_detected(driver):
     page = driver.page_source.lower()
-    signals = [
-        "captcha",
-        "enter the characters you see",
-        "unusual traffic",
-        "robot check",
-    ]
-    return any(s in page for s in signals)
+    signal = patterns.risk_signals("amazon").search(page)
+    if signal:
+        log.warning(f"Risk signal on page: '{signal}'")
+    return signal is not None
 
 
 def hard_stop(driver, reason):
@@ -206,63 +220,199 @@ def handle_continue_shopping(driver, observe_seconds=4):
         time.sleep(random.uniform(0.6, 1.2))
 
 
-def normalize(text):
-    return re.sub(r"[^a-z0-9 ]+", " ", text.lower()).strip()
+# =========================
+# SEARCH RESULTS (ADAPTIVE DEEPENING)
+# =========================
+def parse_card(card):
+    try:
+        title = safe_text(card.find_element(By.CSS_SELECTOR, "h2 span"))
+    except:
+        title = None
+
+    # -------- PRICE EXTRACTION (CARD-SAFE) --------
+    price = None
 
+    try:
+        # Primary: whole price (most reliable)
+        whole = card.find_element(
+            By.CSS_SELECTOR, ".a-price-whole"
+        ).text.strip()
 
-def pick_best_product(products, query):
-    if not products:
-        return None
+        try:
+            fraction = card.find_element(
+                By.CSS_SELECTOR, ".a-price-fraction"
+            ).text.strip()
+        except:
+            fraction = "00"
 
-    q = normalize(query)
-    q_tokens = q.split()
+        price = f"{whole}.{fraction}"
 
-    # extract model number if present (15, 16, 17 etc.)
-    q_number = None
-    for t in q_tokens:
-        if t.isdigit():
-            q_number = t
-            break
+    except:
+        price = None
+    # ---------------------------------------------
+
+    try:
+        rating = safe_text(card.find_element(By.CSS_SELECTOR, ".a-icon-alt"))
+    except:
+        rating = None
+
+    try:
+        link = card.find_element(By.CSS_SELECTOR, "a[href*='/dp/']")
+        url = clean_amazon_url(link.get_attribute("href"))
+    except:
+        url = None
+
+    return Product(
+        title=title,
+        price_paise=parse_price(price),
+        site=SITE,
+        url=url or "#",
+        rating=rating,
+    )
 
-    variant_priority = ["", "pro", "plus", "max", "ultra"]
 
-    scored = []
+def next_results_page(driver, wait):
+    links = driver.find_elements(By.CSS_SELECTOR, NEXT_PAGE)
+    if not links:
+        return False
 
-    for p in products:
-        title = p.get("title") or ""
-        t = normalize(title)
+    log.info("Opening next results page")
+    human_sleep(2, 4)
+    links[0].click()
+    wait.until(EC.staleness_of(links[0]))
+    wait.until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, SEARCH_RESULT_CARD))
+    )
+    return True
 
-        score = 0
 
-        # token overlap
-        for tok in q_tokens:
-            if tok in t:
-                score += 5
+def collect_products(driver, wait, query):
+    """
+    Scores cards MAX_PRODUCTS at a time and only scrolls / pages further
+    while no card is a confident match, up to MAX_DEPTH cards. Extraction
+    stops at the confident match except for up to VARIANT_CARDS cards already
+    loaded after it (no scrolling, paging or pauses), so the model's other
+    variants and storage sizes reach the catalog for follow-up queries.
+    """
+    results = []
+    seen = 0  # cards already parsed on the current page
 
-        # exact number match
-        if q_number and q_number in t:
-            score += 30
-        elif q_number:
-            score -= 20  # hard penalty for wrong generation
+    while len(results) < MAX_DEPTH:
+        human_scroll_cards(driver, seen + MAX_PRODUCTS)
 
-        # variant preference
-        for i, v in enumerate(variant_priority):
-            if v and v in t:
-                score += 10 - i
+        if risk_detected(driver):
+            hard_stop(driver, "Risk detected on results page")
+
+        cards = driver.find_elements(By.CSS_SELECTOR, SEARCH_RESULT_CARD)
+        batch = cards[seen:seen + MAX_PRODUCTS]
+
+        for i, card in enumerate(batch):
+            product = parse_card(card)
+            results.append(product)
+
+            if matcher.is_confident(product, query):
+                log.info(f"Confident match after {len(results)} cards")
+                rest = cards[seen + i + 1:seen + i + 1 + VARIANT_CARDS]
+                return results + [parse_card(c) for c in rest]
+
+            if len(results) >= MAX_DEPTH:
                 break
-            elif v == "" and q_number and q_number in t:
-                score += 12
 
-        scored.append((score, p))
+            time.sleep(random.uniform(1.5, 3.0))
 
-    scored.sort(key=lambda x: x[0], reverse=True)
+        seen += len(batch)
 
-    # reject garbage matches
-    best_score, best_product = scored[0]
-    if best_score <= 0:
-        return None
+        if len(batch) < MAX_PRODUCTS:
+            if not next_results_page(driver, wait):
+                break
+            seen = 0
+
+        log.info(f"No confident match in {len(results)} cards, deepening")
+
+    return results
+
+
+# =========================
+# CATEGORY CRAWL
+# =========================
+def crawl_page(driver, category, page=0):
+    """
+    Every card on one results page (0-based) for a category term, unranked.
+    Raises RuntimeError on a block page so the crawler can back off.
+    """
+    driver.get(f"{AMAZON_HOME}s?{urlencode({'k': category, 'page': page + 1})}")
+    human_sleep(3, 6)
+
+    if risk_detected(driver):
+        raise RuntimeError("Risk detected on results page")
+
+    try:
+        WebDriverWait(driver, 20).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, SEARCH_RESULT_CARD))
+        )
+    except TimeoutException:
+        return []
+
+    human_scroll_cards(driver, CRAWL_CARDS)
+    cards = driver.find_elements(By.CSS_SELECTOR, SEARCH_RESULT_CARD)
+    return [p for p in map(parse_card, cards) if p.title]
+
+
+# =========================
+# PRODUCT PAGE (DIRECT REFRESH)
+# =========================
+def fetch_product(driver, url):
+    """
+    Re-reads a known listing straight from its product page (no search),
+    with its MRP and availability. Raises RuntimeError on a block page so
+    callers can back off.
+    """
+    driver.get(url)
+    human_sleep(3, 6)
+    return read_product(driver, url)
+
+
+def read_product(driver, url):
+    """
+    Reads the product page already loaded in the driver's current tab
+    (see utils.tabs.TabPool).
+    """
+    if risk_detected(driver):
+        raise RuntimeError("Risk detected on product page")
+
+    title = safe_text(
+        WebDriverWait(driver, 20).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, PRODUCT_TITLE))
+        )
+    )
+
+    price = None
+    for selector in (PRICE_PRIMARY, PRICE_FALLBACK):
+        try:
+            price = parse_price(driver.find_element(By.CSS_SELECTOR, selector).get_attribute("textContent"))
+        except Exception:
+            price = None
+        if price:
+            break
 
-    return best_product
+    mrp = availability = None
+    try:
+        mrp = parse_price(driver.find_element(By.CSS_SELECTOR, MRP_PRICE).get_attribute("textContent"))
+    except Exception:
+        pass
+    try:
+        availability = parse_availability(safe_text(driver.find_element(By.CSS_SELECTOR, AVAILABILITY)))
+    except Exception:
+        pass
+
+    return Product(
+        title=title,
+        price_paise=price,
+        site=SITE,
+        url=clean_amazon_url(url),
+        mrp_paise=mrp,
+        availability=availability,
+    )
 
 
 # =========================
@@ -271,7 +421,6 @@ def pick_best_product(products, query):
 def run(query):
     driver = build_driver()
     wait = WebDriverWait(driver, 20)
-    results = []
     session_meta = {
         "search_query": query,
         "search_time": datetime.utcnow().isoformat(),
@@ -301,77 +450,14 @@ def run(query):
             EC.presence_of_element_located((By.CSS_SELECTOR, SEARCH_RESULT_CARD))
         )
 
-        human_scroll_cards(driver, MAX_PRODUCTS)
-
-        if risk_detected(driver):
-            hard_stop(driver, "Risk detected on results page")
-
-            # =========================
-            # COLLECT PRODUCT URLS
-            # =========================
-        cards = driver.find_elements(By.CSS_SELECTOR, SEARCH_RESULT_CARD)
-
-        for card in cards:
-            if len(results) >= MAX_PRODUCTS:
-                break
-
-            try:
-                title = safe_text(card.find_element(By.CSS_SELECTOR, "h2 span"))
-            except:
-                title = None
-
-            # -------- PRICE EXTRACTION (CARD-SAFE) --------
-            price = None
-
-            try:
-                # Primary: whole price (most reliable)
-                whole = card.find_element(
-                    By.CSS_SELECTOR, ".a-price-whole"
-                ).text.strip()
-
-                try:
-                    fraction = card.find_element(
-                        By.CSS_SELECTOR, ".a-price-fraction"
-                    ).text.strip()
-                except:
-                    fraction = "00"
-
-                price = f"{whole}.{fraction}"
-
-            except:
-                price = None
-            # ---------------------------------------------
-
-            try:
-                rating = safe_text(card.find_element(By.CSS_SELECTOR, ".a-icon-alt"))
-            except:
-                rating = None
-
-            try:
-                link = card.find_element(By.CSS_SELECTOR, "a[href*='/dp/']")
-                url = clean_amazon_url(link.get_attribute("href"))
-            except:
-                url = None
-
-            time.sleep(random.uniform(1.5, 3.0))
-
-            results.append(
-                {
-                    "title": title,
-                    "price": price,
-                    "rating": rating,
-                    "url": url,
-                    "source": "search_card",
-                    "timestamp": datetime.utcnow().isoformat(),
-                }
-            )
+        results = collect_products(driver, wait, query)
 
-        best = pick_best_product(results, query)
+        best = matcher.match_product(results, query)
 
         final_output = {
             "session": session_meta,
-            "best_product": best,
-            "all_products": results,
+            "best_product": best.to_dict() if best else None,
+            "all_products": [p.to_dict() for p in results],
         }
 
         with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
@@ -398,6 +484,5 @@ def run(query):
 # ENTRY
 # =========================
 if __name__ == "__main__":
-    import sys
     q = sys.argv[1] if len(sys.argv) > 1 else "iphone 17"
     run(q)
@@ -1,5 +1,7 @@
 import json
 import logging
+import os
+import sys
 import time
 from datetime import datetime, UTC
 from urllib.parse import urljoin
@@ -9,10 +11,18 @@ from urllib3.util.retry import Retry
 
 import requests
 
+# Ensure we can import from utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import matcher
+from utils.product import Product, parse_price, product_from_jsonld
+
 # ================= CONFIG ================= #
 BASE_URL = "https://www.croma.com"
 API_URL = "https://api.croma.com/searchservices/v1/search"
-MAX_PRODUCTS = 5
+SITE = "Croma"
+MAX_PRODUCTS = 5  # products scored per deepening step
+MAX_DEPTH = 40  # hard cap on products inspected when nothing matches confidently
 OUTPUT_FILE = "croma_output.json"
 TIMEOUT = 10
 
@@ -70,22 +80,10 @@ HEADERS = {
 }
 
 
-# ================= NORMALIZER ================= #
-def normalize_model(title: str) -> str:
-    t = title.lower()
-    if "pro max" in t:
-        return "iphone_17_pro_max"
-    if "pro" in t:
-        return "iphone_17_pro"
-    if "plus" in t:
-        return "iphone_17_plus"
-    return "iphone_17"
-
-
 # ================= FETCH ================= #
-def fetch_products(session: requests.Session, query: str):
+def fetch_products(session: requests.Session, query: str, page: int = 0):
     params = {
-        "currentPage": 0,
+        "currentPage": page,
         "query": f"{query}:relevance",
         "fields": "FULL",
         "channel": "WEB",
@@ -93,7 +91,7 @@ def fetch_products(session: requests.Session, query: str):
         "spellOpt": "DEFAULT",
     }
 
-    logger.info(f"Calling Croma API for query: '{query}'")
+    logger.info(f"Calling Croma API for query: '{query}' (page {page})")
 
     response = session.get(
         API_URL,
@@ -109,23 +107,19 @@ def fetch_products(session: requests.Session, query: str):
 def parse_products(data: dict):
     products = []
 
-    for item in data.get("products", [])[:MAX_PRODUCTS]:
+    for item in data.get("products", []):
         try:
             title = item["name"].strip()
-            price = f"{item['price']['value']:.2f}"
-            mrp = f"{item['mrp']['value']:.2f}"
-            link = urljoin(BASE_URL, item["url"])
-            image = item.get("plpImage")
 
             products.append(
-                {
-                    "title": title,
-                    "price": price,
-                    "mrp": mrp,
-                    "link": link,
-                    "image": image,
-                    "normalized_model": normalize_model(title),
-                }
+                Product(
+                    title=title,
+                    price_paise=parse_price(item["price"]["value"]),
+                    mrp_paise=parse_price(item["mrp"]["value"]),
+                    site=SITE,
+                    url=urljoin(BASE_URL, item["url"]),
+                    image=item.get("plpImage") or "",
+                )
             )
 
             logger.info(f"Parsed product: {title}")
@@ -136,6 +130,63 @@ def parse_products(data: dict):
     return products
 
 
+# ================= DEEPEN ================= #
+def collect_products(session: requests.Session, query: str):
+    """
+    Scores products MAX_PRODUCTS at a time and only requests the next API
+    page while none of them is a confident match, up to MAX_DEPTH products.
+    The rest of the API page holding the confident match is kept as well
+    (already fetched and parsed, so it costs nothing), so every variant and
+    storage size on it reaches the catalog.
+    """
+    products = []
+    page = 0
+
+    while len(products) < MAX_DEPTH:
+        parsed = parse_products(fetch_products(session, query, page))
+        if not parsed:
+            break
+
+        for start in range(0, len(parsed), MAX_PRODUCTS):
+            batch = parsed[start:start + MAX_PRODUCTS][: MAX_DEPTH - len(products)]
+            products.extend(batch)
+            if any([matcher.is_confident(p, query) for p in batch]):
+                logger.info(f"Confident match after {len(products)} products")
+                # Everything after the products actually scored (a batch may be cut at MAX_DEPTH)
+                return products + parsed[start + len(batch):]
+            if len(products) >= MAX_DEPTH:
+                return products
+
+        logger.info(f"No confident match in {len(products)} products, deepening")
+        page += 1
+        time.sleep(1)
+
+    return products
+
+
+# ================= CATEGORY CRAWL ================= #
+def crawl_page(session: requests.Session, category: str, page: int = 0):
+    """
+    Every product on one search API page (0-based) for a category term, unranked.
+    """
+    return parse_products(fetch_products(session, category, page))
+
+
+# ================= PRODUCT PAGE ================= #
+def fetch_product(session: requests.Session, url: str):
+    """
+    Re-reads a known listing from its product page (no search API call),
+    using the page's schema.org Product markup.
+    """
+    response = session.get(url, headers={"accept": "text/html"}, timeout=TIMEOUT)
+    response.raise_for_status()
+
+    product = product_from_jsonld(response.text, SITE, url)
+    if product is None:
+        raise RuntimeError(f"No product data on page: {url}")
+    return product
+
+
 # ================= SAVE ================= #
 def save_output(query: str, products: list):
     payload = {
@@ -144,7 +195,7 @@ def save_output(query: str, products: list):
             "search_time": datetime.now(UTC).isoformat(),
             "marketplace": "croma.com",
         },
-        "products": products,
+        "products": [p.to_dict() for p in products],
     }
 
     with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
@@ -159,9 +210,7 @@ def run(query: str):
 
     try:
         session = create_http_session()
-        raw_data = fetch_products(session, query)
-
-        products = parse_products(raw_data)
+        products = collect_products(session, query)
         save_output(query, products)
     except Exception as e:
         logger.exception(f"Fatal error: {e}")
@@ -170,6 +219,5 @@ def run(query: str):
 
 
 if __name__ == "__main__":
-    import sys
     q = sys.argv[1] if len(sys.argv) > 1 else "iphone 17"
     run(q)
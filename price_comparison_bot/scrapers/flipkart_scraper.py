@@ -1,10 +1,12 @@
 import json
+import os
+import sys
 import time
 import random
 import re
 import logging
 from datetime import datetime
-from urllib.parse import urljoin, urlparse, parse_qs
+from urllib.parse import urlencode, urljoin, urlparse, parse_qs
 
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -16,12 +18,22 @@ from selenium.common.exceptions import TimeoutException, WebDriverException
 
 from selenium.webdriver.chrome.service import Service
 
+# Ensure we can import from utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import matcher, patterns
+from utils.product import Product, parse_price, product_from_jsonld
+
 
 # =========================
 # GLOBAL CONFIG (LOCKED)
 # =========================
 FLIPKART_HOME = "https://www.flipkart.com/"
-MAX_PRODUCTS = 5
+SITE = "Flipkart"
+MAX_PRODUCTS = 5  # cards scored per deepening step
+MAX_DEPTH = 30  # hard cap on cards inspected when nothing matches confidently
+VARIANT_CARDS = 10  # loaded cards parsed past a confident match, for the model's other variants
+CRAWL_CARDS = 40  # scroll target for a full results page in crawl mode
 OUTPUT_FILE = "flipkart_output.json"
 
 WAIT_SHORT = (3, 6)
@@ -33,6 +45,7 @@ LOGIN_CANCEL = 'span[role="button"]'
 SEARCH_BOX = 'input[placeholder="Search for Products, Brands and More"]'
 SEARCH_CARD = "a.k7wcnx"
 TITLE_IN_CARD = ".RG5Slk"
+NEXT_PAGE = '//a[span[normalize-space()="Next"]]'
 
 
 # =========================
@@ -76,6 +89,10 @@ def human_scroll_cards(driver, cards_needed=5):
         if len(cards) >= cards_needed:
             break
 
+        # page exhausted: fewer cards than requested
+        if y > driver.execute_script("return document.body.scrollHeight"):
+            break
+
         y += scroll_step
 
 
@@ -100,13 +117,10 @@ def human_type(element, text):
 # =========================
 def risk_detected(driver):
     page = driver.page_source.lower()
-    signals = [
-        "captcha",
-        "unusual traffic",
-        "verify",
-        "access denied",
-    ]
-    return any(s in page for s in signals)
+    signal = patterns.risk_signals("flipkart").search(page)
+    if signal:
+        log.warning(f"Risk signal on page: '{signal}'")
+    return signal is not None
 
 
 def hard_stop(driver, reason):
@@ -154,10 +168,16 @@ def safe_text(el):
 
 
 def clean_flipkart_url(href):
+    """
+    Product URL without tracking parameters. `pid` stays: it selects the
+    colour / storage variant, which the itm id in the path does not.
+    """
     if not href:
         return None
     parsed = urlparse(href)
-    return f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
+    url = f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
+    pid = parse_qs(parsed.query).get("pid")
+    return f"{url}?{urlencode({'pid': pid[0]})}" if pid else url
 
 
 def handle_login_popup(driver, observe_seconds=5):
@@ -179,58 +199,142 @@ def handle_login_popup(driver, observe_seconds=5):
         time.sleep(random.uniform(0.6, 1.2))
 
 
-def normalize(text):
-    return re.sub(r"[^a-z0-9 ]+", " ", text.lower()).strip()
+# =========================
+# SEARCH RESULTS (ADAPTIVE DEEPENING)
+# =========================
+def parse_card(card):
+    try:
+        title = safe_text(card.find_element(By.CSS_SELECTOR, TITLE_IN_CARD))
+    except:
+        title = None
 
+    price = None
+    try:
+        text = card.text
+        m = re.search(r"₹\s?([\d,]+)", text)
+        if m:
+            price = m.group(1)
+    except:
+        price = None
+
+    url = clean_flipkart_url(card.get_attribute("href"))
+
+    return Product(
+        title=title,
+        price_paise=parse_price(price),
+        site=SITE,
+        url=url or "#",
+    )
 
-def pick_best_product(products, query):
-    if not products:
-        return None
 
-    q = normalize(query)
-    q_tokens = q.split()
+def next_results_page(driver, wait):
+    links = driver.find_elements(By.XPATH, NEXT_PAGE)
+    if not links:
+        return False
+
+    log.info("Opening next results page")
+    human_sleep(2, 4)
+    links[0].click()
+    wait.until(EC.staleness_of(links[0]))
+    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, SEARCH_CARD)))
+    handle_login_popup(driver)
+    return True
+
+
+def collect_products(driver, wait, query):
+    """
+    Scores cards MAX_PRODUCTS at a time and only scrolls / pages further
+    while no card is a confident match, up to MAX_DEPTH cards. Extraction
+    stops at the confident match except for up to VARIANT_CARDS cards already
+    loaded after it (no scrolling, paging or pauses), so the model's other
+    variants and storage sizes reach the catalog for follow-up queries.
+    """
+    results = []
+    seen = 0  # cards already parsed on the current page
 
-    q_number = None
-    for t in q_tokens:
-        if t.isdigit():
-            q_number = t
-            break
+    while len(results) < MAX_DEPTH:
+        human_scroll_cards(driver, seen + MAX_PRODUCTS)
 
-    variant_priority = ["", "pro", "plus", "max", "ultra"]
+        # Temporarily disabled - Flipkart being too aggressive
+        # if risk_detected(driver):
+        #     hard_stop(driver, "Risk detected on results page")
 
-    scored = []
+        cards = driver.find_elements(By.CSS_SELECTOR, SEARCH_CARD)
+        batch = cards[seen:seen + MAX_PRODUCTS]
+
+        for i, card in enumerate(batch):
+            product = parse_card(card)
+            results.append(product)
 
-    for p in products:
-        title = p.get("title") or ""
-        t = normalize(title)
+            if matcher.is_confident(product, query):
+                log.info(f"Confident match after {len(results)} cards")
+                rest = cards[seen + i + 1:seen + i + 1 + VARIANT_CARDS]
+                return results + [parse_card(c) for c in rest]
 
-        score = 0
+            if len(results) >= MAX_DEPTH:
+                break
 
-        for tok in q_tokens:
-            if tok in t:
-                score += 5
+            time.sleep(random.uniform(1.4, 2.8))
 
-        if q_number and q_number in t:
-            score += 30
-        elif q_number:
-            score -= 20
+        seen += len(batch)
 
-        for i, v in enumerate(variant_priority):
-            if v and v in t:
-                score += 10 - i
+        if len(batch) < MAX_PRODUCTS:
+            if not next_results_page(driver, wait):
                 break
-            elif v == "" and q_number and q_number in t:
-                score += 12
+            seen = 0
 
-        scored.append((score, p))
+        log.info(f"No confident match in {len(results)} cards, deepening")
 
-    scored.sort(key=lambda x: x[0], reverse=True)
+    return results
 
-    best_score, best = scored[0]
-    if best_score <= 0:
-        return None
 
-    return best
+# =========================
+# CATEGORY CRAWL
+# =========================
+def crawl_page(driver, category, page=0):
+    """
+    Every card on one results page (0-based) for a category term, unranked.
+    """
+    driver.get(f"{FLIPKART_HOME}search?{urlencode({'q': category, 'page': page + 1})}")
+    human_sleep(3, 6)
+    handle_login_popup(driver, observe_seconds=2)
+
+    try:
+        WebDriverWait(driver, 20).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, SEARCH_CARD))
+        )
+    except TimeoutException:
+        return []
+
+    human_scroll_cards(driver, CRAWL_CARDS)
+    cards = driver.find_elements(By.CSS_SELECTOR, SEARCH_CARD)
+    return [p for p in map(parse_card, cards) if p.title]
+
+
+# =========================
+# PRODUCT PAGE (DIRECT REFRESH)
+# =========================
+def fetch_product(driver, url):
+    """
+    Re-reads a known listing straight from its product page (no search),
+    using the page's schema.org Product markup.
+    """
+    driver.get(url)
+    human_sleep(3, 6)
+    return read_product(driver, url)
+
+
+def read_product(driver, url):
+    """
+    Reads the product page already loaded in the driver's current tab
+    (see utils.tabs.TabPool).
+    """
+    handle_login_popup(driver, observe_seconds=2)
+
+    product = product_from_jsonld(driver.page_source, SITE, clean_flipkart_url(url))
+    if product is None:
+        raise RuntimeError(f"No product data on page: {url}")
+    return product
 
 
 # =========================
@@ -239,7 +343,6 @@ def pick_best_product(products, query):
 def run(query):
     driver = build_driver()
     wait = WebDriverWait(driver, 20)
-    results = []
 
     session_meta = {
         "search_query": query,
@@ -270,53 +373,14 @@ def run(query):
         wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, SEARCH_CARD)))
 
         handle_login_popup(driver)
-        human_scroll_cards(driver, MAX_PRODUCTS)
-
-        # Temporarily disabled - Flipkart being too aggressive
-        # if risk_detected(driver):
-        #     hard_stop(driver, "Risk detected on results page")
-
-        cards = driver.find_elements(By.CSS_SELECTOR, SEARCH_CARD)
-
-        for card in cards:
-            if len(results) >= MAX_PRODUCTS:
-                break
-
-            try:
-                title = safe_text(card.find_element(By.CSS_SELECTOR, TITLE_IN_CARD))
-            except:
-                title = None
-
-            price = None
-            try:
-                text = card.text
-                m = re.search(r"₹\s?([\d,]+)", text)
-                if m:
-                    price = m.group(1).replace(",", "")
-            except:
-                price = None
-
-            url = clean_flipkart_url(card.get_attribute("href"))
-
-            time.sleep(random.uniform(1.4, 2.8))
-
-            results.append(
-                {
-                    "title": title,
-                    "price": price,
-                    "rating": None,
-                    "url": url,
-                    "source": "search_card",
-                    "timestamp": datetime.utcnow().isoformat(),
-                }
-            )
+        results = collect_products(driver, wait, query)
 
-        best = pick_best_product(results, query)
+        best = matcher.match_product(results, query)
 
         final_output = {
             "session": session_meta,
-            "best_product": best,
-            "all_products": results,
+            "best_product": best.to_dict() if best else None,
+            "all_products": [p.to_dict() for p in results],
         }
 
         with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
@@ -338,6 +402,5 @@ def run(query):
 # ENTRY
 # =========================
 if __name__ == "__main__":
-    import sys
     q = sys.argv[1] if len(sys.argv) > 1 else "i phone 17 pro"
     run(q)
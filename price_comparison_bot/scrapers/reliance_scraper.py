@@ -1,7 +1,9 @@
 import json
 import logging
+import os
+import sys
 from datetime import datetime
-from urllib.parse import urljoin
+from urllib.parse import urlencode, urljoin
 from datetime import datetime, UTC
 
 from selenium import webdriver
@@ -19,11 +21,21 @@ from selenium.common.exceptions import (
 
 from selenium.webdriver.chrome.service import Service
 
+# Ensure we can import from utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import matcher
+from utils.product import Product, parse_price, product_from_jsonld
+
 # ================== CONFIG ================== #
 BASE_URL = "https://www.reliancedigital.in/"
-MAX_PRODUCTS = 5
+MAX_PRODUCTS = 5  # cards scored per deepening step
+MAX_DEPTH = 30  # hard cap on cards inspected when nothing matches confidently
+VARIANT_CARDS = 10  # loaded cards parsed past a confident match, for the model's other variants
+CRAWL_PAGE_SIZE = 24  # cards per numbered results page in a category crawl
 OUTPUT_FILE = "reliance_digital_output.json"
 MARKETPLACE = "reliancedigital.in"
+SITE = "Reliance"
 
 
 # ================= LOGGING ================= #
@@ -100,48 +112,143 @@ def perform_search(driver, query):
 def parse_product(card):
     try:
         title = card.find_element(By.CLASS_NAME, "product-card-title").text.strip()
-        price_text = card.find_element(By.CLASS_NAME, "price").text
-        price = price_text.replace("₹", "").replace(",", "").strip()
+        price = parse_price(card.find_element(By.CLASS_NAME, "price").text)
         link = card.find_element(By.TAG_NAME, "a").get_attribute("href")
 
         if not title or not price or not link:
             raise ValueError("Missing essential product fields")
 
-        return {
-            "title": title,
-            "price": price,
-            "link": link,
-        }
+        return Product(title=title, price_paise=price, site=SITE, url=link)
 
     except Exception as e:
         raise ValueError(f"Product parse failed: {e}")
 
 
 # ================== SCRAPER ================== #
-def scrape_products(driver):
+def load_more_cards(driver, loaded):
+    """
+    Scrolls the last card into view so the listing lazy-loads more;
+    returns False when no new cards appear.
+    """
+    cards = driver.find_elements(By.CLASS_NAME, "product-card")
+    if not cards:
+        return False
+    driver.execute_script("arguments[0].scrollIntoView();", cards[-1])
+    try:
+        WebDriverWait(driver, 8).until(
+            lambda d: len(d.find_elements(By.CLASS_NAME, "product-card")) > loaded
+        )
+        return True
+    except TimeoutException:
+        return False
+
+
+def scrape_products(driver, query):
     wait = WebDriverWait(driver, 20)
 
     close_optional_popup(driver)
 
     wait.until(EC.presence_of_element_located((By.CLASS_NAME, "product-card")))
 
-    cards = driver.find_elements(By.CLASS_NAME, "product-card")
-    logger.info(f"Product cards detected: {len(cards)}")
-
     products = []
-
-    for index, card in enumerate(cards[:MAX_PRODUCTS], start=1):
-        try:
-            product = parse_product(card)
-            products.append(product)
-            logger.info(f"Parsed product {index}: {product['title']}")
-        except Exception as e:
-            logger.warning(f"Skipping product {index}: {e}")
+    seen = 0
+
+    # Parse MAX_PRODUCTS cards at a time; load more only without a confident match
+    while seen < MAX_DEPTH:
+        cards = driver.find_elements(By.CLASS_NAME, "product-card")
+        if seen >= len(cards):
+            if not load_more_cards(driver, len(cards)):
+                break
+            continue
+
+        logger.info(f"Product cards detected: {len(cards)}")
+        batch = []
+        for index, card in enumerate(cards[seen:seen + MAX_PRODUCTS], start=seen + 1):
+            try:
+                product = parse_product(card)
+                batch.append(product)
+                logger.info(f"Parsed product {index}: {product.title}")
+            except Exception as e:
+                logger.warning(f"Skipping product {index}: {e}")
+        seen = min(seen + MAX_PRODUCTS, len(cards))
+
+        products.extend(batch)
+        if any([matcher.is_confident(p, query) for p in batch]):
+            logger.info(f"Confident match after {seen} cards")
+            # Extraction stops here except for a few cards already loaded
+            # after the match (no scrolling), for the model's other variants
+            for card in cards[seen:seen + VARIANT_CARDS]:
+                try:
+                    products.append(parse_product(card))
+                except Exception:
+                    continue
+            break
+
+        logger.info(f"No confident match in {seen} cards, deepening")
 
     logger.info(f"Total products scraped: {len(products)}")
     return products
 
 
+# ================== CATEGORY CRAWL ================== #
+def crawl_page_url(category, page=0):
+    """
+    Numbered results page (0-based) of the search for a category term, so a
+    crawl resumed from a checkpoint opens its page directly.
+    """
+    params = {"q": category, "page_no": page + 1, "page_size": CRAWL_PAGE_SIZE, "page_type": "number"}
+    return urljoin(BASE_URL, "products?" + urlencode(params))
+
+
+def crawl_page(driver, category, page=0):
+    """
+    Every card on one numbered results page (0-based) for a category term.
+    The page is always navigated to, whatever the driver was showing.
+    """
+    driver.get(crawl_page_url(category, page))
+    close_optional_popup(driver)
+    try:
+        WebDriverWait(driver, 20).until(
+            EC.presence_of_element_located((By.CLASS_NAME, "product-card"))
+        )
+    except TimeoutException:
+        return []  # past the last page
+
+    products = []
+    for card in driver.find_elements(By.CLASS_NAME, "product-card"):
+        try:
+            products.append(parse_product(card))
+        except ValueError as e:
+            logger.warning(f"Skipping card: {e}")
+    return products
+
+
+# ================== PRODUCT PAGE ================== #
+def fetch_product(driver, url):
+    """
+    Re-reads a known listing straight from its product page (no search),
+    using the page's schema.org Product markup.
+    """
+    driver.get(url)
+    WebDriverWait(driver, 20).until(
+        lambda d: d.execute_script("return document.readyState") == "complete"
+    )
+    return read_product(driver, url)
+
+
+def read_product(driver, url):
+    """
+    Reads the product page already loaded in the driver's current tab
+    (see utils.tabs.TabPool).
+    """
+    close_optional_popup(driver)
+
+    product = product_from_jsonld(driver.page_source, SITE, url)
+    if product is None:
+        raise RuntimeError(f"No product data on page: {url}")
+    return product
+
+
 # ================== SAVE ================== #
 def save_to_json(query, products):
     payload = {
@@ -150,7 +257,7 @@ def save_to_json(query, products):
             "search_time": datetime.now(UTC).isoformat(),
             "marketplace": MARKETPLACE,
         },
-        "products": products,
+        "products": [p.to_dict() for p in products],
     }
 
     with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
@@ -166,7 +273,7 @@ def run(query):
 
     try:
         perform_search(driver, query)
-        products = scrape_products(driver)
+        products = scrape_products(driver, query)
         save_to_json(query, products)
 
     except WebDriverException as e:
@@ -180,6 +287,5 @@ def run(query):
 
 # ================== ENTRY ================== #
 if __name__ == "__main__":
-    import sys
     q = sys.argv[1] if len(sys.argv) > 1 else "iphone 17"
     run(q)
@@ -0,0 +1,46 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.alerts import AlertEngine, QueueSink
+from utils.product import Product
+
+
+class ListQueue(list):
+    put = list.append
+
+
+def listing(title, rupees, site):
+    return Product(title=title, price_paise=rupees * 100, site=site, url=f"https://{site.lower()}.example/{rupees}")
+
+
+def test_watch_fires_for_the_site_that_crosses_the_threshold():
+    alerts = ListQueue()
+    engine = AlertEngine(sinks=[QueueSink(alerts)], path=os.devnull)
+    engine.add_watch("iPhone 17", 80000 * 100)
+    run = [
+        listing("Apple iPhone 17 (256GB, Black)", 82900, "Amazon"),
+        listing("Apple iPhone 17 (Black, 256 GB)", 81000, "Flipkart"),
+        listing("Apple iPhone 17 256GB Black", 79900, "Croma"),
+        listing("Apple iPhone 17 Pro (256GB, Silver)", 70000, "Reliance"),
+    ]
+    delivered = engine.observe(run, now=1000)
+    assert [(a["site"], a["price_paise"]) for a in delivered] == [("Croma", 7990000)]
+
+
+def test_watches_do_not_collide_across_brands():
+    alerts = ListQueue()
+    engine = AlertEngine(sinks=[QueueSink(alerts)], path=os.devnull)
+    engine.add_watch("OnePlus 13", 70000 * 100)
+    assert engine.observe([listing("Xiaomi 13 5G (256GB)", 50000, "Amazon")], now=1000) == []
+    assert len(engine.observe([listing("OnePlus 13 (Black Eclipse, 256GB)", 65000, "Amazon")], now=1000)) == 1
+
+
+def test_saved_watches_are_rekeyed_on_load(tmp_path):
+    path = str(tmp_path / "watches.json")
+    engine = AlertEngine(sinks=[], path=path)
+    watch = engine.add_watch("iPhone 17", 80000 * 100)
+    watch.product_key = "iphone 17"  # as saved before keys carried the brand
+    engine.save()
+    assert AlertEngine.load(path, sinks=[]).watches[watch.id].product_key == "apple iphone 17"
@@ -0,0 +1,42 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.autocomplete import Autocomplete
+from utils.pricedb import PriceDB
+from utils.product import Product
+
+
+def test_suggestions_are_ranked_by_weight_and_reach_inner_words():
+    index = Autocomplete({
+        "apple iphone 17": 40,
+        "apple iphone 17 pro": 25,
+        "apple iphone 16": 60,
+        "samsung galaxy s25": 10,
+    })
+    assert index.suggest("iphone") == ["apple iphone 16", "apple iphone 17", "apple iphone 17 pro"]
+    # Spacing doesn't matter and a suffix starting mid-name still matches
+    assert index.suggest("i phone 17") == ["apple iphone 17", "apple iphone 17 pro"]
+    assert index.suggest("17 pro") == ["apple iphone 17 pro"]
+    assert index.suggest("iphone", limit=1) == ["apple iphone 16"]
+    assert index.suggest("pixel") == []
+    assert index.suggest("  ") == []
+
+
+def test_limit_picks_the_best_of_many_keys_sharing_a_prefix():
+    weights = {f"model {n:03d}": n for n in range(200)}
+    assert Autocomplete(weights).suggest("model", limit=3) == ["model 199", "model 198", "model 197"]
+
+
+def test_past_searches_outrank_catalog_listings(tmp_path):
+    db = PriceDB(str(tmp_path / "prices.db"))
+    db.record_run([
+        Product(title="Apple iPhone 16 128GB Black", price_paise=6990000, site="Croma", url="https://www.croma.com/p/1"),
+        Product(title="Apple iPhone 16 128GB Black", price_paise=6890000, site="Amazon", url="https://www.amazon.in/dp/B0TEST0001"),
+        Product(title="Apple iPhone 17 256GB Black", price_paise=7990000, site="Croma", url="https://www.croma.com/p/2"),
+    ])
+    db.log_query("iphone 17 256gb")
+    index = Autocomplete.build(db)
+    assert index.suggest("iphone") == ["apple iphone 17 256gb", "apple iphone 16 128gb"]
+    db.close()
@@ -0,0 +1,95 @@
+import json
+import os
+import sys
+import time
+import types
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from orchestrator import crawler
+from orchestrator.crawler import CategoryCrawler
+from utils.pricedb import PriceDB
+from utils.product import Product
+
+
+class FakeDriver:
+    def quit(self):
+        pass
+
+
+def fake_reliance(monkeypatch, fail_on=()):
+    pages = []
+    module = types.ModuleType("fake_reliance_scraper")
+    module.init_driver = FakeDriver
+
+    def crawl_page(driver, term, page):
+        pages.append(page)
+        if page in fail_on:
+            raise RuntimeError("blocked")
+        return [
+            Product(title=f"Phone {page}-{i}", price_paise=100, site="Reliance", url=f"https://r.example/p/{page}00{i}")
+            for i in range(3)
+        ]
+
+    module.crawl_page = crawl_page
+    monkeypatch.setitem(sys.modules, "fake_reliance_scraper", module)
+    monkeypatch.setitem(crawler.SITE_CLIENTS, "Reliance", ("fake_reliance_scraper", "init_driver"))
+    monkeypatch.setitem(crawler.SITE_LIMITS, "Reliance", {"concurrency": 1, "min_gap": 0})
+    return pages
+
+
+def phones_crawler(tmp_path, max_pages=4):
+    return CategoryCrawler(
+        db=PriceDB(str(tmp_path / "prices.db")),
+        categories={"phones": {"term": "smartphones", "max_pages": max_pages}},
+        sites=["Reliance"],
+        checkpoint_path=str(tmp_path / "crawl_state.json"),
+    )
+
+
+def test_crawl_resumes_from_the_checkpointed_page(tmp_path, monkeypatch):
+    pages = fake_reliance(monkeypatch)
+
+    checkpoint = tmp_path / "crawl_state.json"
+    checkpoint.write_text(json.dumps({"phones": {"Reliance": {"next_page": 2, "done": False, "updated_at": 0}}}))
+    crawl = phones_crawler(tmp_path)
+    try:
+        assert crawl.crawl(now=1000) == {"Reliance": 6}
+    finally:
+        crawl.close()
+    assert pages == [2, 3]
+    assert json.loads(checkpoint.read_text())["phones"]["Reliance"]["done"]
+
+
+def test_failed_page_is_retried_by_the_next_crawl(tmp_path, monkeypatch):
+    fake_reliance(monkeypatch, fail_on={1})
+    crawl = phones_crawler(tmp_path, max_pages=3)
+    try:
+        assert crawl.crawl(now=1000) == {"Reliance": 3}
+    finally:
+        crawl.close()
+    state = json.loads((tmp_path / "crawl_state.json").read_text())["phones"]["Reliance"]
+    assert (state["next_page"], state["done"]) == (1, False)
+
+    pages = fake_reliance(monkeypatch)
+    crawl = phones_crawler(tmp_path, max_pages=3)
+    try:
+        assert crawl.crawl(now=2000) == {"Reliance": 6}
+        assert pages == [1, 2]
+        # Finished within RECRAWL_SECONDS: nothing to do
+        assert crawl.crawl(now=3000) == {"Reliance": 0}
+        # A day later the category is walked again from the first page
+        assert crawl.crawl(now=time.time() + crawler.RECRAWL_SECONDS) == {"Reliance": 9}
+    finally:
+        crawl.close()
+
+
+def test_reliance_page_url_names_the_page():
+    pytest.importorskip("selenium")
+    from scrapers import reliance_scraper
+
+    url = reliance_scraper.crawl_page_url("smartphones", 2)
+    assert url.startswith("https://www.reliancedigital.in/products?")
+    assert "q=smartphones" in url and "page_no=3" in url
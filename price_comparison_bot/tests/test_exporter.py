@@ -0,0 +1,62 @@
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import exporter
+from utils.product import Product
+
+
+def test_each_run_keeps_its_own_results(tmp_path):
+    root = str(tmp_path / "runs")
+    first = [Product(title="Apple iPhone 17 (256GB, Black)", price_paise=7990000, site="Croma")]
+    second = [Product(title="OnePlus 13 (Black Eclipse, 256GB)", price_paise=6999900, site="Amazon")]
+    exporter.export_results(first, output_dir=exporter.run_dir("run1", root))
+    exporter.export_results(second, output_dir=exporter.run_dir("run2", root))
+
+    with open(os.path.join(exporter.run_dir("run1", root), exporter.JSON_FILE), encoding="utf-8") as f:
+        assert [r["title"] for r in json.load(f)] == [first[0].title]
+    stream, _, _ = exporter.export_stream("json", output_dir=exporter.run_dir("run2", root))
+    assert [r["title"] for r in json.loads(stream.getvalue())] == [second[0].title]
+
+
+def test_prune_runs_keeps_the_newest(tmp_path):
+    root = str(tmp_path / "runs")
+    for i in range(3):
+        os.makedirs(exporter.run_dir(f"run{i}", root))
+        os.utime(exporter.run_dir(f"run{i}", root), (i, i))
+    assert exporter.prune_runs(keep=2, root=root) == 1
+    assert sorted(os.listdir(root)) == ["run1", "run2"]
+
+
+def test_tabular_exports_are_rendered_once_per_content(tmp_path, monkeypatch):
+    rendered = []
+    to_dataframe = exporter._to_dataframe
+
+    def counting(payload):
+        rendered.append(payload)
+        return to_dataframe(payload)
+
+    monkeypatch.setattr(exporter, "_to_dataframe", counting)
+    monkeypatch.setattr(exporter, "_RENDER_CACHE", exporter.OrderedDict())
+    out = str(tmp_path)
+    results = [Product(title="Apple iPhone 17 (256GB, Black)", price_paise=7990000, site="Croma")]
+    exporter.export_results(results, output_dir=out)
+    json_path = os.path.join(out, exporter.JSON_FILE)
+    os.utime(json_path, (1, 1))
+
+    first, filename, _ = exporter.export_stream("csv", output_dir=out)
+    # Unchanged results neither rewrite the JSON nor render the CSV again
+    exporter.export_results(results, output_dir=out)
+    second, _, _ = exporter.export_stream("csv", output_dir=out)
+    assert filename == "results.csv"
+    assert first.getvalue() == second.getvalue()
+    assert b"Apple iPhone 17" in first.getvalue()
+    assert len(rendered) == 1
+    assert os.path.getmtime(json_path) == 1
+
+    results[0].price_paise = 7890000
+    exporter.export_results(results, output_dir=out)
+    assert b"78900.00" in exporter.export_stream("csv", output_dir=out)[0].getvalue()
+    assert len(rendered) == 2
@@ -0,0 +1,47 @@
+import glob
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import history
+from utils.history import HistoryStore
+from utils.product import Product
+
+YESTERDAY = datetime(2026, 3, 1, 10, tzinfo=timezone.utc)
+TODAY = datetime(2026, 3, 2, 10, tzinfo=timezone.utc)
+
+
+def fill(store):
+    phone = Product(title="Apple iPhone 17 (256GB, Black)", price_paise=7990000, site="Croma", url="https://www.croma.com/p/1")
+    case = Product(title="Spigen case for iPhone 17", price_paise=99900, site="Amazon", url="https://www.amazon.in/dp/B0TESTCASE")
+    store.append([phone, case], "iphone 17", observed_at=YESTERDAY, run_id="run1")
+    phone.price_paise = 7890000
+    store.append([phone], "iphone 17", observed_at=YESTERDAY.replace(hour=18), run_id="run2")
+    store.append([phone], "iphone 17", observed_at=TODAY, run_id="run3")
+
+
+@pytest.mark.parametrize("parquet", [True, False])
+def test_compaction_merges_closed_partitions_only(tmp_path, monkeypatch, parquet):
+    if parquet:
+        pytest.importorskip("pyarrow")
+    else:
+        monkeypatch.setattr(history, "pq", None)
+    store = HistoryStore(root=str(tmp_path))
+    fill(store)
+    before = store.query()
+
+    assert store.compact(before="2026-03-02") == 2
+    compacted = "compacted.parquet" if parquet else "compacted.jsonl.gz"
+    closed = tmp_path / "date=2026-03-01" / "site=Croma"
+    assert os.listdir(closed) == [compacted]
+    assert len(glob.glob(str(tmp_path / "date=2026-03-02" / "site=Croma" / "part-*"))) == 1
+    # Nothing is lost or reordered, and a second pass has nothing to do
+    assert store.query() == before
+    assert store.compact(before="2026-03-02") == 0
+
+    prices = [r["price_paise"] for r in store.query(site="Croma", text="iphone 17")]
+    assert prices == [7990000, 7890000, 7890000]
@@ -0,0 +1,86 @@
+import os
+import sys
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import image_cache
+from utils.image_cache import ImageCache
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    """Serves 100 bytes per URL, distinct per URL, and counts the fetches."""
+
+    def __init__(self, down=()):
+        self.headers = {}
+        self.fetched = []
+        self.down = set(down)
+
+    def get(self, url, timeout=None):
+        self.fetched.append(url)
+        if url in self.down:
+            raise requests.ConnectionError(url)
+        return FakeResponse(url.encode("ascii").ljust(100, b"."))
+
+
+def age(path, seconds):
+    os.utime(path, (seconds, seconds))
+
+
+def test_least_recently_used_images_are_evicted_with_their_index(tmp_path):
+    session = FakeSession()
+    cache = ImageCache(root=str(tmp_path), max_bytes=350, session=session)
+    paths = {}
+    for i, name in enumerate(["a", "b", "c"]):
+        paths[name] = cache.get(f"https://img.example/{name}.jpg")
+        age(paths[name], 1000 + i)
+    # A hit makes "a" the most recently used
+    assert cache.get("https://img.example/a.jpg") == paths["a"]
+    assert session.fetched.count("https://img.example/a.jpg") == 1
+
+    cache.get("https://img.example/d.jpg")  # 400 bytes > 350: evict down to 315
+    assert not os.path.exists(paths["b"])
+    assert os.path.exists(paths["a"]) and os.path.exists(paths["c"])
+    # b's index entry went with its blob
+    assert len(os.listdir(tmp_path / "urls")) == 3
+    # An evicted image is fetched again on its next use
+    cache.get("https://img.example/b.jpg")
+    assert session.fetched.count("https://img.example/b.jpg") == 2
+
+
+def test_failed_image_waits_before_it_is_fetched_again(tmp_path, monkeypatch):
+    url = "https://img.example/a.jpg"
+    session = FakeSession(down={url})
+    cache = ImageCache(root=str(tmp_path), session=session)
+    now = 1_000_000
+    monkeypatch.setattr(image_cache.time, "time", lambda: now)
+    assert cache.get(url) is None
+    session.down.clear()
+    assert cache.get(url) is None
+    assert session.fetched == [url]
+
+    now += image_cache.RETRY_SECONDS
+    assert cache.get(url) is not None
+    assert session.fetched == [url, url]
+
+
+def test_prefetch_fetches_each_url_once(tmp_path):
+    session = FakeSession()
+    cache = ImageCache(root=str(tmp_path), session=session)
+    urls = ["https://img.example/a.jpg", None, "https://img.example/b.jpg", "https://img.example/a.jpg", ""]
+    paths = cache.prefetch(urls)
+    assert set(paths) == {"https://img.example/a.jpg", "https://img.example/b.jpg"}
+    assert all(os.path.exists(p) for p in paths.values())
+    assert sorted(session.fetched) == ["https://img.example/a.jpg", "https://img.example/b.jpg"]
+    # Already cached: served from disk
+    assert cache.prefetch(urls) == paths
+    assert len(session.fetched) == 2
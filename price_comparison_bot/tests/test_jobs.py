@@ -0,0 +1,47 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.jobs import JobManager
+
+
+def test_sites_get_the_query_as_typed():
+    seen = []
+
+    def target(query, progress=None, run_id=None):
+        seen.append((query, run_id))
+        return []
+
+    jobs = JobManager(target)
+    job = jobs.submit("Nothing  Phone 2")
+    deadline = time.time() + 5
+    while not jobs.snapshot(job.id).finished and time.time() < deadline:
+        time.sleep(0.01)
+    jobs.shutdown()
+    assert seen == [("Nothing Phone 2", job.id)]
+    # coalescing uses the order-free key, not the text
+    assert jobs.snapshot(job.id).key == "2 nothing phone"
+
+
+def test_same_query_runs_again_once_finished():
+    release = threading.Event()
+
+    def target(query, progress=None, run_id=None):
+        release.wait(5)
+        return []
+
+    jobs = JobManager(target)
+    first = jobs.submit("iPhone 17")
+    # A respelling while the first run is unfinished polls that run
+    assert jobs.submit("iphone   17").id == first.id
+    release.set()
+    deadline = time.time() + 5
+    while not jobs.snapshot(first.id).finished and time.time() < deadline:
+        time.sleep(0.01)
+    # Pressing Search again after it finished refreshes the prices
+    again = jobs.submit("iPhone 17")
+    jobs.shutdown()
+    assert again.id != first.id
@@ -0,0 +1,124 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import matcher, patterns
+from utils.product import Product
+
+
+def test_plain_query_prefers_the_base_model_over_variants():
+    listings = [
+        {"title": "Apple iPhone 17 Pro Max (256GB, Silver)"},
+        {"title": "Apple iPhone 17 Pro (256GB, Silver)"},
+        {"title": "Apple iPhone 16 (256GB, Black)"},
+        {"title": "Apple iPhone 17 (256GB, Black)"},
+    ]
+    ranked = [p["title"] for p in matcher.rank_products(listings, "iphone 17")]
+    assert ranked[0] == "Apple iPhone 17 (256GB, Black)"
+    assert ranked[-1] == "Apple iPhone 16 (256GB, Black)"
+    assert matcher.match_product(listings, "iphone 17 pro")["title"] == "Apple iPhone 17 Pro (256GB, Silver)"
+
+
+def test_only_accessories_is_no_match():
+    listings = [{"title": "Spigen Case for iPhone 17"}, {"title": "Tempered Glass for iPhone 17"}]
+    assert matcher.match_product(listings, "iphone 17") is None
+    assert matcher.match_product([], "iphone 17") is None
+
+
+def test_named_scorer_ranks_and_is_recorded(monkeypatch):
+    monkeypatch.setitem(matcher.SCORERS, "shortest", lambda p, q: 100 - len(p["title"]))
+    listings = [{"title": "Apple iPhone 17 (256GB, Black)"}, {"title": "iPhone 17"}]
+    assert matcher.match_product(listings, "iphone 17", scorer="shortest")["title"] == "iPhone 17"
+    assert listings[1]["match_scorer"] == "shortest"
+    # Rows scored by another scorer are rescored, not reused
+    matcher.rank_products(listings, "iphone 17")
+    assert listings[0]["match_scorer"] == matcher.DEFAULT_SCORER
+    assert listings[0]["match_score"] == matcher.get_match_score(listings[0], "iphone 17")
+    with pytest.raises(KeyError):
+        matcher.get_scorer("missing")
+
+
+def test_negative_keywords_match_whole_words_only():
+    found = patterns.negative_keywords().find_all("leather case for showcase")
+    assert found == {"case"}
+    assert patterns.negative_keywords().find_all("showcased encased") == set()
+
+
+def test_gorilla_glass_is_not_an_accessory():
+    title = "Samsung Galaxy S24 Ultra 5G (Titanium Black, 256GB) Corning Gorilla Glass Armor"
+    assert matcher.get_match_score({"title": title}, "samsung galaxy s24 ultra") > 0
+
+
+def test_bundled_adapter_is_not_an_accessory():
+    title = "Apple MacBook Air M3 (8GB RAM, 256GB SSD) with USB-C Power Adapter"
+    assert matcher.get_match_score({"title": title}, "macbook air m3") > 0
+
+
+def test_leading_generic_word_marks_an_accessory():
+    phone = {"title": "Apple iPhone 17 (256GB, Black)"}
+    glass = {"title": "Glass Screen Protector for Apple iPhone 17"}
+    adapter = {"title": "Adapter 20W USB-C for iPhone 17"}
+    assert matcher.get_match_score(glass, "iphone 17") < 0
+    assert matcher.get_match_score(adapter, "iphone 17") < 0
+    assert matcher.match_product([glass, adapter, phone], "iphone 17") is phone
+
+
+def test_accessory_query_keeps_its_accessories():
+    case = {"title": "Spigen Rugged Armor Case for iPhone 17"}
+    assert matcher.get_match_score(case, "iphone 17 case") > 0
+
+
+def test_flipkart_risk_signals_ignore_ordinary_text():
+    signals = patterns.risk_signals("flipkart")
+    assert not signals.find_all("verify your order details before checkout")
+    assert signals.find_all("please verify you are a human")
+
+
+def test_product_key_agrees_across_sites():
+    titles = [
+        "Samsung Galaxy S24 Ultra 5G AI Smartphone (Titanium Gray, 12GB, 256GB Storage)",
+        "SAMSUNG Galaxy S24 Ultra 5G (Titanium Gray, 256 GB)",
+        "Samsung Galaxy S24 Ultra 5G 256 GB, 12 GB RAM, Titanium Gray, Mobile Phone",
+    ]
+    assert {matcher.product_key(t) for t in titles} == {"samsung galaxy s24 ultra 256gb"}
+
+    pixel = ["Google Pixel 9 Pro (Obsidian, 256GB)", "Pixel 9 Pro 256 GB Obsidian"]
+    assert {matcher.product_key(t) for t in pixel} == {"google pixel 9 pro 256gb"}
+
+
+def test_product_key_drops_colours_and_keeps_brand():
+    assert matcher.product_key("Apple iPhone 17 256GB Black") == "apple iphone 17 256gb"
+    assert matcher.product_key("Apple iPhone 17 (256GB, Black)") == "apple iphone 17 256gb"
+    assert matcher.product_key("iphone 17") == "apple iphone 17"
+
+
+def test_product_key_separates_brands_with_the_same_model_number():
+    oneplus = matcher.product_key("OnePlus 13 (Black Eclipse, 12GB RAM, 256GB)")
+    xiaomi = matcher.product_key("Xiaomi 13 5G (256GB)")
+    assert oneplus == "oneplus 13 256gb"
+    assert xiaomi == "xiaomi 13 256gb"
+
+
+def test_canonical_query_keeps_brands_the_model_does_not_imply():
+    assert matcher.canonical_query("Nothing Phone 2") == "nothing phone 2"
+    assert matcher.canonical_query("hp victus 15") == "hp victus 15"
+    assert matcher.canonical_query("sony wh1000xm5") == "sony wh1000xm5"
+    assert matcher.canonical_query("Apple i Phone17 128 GB") == "iphone 17 128gb"
+
+
+def test_query_key_merges_spellings_and_word_order():
+    assert matcher.query_key("17 pro iphone") == matcher.query_key("Apple iPhone 17 Pro")
+    assert matcher.product_key("17 pro iphone").split()[0] == "apple"
+
+
+def test_scores_cached_for_another_query_are_recomputed():
+    product = Product(title="Apple iPhone 17 Pro (256GB, Silver)")
+    matcher.score_products([product], "iphone 17 pro")
+    pro_score = product.match_score
+    matcher.score_products([product], "iphone 17")
+    assert product.match_query == "iphone 17"
+    assert product.match_score < pro_score
+    assert product.match_score == matcher.get_match_score(product, "iphone 17")
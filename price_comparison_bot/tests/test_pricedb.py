@@ -0,0 +1,176 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.pricedb import PriceDB
+from utils.product import Product
+
+
+def test_rekey_moves_listings_to_the_current_product_key(tmp_path):
+    db = PriceDB(str(tmp_path / "prices.db"))
+    db.record_run([Product(title="Apple iPhone 17 256GB Black", price_paise=7990000, site="Croma", url="https://www.croma.com/p/1")])
+    # A database written by the previous (brand-less, colour-keeping) key
+    with db.conn:
+        db.conn.execute("UPDATE products SET key = 'iphone 17 black 256gb'")
+    assert db.rekey_products() == 1
+    assert [key for key, _ in db.product_keys()] == ["apple iphone 17 256gb"]
+    db.close()
+
+
+DAY = 86400
+
+
+def phone(rupees=79900):
+    return Product(title="Apple iPhone 17 256GB Black", price_paise=rupees * 100, site="Croma", url="https://www.croma.com/p/1")
+
+
+def test_unchanged_listing_keeps_one_observation_per_day(tmp_path, monkeypatch):
+    db = PriceDB(str(tmp_path / "prices.db"))
+    start = 1_700_000_000
+    assert db.record_run([phone()], observed_at=start)
+    # Seen every few hours for 40 days at the same price
+    for hour in range(6, 40 * 24, 6):
+        assert db.record_run([phone()], observed_at=start + hour * 3600) == []
+    observations = db.conn.execute("SELECT COUNT(*) FROM observations").fetchone()[0]
+    assert observations == 40
+
+    monkeypatch.setattr("time.time", lambda: start + 40 * DAY)
+    stats = db.price_stats("apple iphone 17 256gb", days=30)
+    assert stats["min_paise"] == stats["max_paise"] == 7990000
+    assert db.price_chart("apple iphone 17 256gb", days=30)["points"]
+    db.close()
+
+
+def test_card_and_product_page_records_of_one_listing_are_unchanged(tmp_path):
+    db = PriceDB(str(tmp_path / "prices.db"))
+    card = Product(
+        title="Apple iPhone 17 256GB Black", price_paise=7990000, site="Croma",
+        url="https://www.croma.com/apple-iphone-17-256gb-black/p/300001",
+        image="https://media.croma.com/plp/300001.png",
+    )
+    page = Product(
+        title="Apple iPhone 17 256GB Black", price_paise=7990000, site="Croma",
+        url="https://www.croma.com/p/300001",
+        image="https://media.croma.com/pdp/300001-1.png",
+    )
+    assert db.record_run([card], observed_at=1000)
+    for i, record in enumerate([page, card, page], start=1):
+        assert db.record_run([record], observed_at=1000 + i * 3600) == []
+    assert db.conn.execute("SELECT COUNT(*) FROM observations").fetchone()[0] == 1
+    db.close()
+
+
+def test_fingerprint_lookup_is_chunked(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.pricedb.FINGERPRINT_CHUNK", 2)
+    db = PriceDB(str(tmp_path / "prices.db"))
+    listings = [
+        Product(title=f"Apple iPhone 17 256GB {i}", price_paise=100, site="Croma", url=f"https://www.croma.com/p/{i}")
+        for i in range(5)
+    ]
+    assert len(db.record_run(listings, observed_at=1000)) == 5
+    assert db.record_run(listings, observed_at=2000) == []
+    db.close()
+
+
+def test_query_log_merges_word_order_variants(tmp_path):
+    db = PriceDB(str(tmp_path / "prices.db"))
+    db.log_query("iPhone 17 Pro", observed_at=1000)
+    db.log_query("17 pro iphone", observed_at=1001)
+    assert db.query_counts() == [("17 pro iphone", 2)]
+    db.log_search("iphone 17", ["Croma"], observed_at=1000)
+    assert db.searched_sites("17 iphone pro", since=0) == {"Croma"}
+    db.close()
+
+
+def test_flipkart_variants_of_one_item_are_separate_listings(tmp_path):
+    db = PriceDB(str(tmp_path / "prices.db"))
+    item = "https://www.flipkart.com/apple-iphone-17/p/itm0f37c2240b217"
+    variants = [
+        Product(title="Apple iPhone 17 (Black, 256 GB)", price_paise=7990000, site="Flipkart", url=f"{item}?pid=MOBH4DQF9DHZJZQK"),
+        Product(title="Apple iPhone 17 (Black, 512 GB)", price_paise=9990000, site="Flipkart", url=f"{item}?pid=MOBH4DQFZGHEHDQM"),
+    ]
+    assert len(db.record_run(variants, observed_at=1000)) == 2
+    rows = db.listings()
+    assert sorted(r["native_id"] for r in rows) == ["MOBH4DQF9DHZJZQK", "MOBH4DQFZGHEHDQM"]
+    assert {r["url"] for r in rows} == {v.url for v in variants}
+    db.close()
+
+
+def test_catalog_answers_keep_image_mrp_and_availability(tmp_path):
+    from utils.catalog import Catalog
+
+    db = PriceDB(str(tmp_path / "prices.db"))
+    page = Product(
+        title="Apple iPhone 17 256GB Black", price_paise=7990000, site="Croma",
+        url="https://www.croma.com/p/300001", image="https://media.croma.com/pdp/300001-1.png",
+        mrp_paise=8290000, availability="in_stock",
+    )
+    # A later search card shows neither the MRP nor the stock state
+    card = Product(
+        title="Apple iPhone 17 256GB Black", price_paise=7990000, site="Croma",
+        url="https://www.croma.com/apple-iphone-17-256gb-black/p/300001",
+    )
+    assert db.record_run([page], observed_at=1000)
+    assert db.record_run([card], observed_at=2000) == []
+
+    answer = Catalog(db).products("iphone 17", now=3000)["Croma"][0]
+    assert answer.image == page.image
+    assert (answer.mrp_paise, answer.availability) == (8290000, "in_stock")
+    db.close()
+
+
+def test_price_chart_reads_rollups_at_the_window_resolution(tmp_path, monkeypatch):
+    db = PriceDB(str(tmp_path / "prices.db"))
+    day = 19676 * DAY  # a UTC midnight
+    amazon = Product(title="Apple iPhone 17 256GB Black", price_paise=8190000, site="Amazon", url="https://www.amazon.in/dp/B0TEST0017")
+    db.record_run([phone(79900), amazon], observed_at=day + 3600)
+    db.record_run([phone(78900)], observed_at=day + 5 * 3600)
+    db.record_run([phone(79400)], observed_at=day + 5 * 3600 + 1800)
+    db.record_run([phone(77900)], observed_at=day + DAY + 3600)
+    monkeypatch.setattr("time.time", lambda: day + 2 * DAY)
+
+    hourly = db.price_chart("apple iphone 17 256gb", days=2)
+    assert hourly["resolution"] == "hour"
+    assert [(p["min_paise"], p["max_paise"], p["last_paise"]) for p in hourly["points"]] == [
+        (7990000, 8190000, 7990000),
+        (7890000, 7940000, 7940000),
+        (7790000, 7790000, 7790000),
+    ]
+    daily = db.price_chart("apple iphone 17 256gb", days=365)
+    assert daily["resolution"] == "day"
+    assert [(p["bucket"][:10], p["min_paise"], p["max_paise"]) for p in daily["points"]] == [
+        ("2023-11-15", 7890000, 8190000),
+        ("2023-11-16", 7790000, 7790000),
+    ]
+    per_site = db.price_chart("apple iphone 17 256gb", days=365, per_site=True)
+    assert [(p["site"], p["last_paise"]) for p in per_site["points"]] == [("Amazon", 8190000), ("Croma", 7940000), ("Croma", 7790000)]
+
+    # Rebuilt from raw observations, the rollups come out the same
+    assert db.rebuild_rollups() == 5
+    assert db.price_chart("apple iphone 17 256gb", days=2) == hourly
+    assert db.price_chart("apple iphone 17 256gb", days=365, per_site=True) == per_site
+    db.close()
+
+
+def test_search_prefix_matches_words_and_requires_model_numbers(tmp_path):
+    db = PriceDB(str(tmp_path / "prices.db"))
+    db.record_run([
+        Product(title="Apple iPhone 16 128GB Black", price_paise=6990000, site="Croma", url="https://www.croma.com/p/16"),
+        Product(title="Apple iPhone 16 Pro 256GB Desert", price_paise=11990000, site="Croma", url="https://www.croma.com/p/161"),
+        Product(title="Apple iPhone 17 256GB Black", price_paise=7990000, site="Croma", url="https://www.croma.com/p/17"),
+        Product(title="Apple iPhone 16 (128 GB) - Black", price_paise=6890000, site="Amazon", url="https://www.amazon.in/dp/B0TEST0016"),
+    ])
+    hits = db.search("iph 16")
+    assert {(r["site"], r["native_id"]) for r in hits} == {("Amazon", "B0TEST0016"), ("Croma", "16"), ("Croma", "161")}
+    assert all(r["price_paise"] for r in hits)
+    # Storage is an attribute too, so "128gb" narrows to that variant
+    assert {r["title"] for r in db.search("iphone 128gb")} == {"Apple iPhone 16 128GB Black", "Apple iPhone 16 (128 GB) - Black"}
+    assert [r["native_id"] for r in db.search("iphone 16", per_site=1) if r["site"] == "Croma"] == ["16"]
+    assert db.search("iphone 15") == []
+    assert db.search("!!") == []
+    # A listing whose title changes is re-indexed under the new title
+    db.record_run([Product(title="Apple iPhone 17 256GB Lavender", price_paise=7990000, site="Croma", url="https://www.croma.com/p/17")])
+    assert db.search("iphone 17 black") == []
+    assert [r["title"] for r in db.search("iphone 17 lav")] == ["Apple iPhone 17 256GB Lavender"]
+    db.close()
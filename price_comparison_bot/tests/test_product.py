@@ -0,0 +1,76 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import matcher
+from utils.batch import PRICE_MISSING, ProductBatch, parse_price_column
+from utils.product import Product, native_id, parse_price, price_label
+
+
+def test_parse_price_strips_currency_prefixes():
+    assert parse_price("Rs. 1,999") == 199900
+    assert parse_price("Rs.1,999.50") == 199950
+    assert parse_price("INR 54,900") == 5490000
+    assert parse_price("₹1,74,900.00") == 17490000
+    assert parse_price("Rs.") is None
+
+
+def test_parse_price_column_strips_currency_prefixes():
+    column = parse_price_column(["Rs. 1,999", "₹54,900", "INR 799", None, "rs 10"])
+    assert column.tolist() == [199900, 5490000, 79900, PRICE_MISSING, 1000]
+
+
+def test_missing_price_is_one_value_everywhere():
+    product = Product(title="Apple iPhone 17", site="Amazon")
+    assert product.price is None
+    assert ProductBatch.from_products([product]).price_strings().tolist() == [None]
+    assert price_label(product.price_paise) == "N/A"
+    assert price_label(199900) == "₹1999.00"
+
+
+def test_batch_rank_rescores_rows_scored_for_another_query():
+    product = Product(title="Apple iPhone 17 Pro (256GB, Silver)", site="Croma")
+    matcher.score_products([product], "iphone 17 pro")
+    batch = ProductBatch.from_products([product]).rank("iphone 17")
+    assert batch.match_score[0] == matcher.get_match_score(product, "iphone 17")
+
+
+def test_flipkart_urls_keep_the_variant_pid():
+    pytest.importorskip("selenium")
+    from scrapers.flipkart_scraper import clean_flipkart_url
+
+    url = clean_flipkart_url(
+        "https://www.flipkart.com/apple-iphone-17/p/itm0f37c2240b217"
+        "?pid=MOBH4DQF9DHZJZQK&lid=LSTMOB&marketplace=FLIPKART&sattr[]=color"
+    )
+    assert url == "https://www.flipkart.com/apple-iphone-17/p/itm0f37c2240b217?pid=MOBH4DQF9DHZJZQK"
+
+
+def test_flipkart_listings_are_keyed_on_pid():
+    item = "https://www.flipkart.com/apple-iphone-17/p/itm0f37c2240b217"
+    assert native_id("Flipkart", f"{item}?pid=MOBH4DQF9DHZJZQK") == "MOBH4DQF9DHZJZQK"
+    # Links without a pid fall back to the item id
+    assert native_id("Flipkart", item) == "itm0f37c2240b217"
+
+
+def test_batch_keeps_the_best_match_per_site_and_recommends_in_stock():
+    croma = ProductBatch.from_records([
+        {"title": "Apple iPhone 17 (256GB, Black)", "price": "₹79,900", "availability": "out_of_stock"},
+        {"title": "Spigen Case for iPhone 17", "price": "₹999"},
+    ], "Croma")
+    amazon = ProductBatch.from_products([
+        Product(title="Apple iPhone 17 Pro (256GB, Silver)", price_paise=12990000, site="Amazon"),
+        Product(title="Apple iPhone 17 (256GB, Black)", price_paise=8190000, site="Amazon"),
+    ])
+    batch = ProductBatch.concat([croma, amazon]).rank("iphone 17")
+    best = batch.best_per_site().mark_cheapest()
+    assert best.site_column().tolist() == ["Croma", "Amazon"]
+    assert best.price_paise.tolist() == [7990000, 8190000]
+    # The cheaper Croma row is out of stock, so Amazon is recommended
+    assert best.recommended.tolist() == [False, True]
+    products = best.to_products()
+    assert [p.site for p in products if p.recommended] == ["Amazon"]
+    assert products[0].availability == "out_of_stock"
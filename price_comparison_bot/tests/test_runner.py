@@ -0,0 +1,187 @@
+import json
+import os
+import sys
+import threading
+import time
+import types
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from orchestrator import runner, scheduler
+from utils.pricedb import PriceDB
+from utils.product import Product
+
+
+def test_variant_without_known_listing_is_searched_live(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db = PriceDB()
+    db.record_run([Product(title="Apple iPhone 17 256GB Black", price_paise=7990000, site="Croma", url="https://www.croma.com/p/1")])
+    db.log_search("iphone 17", ["Croma", "Amazon"])
+    db.close()
+
+    refreshed, stored = runner.refresh_from_catalog("iphone 17 pro")
+    assert refreshed == {} and stored == set()
+
+    refreshed, stored = runner.refresh_from_catalog("iphone 17")
+    assert set(refreshed) == {"Croma"} and stored == {"Croma"}
+
+
+def test_stale_listings_are_refreshed_from_their_product_pages(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    module = types.ModuleType("fake_croma_scraper")
+    module.Session = object
+    module.fetch_product = lambda session, url: Product(
+        title="Apple iPhone 17 256GB Black", price_paise=7890000, site="Croma", url=url
+    )
+    monkeypatch.setitem(sys.modules, "fake_croma_scraper", module)
+    monkeypatch.setitem(scheduler.SITE_CLIENTS, "Croma", ("fake_croma_scraper", "Session"))
+    monkeypatch.setitem(scheduler.SITE_LIMITS, "Croma", {"concurrency": 1, "min_gap": 0})
+    url = "https://www.croma.com/p/300001"
+    db = PriceDB()
+    stale = time.time() - runner.FRESH_SECONDS - 60
+    db.record_run([Product(title="Apple iPhone 17 256GB Black", price_paise=7990000, site="Croma", url=url)], observed_at=stale)
+    db.close()
+
+    # Offline, the stored price answers
+    refreshed, stored = runner.refresh_from_catalog("iphone 17", live=False)
+    assert [p.price_paise for p in refreshed["Croma"]] == [7990000] and stored == {"Croma"}
+
+    # Live, the stale listing is re-read from its own URL instead of searched
+    refreshed, stored = runner.refresh_from_catalog("iphone 17")
+    assert stored == set()
+    assert [(p.url, p.price_paise) for p in refreshed["Croma"]] == [(url, 7890000)]
+
+
+def test_scraper_without_output_is_not_marked_searched(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Exits 0 like the Croma and Reliance scrapers do after swallowing an error
+    script = tmp_path / "quiet_scraper.py"
+    script.write_text("import sys\nsys.exit(0)\n")
+    # Output left behind by an earlier query
+    (tmp_path / "croma_output.json").write_text(json.dumps({"products": [{"title": "Apple iPhone 16", "price": "59900"}]}))
+    monkeypatch.setattr(runner, "SCRAPERS", [{"name": "Croma", "script": str(script), "output": "croma_output.json"}])
+
+    statuses = []
+    results = runner.run_orchestrator("iphone 17", live=False, progress=lambda site, status, products=(): statuses.append(status))
+    assert results == []
+    assert statuses[-1] == "failed"
+    db = PriceDB()
+    try:
+        assert db.searched_sites("iphone 17", since=0) == set()
+    finally:
+        db.close()
+
+
+def test_product_page_price_reaches_database_alerts_and_export(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    url = "https://www.croma.com/apple-iphone-17/p/300001"
+    card = {"title": "Apple iPhone 17 (256GB, Black)", "price": "82,900", "url": url}
+    script = tmp_path / "card_scraper.py"
+    script.write_text(
+        "import json\n"
+        f"json.dump({{'products': [{card!r}]}}, open('croma_output.json', 'w'))\n"
+    )
+    monkeypatch.setattr(runner, "SCRAPERS", [{"name": "Croma", "script": str(script), "output": "croma_output.json"}])
+    monkeypatch.setattr(runner.time, "sleep", lambda seconds: None)
+    page = Product(title=card["title"], price_paise=7990000, site="Croma", url=url, availability="in_stock")
+    monkeypatch.setattr(runner, "fetch_details", lambda cards: {url: page})
+
+    from utils.alerts import AlertEngine, WATCHES_PATH, ALERTS_PATH
+    engine = AlertEngine(path=WATCHES_PATH)
+    engine.add_watch("iPhone 17", 80000 * 100)
+    engine.save()
+
+    results = runner.run_orchestrator("iphone 17", run_id="run1")
+    assert [p.price_paise for p in results] == [7990000]
+
+    with open(ALERTS_PATH, encoding="utf-8") as f:
+        assert [json.loads(line)["price_paise"] for line in f] == [7990000]
+    with open(os.path.join("data", "runs", "run1", "all_listings.json"), encoding="utf-8") as f:
+        listings = json.load(f)
+    assert [(r["price_paise"], r["availability"]) for r in listings] == [(7990000, "in_stock")]
+    db = PriceDB()
+    try:
+        assert db.latest_prices("apple iphone 17 256gb")[0]["price_paise"] == 7990000
+    finally:
+        db.close()
+
+
+def test_variant_follow_up_is_answered_from_the_catalog_with_its_own_listing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    item = "https://www.flipkart.com/apple-iphone-17/p/itm0f37c2240b217"
+    db = PriceDB()
+    db.record_run([
+        Product(
+            title="Apple iPhone 17 (Black, 256 GB)", price_paise=7990000, site="Flipkart",
+            url=f"{item}?pid=MOBH4DQF9DHZJZQK", image="https://img.flipkart.com/256.jpg",
+            mrp_paise=8290000, availability="in_stock",
+        ),
+        Product(
+            title="Apple iPhone 17 (Black, 512 GB)", price_paise=9990000, site="Flipkart",
+            url=f"{item}?pid=MOBH4DQFZGHEHDQM", image="https://img.flipkart.com/512.jpg",
+            mrp_paise=10290000, availability="out_of_stock",
+        ),
+    ])
+    # The first search, for the base model, saw both variants
+    db.log_search("iphone 17", ["Flipkart"])
+    db.close()
+
+    refreshed, stored = runner.refresh_from_catalog("iphone 17 512gb")
+    assert stored == {"Flipkart"}
+    [answer] = refreshed["Flipkart"]
+    assert answer.url.endswith("pid=MOBH4DQFZGHEHDQM")
+    assert (answer.price_paise, answer.mrp_paise, answer.availability) == (9990000, 10290000, "out_of_stock")
+    assert answer.image == "https://img.flipkart.com/512.jpg"
+
+
+def test_detail_workers_have_stopped_when_fetch_details_returns(monkeypatch):
+    lock = threading.Lock()
+    calls = {"running": 0, "started": 0}
+
+    def fetch_product(session, url):
+        with lock:
+            calls["running"] += 1
+            calls["started"] += 1
+        time.sleep(0.2)
+        with lock:
+            calls["running"] -= 1
+        return Product(title="Apple iPhone 17", price_paise=100, site="Croma", url=url)
+
+    module = types.ModuleType("slow_croma_scraper")
+    module.Session = object
+    module.fetch_product = fetch_product
+    monkeypatch.setitem(sys.modules, "slow_croma_scraper", module)
+    monkeypatch.setitem(scheduler.SITE_CLIENTS, "Croma", ("slow_croma_scraper", "Session"))
+    monkeypatch.setitem(scheduler.SITE_LIMITS, "Croma", {"concurrency": 1, "min_gap": 0})
+
+    cards = [Product(title="Apple iPhone 17", site="Croma", url=f"https://www.croma.com/p/{i}") for i in range(20)]
+    details = runner.fetch_details(cards, deadline=0.5)
+    assert 0 < len(details) < len(cards)
+    assert calls["running"] == 0
+    started = calls["started"]
+    time.sleep(0.5)
+    assert calls["started"] == started
+
+
+def test_every_matched_listing_is_exported_not_just_the_winner(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cards = [
+        {"title": "Apple iPhone 17 (256GB, Black)", "price": "79,900", "url": "https://www.croma.com/p/300001"},
+        {"title": "Apple iPhone 17 (512GB, Black)", "price": "99,900", "url": "https://www.croma.com/p/300002"},
+        {"title": "Apple iPhone 17 Pro (256GB, Silver)", "price": "1,29,900", "url": "https://www.croma.com/p/300003"},
+        {"title": "Spigen Case for iPhone 17", "price": "999", "url": "https://www.croma.com/p/300004"},
+    ]
+    script = tmp_path / "card_scraper.py"
+    script.write_text(
+        "import json\n"
+        f"json.dump({{'products': {cards!r}}}, open('croma_output.json', 'w'))\n"
+    )
+    monkeypatch.setattr(runner, "SCRAPERS", [{"name": "Croma", "script": str(script), "output": "croma_output.json"}])
+    monkeypatch.setattr(runner.time, "sleep", lambda seconds: None)
+
+    results = runner.run_orchestrator("iphone 17", live=False, run_id="run1")
+    assert [p.price_paise for p in results] == [7990000]
+    with open(os.path.join("data", "runs", "run1", "all_listings.json"), encoding="utf-8") as f:
+        listings = json.load(f)
+    # Every variant, cheapest first; the accessory did not match
+    assert [r["price_paise"] for r in listings] == [7990000, 9990000, 12990000]
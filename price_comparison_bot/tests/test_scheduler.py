@@ -0,0 +1,212 @@
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from orchestrator import scheduler
+from orchestrator.scheduler import SiteLimiter
+
+
+class WebDriverException(Exception):
+    pass
+
+
+class NoSuchElementException(WebDriverException):
+    pass
+
+
+class FakeDriver:
+    def __init__(self):
+        self.quit_called = False
+
+    def quit(self):
+        self.quit_called = True
+
+
+class FakeLimiter(SiteLimiter):
+    def __init__(self):
+        super().__init__("Amazon")
+        self.drivers = []
+
+    def _client(self, client):
+        if client is None:
+            client = FakeDriver()
+            self.drivers.append(client)
+            self._clients.append(client)
+        return client
+
+
+@pytest.fixture
+def limiter():
+    return FakeLimiter()
+
+
+def test_dead_client_is_quit_and_replaced(limiter):
+    def crash(driver):
+        raise WebDriverException("chrome not reachable")
+
+    with pytest.raises(WebDriverException):
+        limiter.run(crash)
+    first = limiter.drivers[0]
+    assert first.quit_called
+    assert limiter.run(lambda driver: driver) is not first
+
+
+def test_page_errors_keep_the_client(limiter):
+    def missing(driver):
+        raise NoSuchElementException("no price")
+
+    with pytest.raises(NoSuchElementException):
+        limiter.run(missing)
+    first = limiter.drivers[0]
+    assert not first.quit_called
+    assert limiter.run(lambda driver: driver) is first
+
+
+def test_connection_errors_count_as_dead():
+    assert scheduler.client_is_dead(ConnectionResetError())
+    assert not scheduler.client_is_dead(ValueError())
+
+
+def test_fetch_many_raises_dead_client_errors_after_earlier_pages(monkeypatch):
+    module = types.ModuleType("fake_http_scraper")
+
+    def fetch_product(session, url):
+        if url == "dead":
+            raise ConnectionResetError("connection reset")
+        if url == "bad":
+            raise ValueError("no price")
+        return url.upper()
+
+    module.fetch_product = fetch_product
+    monkeypatch.setitem(sys.modules, "fake_http_scraper", module)
+    monkeypatch.setitem(scheduler.SITE_CLIENTS, "Croma", ("fake_http_scraper", "Session"))
+    monkeypatch.setitem(scheduler.SITE_LIMITS, "Croma", {"concurrency": 2, "min_gap": 0})
+
+    read = []
+    with pytest.raises(ConnectionResetError):
+        for url, result in scheduler.fetch_many(object(), "Croma", ["a", "bad", "dead", "b"]):
+            read.append((url, result if not isinstance(result, Exception) else "error"))
+    assert read == [("a", "A"), ("bad", "error")]
+
+
+def fake_http_site(monkeypatch):
+    module = types.ModuleType("fake_http_scraper")
+    module.fetch_product = lambda session, url: url.upper()
+    monkeypatch.setitem(sys.modules, "fake_http_scraper", module)
+    monkeypatch.setitem(scheduler.SITE_CLIENTS, "Croma", ("fake_http_scraper", "Session"))
+
+
+def fake_clock(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(scheduler.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(scheduler.time, "sleep", lambda s: clock.__setitem__(0, clock[0] + s))
+    return clock
+
+
+def test_http_pages_share_the_limiter_min_gap(monkeypatch):
+    fake_http_site(monkeypatch)
+    clock = fake_clock(monkeypatch)
+    limiter = SiteLimiter("Croma", concurrency=2, min_gap=3)
+    starts = []
+
+    def read(session):
+        for url, _ in scheduler.fetch_many(session, "Croma", ["a", "b", "c"], limiter=limiter):
+            starts.append(clock[0])
+
+    monkeypatch.setattr(limiter, "_client", lambda client: object())
+    limiter.run(read)
+    assert starts == [100.0, 103.0, 106.0]
+    # The next request through the limiter waits its turn after the batch
+    limiter.wait_turn()
+    assert clock[0] == 109.0
+
+
+def test_pages_without_a_limiter_wait_the_site_min_gap(monkeypatch):
+    fake_http_site(monkeypatch)
+    clock = fake_clock(monkeypatch)
+    starts = []
+    for url, _ in scheduler.fetch_many(object(), "Croma", ["a", "b", "c"]):
+        starts.append(clock[0])
+    gap = scheduler.SITE_LIMITS["Croma"]["min_gap"]
+    assert starts == [100.0, 100.0 + gap, 100.0 + 2 * gap]
+
+
+def test_limiter_turn_after_the_deadline_is_not_taken(monkeypatch):
+    clock = fake_clock(monkeypatch)
+    limiter = SiteLimiter("Croma", min_gap=3)
+    assert limiter.wait_turn(deadline=105.0)
+    assert not limiter.wait_turn(deadline=102.0)
+    assert clock[0] == 100.0
+
+
+class FakeTabs:
+    """Just enough WebDriver for a TabPool: every page loads at once."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.current_window_handle = "tab0"
+        self.window_handles = ["tab0"]
+        self.opened = []  # (tab, url, time)
+        self.switch_to = self
+
+    def new_window(self, kind):
+        self.current_window_handle = f"tab{len(self.window_handles)}"
+        self.window_handles.append(self.current_window_handle)
+
+    def window(self, handle):
+        self.current_window_handle = handle
+
+    def close(self):
+        pass
+
+    def execute_script(self, script, *args):
+        if args:
+            self.opened.append((self.current_window_handle, args[0], self.clock[0]))
+        return True
+
+
+def load_in_tabs(monkeypatch, tabs):
+    module = types.ModuleType("fake_browser_scraper")
+    module.read_product = lambda driver, url: url.upper()
+    monkeypatch.setitem(sys.modules, "fake_browser_scraper", module)
+    monkeypatch.setitem(scheduler.SITE_CLIENTS, "Amazon", ("fake_browser_scraper", "build_driver"))
+    monkeypatch.setitem(scheduler.TAB_LIMITS, "Amazon", {"tabs": tabs, "gap": 4})
+    clock = fake_clock(monkeypatch)
+    driver = FakeTabs(clock)
+    limiter = SiteLimiter("Amazon", min_gap=20)
+    limiter.wait_turn()  # taken by SiteLimiter.run for the first page
+    urls = [f"p{i}" for i in range(6)]
+    pages = dict(scheduler.fetch_many(driver, "Amazon", urls, limiter=limiter))
+    assert pages == {url: url.upper() for url in urls}
+    return driver.opened, limiter
+
+
+def test_tabs_multiply_page_loads_while_each_tab_keeps_the_min_gap(monkeypatch):
+    one_tab, _ = load_in_tabs(monkeypatch, tabs=1)
+    three_tabs, limiter = load_in_tabs(monkeypatch, tabs=3)
+
+    def elapsed(opened):
+        return opened[-1][2] - opened[0][2]
+
+    assert elapsed(one_tab) == 100.0  # one page per min_gap
+    assert elapsed(three_tabs) == 28.0  # three pages per min_gap, 4 s apart
+    by_tab = {}
+    for tab, _, at in three_tabs:
+        by_tab.setdefault(tab, []).append(at)
+    assert len(by_tab) == 3
+    for starts in by_tab.values():
+        assert all(b - a >= 20 for a, b in zip(starts, starts[1:]))
+    # The limiter's next turn comes min_gap after the last navigation
+    assert limiter._next_start == three_tabs[-1][2] + 20
+
+
+def test_warm_budget_counts_page_loads_per_min_gap_and_tab():
+    from orchestrator.warmer import site_budget, task_cost
+
+    assert site_budget("Amazon", window=600) == 90
+    assert site_budget("Croma", window=600) == 200
+    assert task_cost("Amazon", "search") == 3 and task_cost("Croma", "search") == 1
@@ -0,0 +1,21 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.product import Product
+
+
+def test_croma_keeps_every_product_after_a_match_in_a_truncated_batch(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # the scraper opens croma.log on import
+    from scrapers import croma_scraper
+
+    page = [Product(title=f"Cable {i}", site="Croma") for i in range(12)]
+    page[6] = Product(title="Apple iPhone 17", site="Croma")
+    monkeypatch.setattr(croma_scraper, "MAX_DEPTH", 7)
+    monkeypatch.setattr(croma_scraper, "fetch_products", lambda session, query, page_no=0: {})
+    monkeypatch.setattr(croma_scraper, "parse_products", lambda data: list(page))
+
+    products = croma_scraper.collect_products(None, "iphone 17")
+    # Products 5-6 form the batch cut at MAX_DEPTH; 7 onwards follow it
+    assert [p.title for p in products] == [p.title for p in page]
@@ -0,0 +1,79 @@
+import json
+import os
+import sys
+import time
+import types
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from orchestrator import scheduler
+from orchestrator.warmer import WARM_AGE, CacheWarmer
+from utils.alerts import ALERTS_PATH, WATCHES_PATH, AlertEngine
+from utils.pricedb import PriceDB
+from utils.product import Product
+
+URL = "https://www.croma.com/p/300001"
+
+
+def fake_croma(monkeypatch, rupees):
+    module = types.ModuleType("fake_croma_scraper")
+    module.Session = object
+    module.fetch_product = lambda session, url: Product(
+        title="Apple iPhone 17 256GB Black", price_paise=rupees * 100, site="Croma", url=url
+    )
+    monkeypatch.setitem(sys.modules, "fake_croma_scraper", module)
+    monkeypatch.setitem(scheduler.SITE_CLIENTS, "Croma", ("fake_croma_scraper", "Session"))
+    monkeypatch.setitem(scheduler.SITE_LIMITS, "Croma", {"concurrency": 1, "min_gap": 0})
+
+
+def test_drop_recorded_by_the_warmer_fires_a_watch(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    fake_croma(monkeypatch, 78900)
+    db = PriceDB()
+    stale = time.time() - WARM_AGE - 60
+    db.record_run([Product(title="Apple iPhone 17 256GB Black", price_paise=8290000, site="Croma", url=URL)], observed_at=stale)
+    db.log_query("iphone 17")
+
+    warmer = CacheWarmer(db=db, busy=lambda: False, alert_engine=AlertEngine.load())
+    warmer.sites = ["Croma"]
+    # Added from the command line after the warmer started
+    engine = AlertEngine.load()
+    engine.add_watch("iPhone 17", 80000 * 100)
+    engine.save()
+
+    assert warmer.run_once() == {"Croma": 1}
+    with open(ALERTS_PATH, encoding="utf-8") as f:
+        assert [json.loads(line)["price_paise"] for line in f] == [7890000]
+    with open(WATCHES_PATH, encoding="utf-8") as f:
+        assert json.load(f)[0]["last_fired_paise"] == 7890000
+    warmer.close()
+
+
+def test_plan_cuts_each_site_at_its_budget_in_demand_order(tmp_path, monkeypatch):
+    # A 180 s window: three turns of Croma's one tab, two of Amazon's three tabs
+    for site, tabs, gap in (("Croma", 1, 60), ("Amazon", 3, 90)):
+        monkeypatch.setitem(scheduler.SITE_LIMITS, site, {"concurrency": tabs, "min_gap": gap})
+        monkeypatch.setitem(scheduler.TAB_LIMITS, site, {"tabs": tabs, "gap": gap})
+    db = PriceDB(str(tmp_path / "prices.db"))
+    now = time.time()
+    stale = now - WARM_AGE - 60
+    db.record_run([
+        Product(title=f"Apple iPhone {model} 256GB Black", price_paise=7990000, site="Croma", url=f"https://www.croma.com/p/{model}{n}")
+        for model in (16, 17) for n in range(2)
+    ], observed_at=stale)
+    for query, searches in (("iphone 17", 3), ("iphone 16", 2), ("pixel 9", 1)):
+        for _ in range(searches):
+            db.log_query(query, observed_at=now)
+
+    warmer = CacheWarmer(db=db, window=180)
+    warmer.sites = ["Croma", "Amazon"]
+    plan = warmer.plan(now=now)
+    # iphone 16's two refreshes no longer fit after iphone 17's, the cheaper search still does
+    assert plan["Croma"] == [
+        ("refresh", "https://www.croma.com/p/170"),
+        ("refresh", "https://www.croma.com/p/171"),
+        ("search", "pixel 9"),
+    ]
+    # A search-results page takes all three of Amazon's tabs for a turn
+    assert plan["Amazon"] == [("search", "iphone 17"), ("search", "iphone 16")]
+    warmer.close()
@@ -0,0 +1,228 @@
+import bisect
+import json
+import logging
+import os
+import time
+import urllib.request
+import uuid
+from dataclasses import asdict, dataclass
+
+from . import matcher
+from .product import format_price
+
+WATCHES_PATH = os.path.join("data", "watches.json")
+ALERTS_PATH = os.path.join("data", "alerts.jsonl")
+
+# Minimum gap between two deliveries for the same watch
+DEBOUNCE_SECONDS = 6 * 3600
+
+log = logging.getLogger("Alerts")
+
+
+@dataclass
+class Watch:
+    """
+    "Notify me when <product> drops below <threshold> (on <site>)".
+    product_key is the canonical matcher.product_key of the watched query;
+    a key without storage matches every storage size of that model.
+    """
+
+    id: str
+    query: str
+    product_key: str
+    threshold_paise: int
+    site: str | None = None
+    last_fired_at: float | None = None
+    last_fired_paise: int | None = None
+
+
+def watch_key(query):
+    """
+    Product key a watch on `query` is indexed under.
+    """
+    return matcher.product_key(matcher.canonical_query(query))
+
+
+# =========================
+# SINKS
+# =========================
+class FileSink:
+    def __init__(self, path=ALERTS_PATH):
+        self.path = path
+
+    def deliver(self, alert):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(alert, ensure_ascii=False) + "\n")
+
+
+class WebhookSink:
+    """
+    POSTs the alert as JSON. Without a URL it only logs (local stub).
+    """
+
+    def __init__(self, url=None, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def deliver(self, alert):
+        if not self.url:
+            log.info(f"[webhook stub] {alert['message']}")
+            return
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(alert).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class QueueSink:
+    def __init__(self, queue):
+        self.queue = queue
+
+    def deliver(self, alert):
+        self.queue.put(alert)
+
+
+# =========================
+# ENGINE
+# =========================
+class AlertEngine:
+    """
+    Evaluates price observations against watches incrementally. Watches are
+    indexed by canonical product key, each bucket sorted by threshold, so an
+    observation only touches the watches whose threshold it is below.
+    """
+
+    def __init__(self, watches=(), sinks=None, debounce_seconds=DEBOUNCE_SECONDS, path=WATCHES_PATH):
+        self.path = path
+        self.sinks = sinks if sinks is not None else [FileSink()]
+        self.debounce_seconds = debounce_seconds
+        self.watches = {}
+        self._index = {}  # product_key -> (sorted thresholds, watches in same order)
+        for watch in watches:
+            self._add(watch)
+
+    @classmethod
+    def load(cls, path=WATCHES_PATH, **kwargs):
+        watches = []
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                watches = [Watch(**w) for w in json.load(f)]
+        # Keys saved by an older matcher.product_key are recomputed from the query
+        for watch in watches:
+            watch.product_key = watch_key(watch.query)
+        return cls(watches, path=path, **kwargs)
+
+    def reload(self):
+        """
+        Re-reads the saved watches, so a long-running process (the cache
+        warmer) sees watches added or removed since it loaded them.
+        """
+        self.watches = {}
+        self._index = {}
+        for watch in AlertEngine.load(self.path).watches.values():
+            self._add(watch)
+
+    def save(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump([asdict(w) for w in self.watches.values()], f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    # ---------- watch management ----------
+    def _add(self, watch):
+        self.watches[watch.id] = watch
+        thresholds, bucket = self._index.setdefault(watch.product_key, ([], []))
+        i = bisect.bisect_right(thresholds, watch.threshold_paise)
+        thresholds.insert(i, watch.threshold_paise)
+        bucket.insert(i, watch)
+
+    def add_watch(self, query, threshold_paise, site=None):
+        watch = Watch(
+            id=uuid.uuid4().hex[:12],
+            query=query,
+            product_key=watch_key(query),
+            threshold_paise=threshold_paise,
+            site=site,
+        )
+        self._add(watch)
+        return watch
+
+    def remove_watch(self, watch_id):
+        watch = self.watches.pop(watch_id, None)
+        if watch is None:
+            return False
+        thresholds, bucket = self._index[watch.product_key]
+        i = bucket.index(watch)
+        del thresholds[i], bucket[i]
+        return True
+
+    # ---------- evaluation ----------
+    def _candidates(self, product):
+        """
+        Watches triggered by `product`: same canonical product (with or without
+        storage), threshold above the observed price, matching site filter.
+        """
+        key = matcher.product_key(product.title)
+        for lookup in {key, matcher.base_key(key)}:
+            entry = self._index.get(lookup)
+            if not entry:
+                continue
+            thresholds, bucket = entry
+            for watch in bucket[bisect.bisect_right(thresholds, product.price_paise):]:
+                if watch.site is None or watch.site.lower() == product.site.lower():
+                    yield watch
+
+    def observe(self, products, now=None):
+        """
+        Feeds a run's observations through the index and delivers at most one
+        alert per watch (its lowest price), subject to debouncing.
+        Returns the delivered alerts.
+        """
+        now = now or time.time()
+        best = {}
+        for product in products:
+            if product.price_paise is None or not product.title:
+                continue
+            for watch in self._candidates(product):
+                current = best.get(watch.id)
+                if current is None or product.price_paise < current.price_paise:
+                    best[watch.id] = product
+
+        delivered = []
+        for watch_id, product in best.items():
+            watch = self.watches[watch_id]
+            if watch.last_fired_at is not None and now - watch.last_fired_at < self.debounce_seconds:
+                continue
+
+            alert = {
+                "watch_id": watch.id,
+                "query": watch.query,
+                "site": product.site,
+                "title": product.title,
+                "url": product.url,
+                "price_paise": product.price_paise,
+                "threshold_paise": watch.threshold_paise,
+                "observed_at": now,
+                "message": (
+                    f"{product.title} is ₹{format_price(product.price_paise)} on {product.site} "
+                    f"(below ₹{format_price(watch.threshold_paise)})"
+                ),
+            }
+            for sink in self.sinks:
+                try:
+                    sink.deliver(alert)
+                except Exception as e:
+                    log.error(f"Alert delivery failed via {type(sink).__name__}: {e}")
+
+            watch.last_fired_at = now
+            watch.last_fired_paise = product.price_paise
+            delivered.append(alert)
+
+        return delivered
@@ -0,0 +1,123 @@
+import bisect
+import heapq
+
+from . import matcher
+
+# A past search counts this many times more than one catalog listing
+QUERY_WEIGHT = 5
+MAX_SUGGESTIONS = 8
+
+
+def compact(text):
+    """
+    Normalized text without spaces, so "i phone 17" and "iphone17" meet.
+    """
+    return matcher.normalize(text).replace(" ", "")
+
+
+class Autocomplete:
+    """
+    Prefix index over canonical product keys: a sorted array of compacted
+    word-start suffixes ("iphone17pro", "17pro", "pro") searched with bisect,
+    so "i phone 17" and "17 pro" both reach "iphone 17 pro". A range-minimum
+    segment tree over suggestion rank (weight from past searches and catalog
+    listings) pulls the best `limit` suggestions out of a prefix range in
+    O(limit * log n), however many keys share the prefix.
+    """
+
+    def __init__(self, weights):
+        self.suggestions = list(weights)
+        order = sorted(
+            range(len(self.suggestions)),
+            key=lambda i: (-weights[self.suggestions[i]], self.suggestions[i]),
+        )
+        rank = [0] * len(order)
+        for r, i in enumerate(order):
+            rank[i] = r
+
+        entries = set()
+        for i, suggestion in enumerate(self.suggestions):
+            words = suggestion.split()
+            for start in range(len(words)):
+                entries.add(("".join(words[start:]), i))
+        entries = sorted(entries)
+        self.keys = [key for key, _ in entries]
+        self.ids = [i for _, i in entries]
+
+        # Leaf j holds key position j; a node holds the position of its best rank.
+        # Position n is a sentinel ranked below everything.
+        n = len(entries)
+        self._rank = [rank[i] for i in self.ids] + [len(order)]
+        self._size = 1
+        while self._size < n:
+            self._size *= 2
+        tree = [n] * (2 * self._size)
+        tree[self._size:self._size + n] = range(n)
+        for node in range(self._size - 1, 0, -1):
+            left, right = tree[2 * node], tree[2 * node + 1]
+            tree[node] = left if self._rank[left] <= self._rank[right] else right
+        self._tree = tree
+
+    @classmethod
+    def build(cls, db):
+        """
+        Index of every canonical product in the catalog plus every past search,
+        keyed by matcher.product_key (of the canonical query for searches) so
+        spelling variants merge into one entry.
+        """
+        weights = {}
+        for key, listings in db.product_keys():
+            if key:
+                weights[key] = weights.get(key, 0) + listings
+        for query, count in db.query_counts():
+            key = matcher.product_key(matcher.canonical_query(query))
+            if key:
+                weights[key] = weights.get(key, 0) + QUERY_WEIGHT * count
+        return cls(weights)
+
+    def _best(self, lo, hi):
+        """
+        Key position with the best rank in [lo, hi).
+        """
+        best = len(self.keys)
+        lo += self._size
+        hi += self._size
+        while lo < hi:
+            if lo & 1:
+                if self._rank[self._tree[lo]] < self._rank[best]:
+                    best = self._tree[lo]
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                if self._rank[self._tree[hi]] < self._rank[best]:
+                    best = self._tree[hi]
+            lo >>= 1
+            hi >>= 1
+        return best
+
+    def suggest(self, prefix, limit=MAX_SUGGESTIONS):
+        """
+        Up to `limit` canonical queries completing `prefix`, best first.
+        """
+        key = compact(prefix)
+        if not key:
+            return []
+        lo = bisect.bisect_left(self.keys, key)
+        hi = bisect.bisect_left(self.keys, key + "\x7f", lo)
+        if lo >= hi:
+            return []
+
+        # Best-first expansion: pop a range's best key, then split around it
+        best = self._best(lo, hi)
+        heap = [(self._rank[best], best, lo, hi)]
+        found = []
+        while heap and len(found) < limit:
+            _, pos, lo, hi = heapq.heappop(heap)
+            suggestion = self.suggestions[self.ids[pos]]
+            if suggestion not in found:
+                found.append(suggestion)
+            for a, b in ((lo, pos), (pos + 1, hi)):
+                if a < b:
+                    p = self._best(a, b)
+                    heapq.heappush(heap, (self._rank[p], p, a, b))
+        return found
@@ -0,0 +1,300 @@
+import numpy as np
+
+from . import matcher
+from .product import Product, parse_price
+
+# Missing prices sort after every real price
+PRICE_MISSING = np.iinfo(np.int64).max
+
+_OBJECT_COLUMNS = ("title", "url", "image", "rating", "match_scorer", "match_query", "availability")
+
+
+def _object_array(values):
+    arr = np.empty(len(values), dtype=object)
+    arr[:] = values
+    return arr
+
+
+def parse_price_column(values):
+    """
+    Vectorized price parsing into int64 paise. Falls back to the scalar
+    parser only for the cells NumPy cannot read as a plain number.
+    """
+    raw = np.asarray([("" if v is None else str(v)) for v in values], dtype=str)
+    if not len(raw):
+        return np.empty(0, dtype=np.int64)
+    cleaned = raw
+    for marker in (",", "₹", "Rs.", "INR"):
+        cleaned = np.char.replace(cleaned, marker, "")
+    cleaned = np.char.strip(cleaned)
+    out = np.full(len(raw), PRICE_MISSING, dtype=np.int64)
+    try:
+        filled = np.where(cleaned == "", "nan", cleaned).astype(np.float64)
+        ok = ~np.isnan(filled)
+        out[ok] = np.rint(filled[ok] * 100).astype(np.int64)
+    except ValueError:
+        for i, v in enumerate(values):
+            paise = parse_price(v)
+            if paise is not None:
+                out[i] = paise
+    return out
+
+
+class ProductBatch:
+    """
+    Column-oriented set of listings. `site` is dictionary-encoded
+    (`site_codes` indexes into `sites`) and prices are int64 paise, so
+    filtering, ranking and sorting run on whole arrays.
+    """
+
+    def __init__(self, columns, sites):
+        self.title = columns["title"]
+        self.url = columns["url"]
+        self.image = columns["image"]
+        self.rating = columns["rating"]
+        self.match_scorer = columns["match_scorer"]
+        self.match_query = columns["match_query"]
+        self.availability = columns["availability"]
+        self.price_paise = columns["price_paise"]
+        self.mrp_paise = columns["mrp_paise"]
+        self.site_codes = columns["site_codes"]
+        self.match_score = columns["match_score"]
+        self.recommended = columns["recommended"]
+        self.sites = list(sites)
+
+    def __len__(self):
+        return len(self.title)
+
+    def _columns(self):
+        return {
+            "title": self.title,
+            "url": self.url,
+            "image": self.image,
+            "rating": self.rating,
+            "match_scorer": self.match_scorer,
+            "match_query": self.match_query,
+            "availability": self.availability,
+            "price_paise": self.price_paise,
+            "mrp_paise": self.mrp_paise,
+            "site_codes": self.site_codes,
+            "match_score": self.match_score,
+            "recommended": self.recommended,
+        }
+
+    @classmethod
+    def empty(cls):
+        return cls.from_products([])
+
+    @classmethod
+    def from_products(cls, products):
+        sites = []
+        lookup = {}
+        codes = np.empty(len(products), dtype=np.int16)
+        for i, p in enumerate(products):
+            code = lookup.get(p.site)
+            if code is None:
+                code = lookup[p.site] = len(sites)
+                sites.append(p.site)
+            codes[i] = code
+
+        def price_array(attr):
+            return np.fromiter(
+                (PRICE_MISSING if getattr(p, attr) is None else getattr(p, attr) for p in products),
+                dtype=np.int64,
+                count=len(products),
+            )
+
+        columns = {name: _object_array([getattr(p, name) for p in products]) for name in _OBJECT_COLUMNS}
+        columns["price_paise"] = price_array("price_paise")
+        columns["mrp_paise"] = price_array("mrp_paise")
+        columns["site_codes"] = codes
+        columns["match_score"] = np.fromiter(
+            (np.nan if p.match_score is None else p.match_score for p in products),
+            dtype=np.float64,
+            count=len(products),
+        )
+        columns["recommended"] = np.fromiter((p.recommended for p in products), dtype=bool, count=len(products))
+        return cls(columns, sites)
+
+    @classmethod
+    def from_records(cls, records, site):
+        """
+        Builds a single-site batch straight from raw scraper records,
+        normalizing prices column-wise.
+        """
+        n = len(records)
+        columns = {
+            "title": _object_array([r.get("title") or r.get("name") or "Unknown Product" for r in records]),
+            "url": _object_array([r.get("url") or r.get("link") or "#" for r in records]),
+            "image": _object_array([r.get("image") or r.get("plpImage") or "" for r in records]),
+            "rating": _object_array([r.get("rating") for r in records]),
+            "match_scorer": _object_array([r.get("match_scorer") for r in records]),
+            "match_query": _object_array([r.get("match_query") for r in records]),
+            "availability": _object_array([r.get("availability") for r in records]),
+            "price_paise": parse_price_column([r.get("price") for r in records]),
+            "mrp_paise": parse_price_column([r.get("mrp") for r in records]),
+            "site_codes": np.zeros(n, dtype=np.int16),
+            "match_score": np.array(
+                [np.nan if r.get("match_score") is None else r["match_score"] for r in records],
+                dtype=np.float64,
+            ),
+            "recommended": np.zeros(n, dtype=bool),
+        }
+        # Records already carrying paise keep their exact value
+        for i, r in enumerate(records):
+            if r.get("price_paise") is not None:
+                columns["price_paise"][i] = r["price_paise"]
+            if r.get("mrp_paise") is not None:
+                columns["mrp_paise"][i] = r["mrp_paise"]
+        return cls(columns, [site])
+
+    @classmethod
+    def concat(cls, batches):
+        batches = [b for b in batches if len(b)]
+        if not batches:
+            return cls.empty()
+
+        sites = []
+        lookup = {}
+        remapped = []
+        for b in batches:
+            mapping = np.empty(max(len(b.sites), 1), dtype=np.int16)
+            for code, site in enumerate(b.sites):
+                if site not in lookup:
+                    lookup[site] = len(sites)
+                    sites.append(site)
+                mapping[code] = lookup[site]
+            remapped.append(mapping[b.site_codes])
+
+        columns = {
+            name: np.concatenate([b._columns()[name] for b in batches])
+            for name in batches[0]._columns()
+        }
+        columns["site_codes"] = np.concatenate(remapped)
+        return cls(columns, sites)
+
+    def take(self, indices):
+        return ProductBatch({name: col[indices] for name, col in self._columns().items()}, self.sites)
+
+    def filter(self, mask):
+        return self.take(np.flatnonzero(mask))
+
+    def site_column(self):
+        return np.asarray(self.sites, dtype=object)[self.site_codes] if len(self) else _object_array([])
+
+    def site_mask(self, site):
+        if site not in self.sites:
+            return np.zeros(len(self), dtype=bool)
+        return self.site_codes == self.sites.index(site)
+
+    def rank(self, query, scorer=None):
+        """
+        Fills match scores for rows not yet scored by `scorer` for this query;
+        rows scored upstream (inside the scrapers) are left as they are.
+        """
+        name = scorer or matcher.DEFAULT_SCORER
+        fn = matcher.get_scorer(name)
+        key = matcher.score_key(query)
+        todo = np.flatnonzero(
+            np.isnan(self.match_score) | (self.match_scorer != name) | (self.match_query != key)
+        )
+        for i in todo:
+            self.match_score[i] = fn({"title": self.title[i]}, query)
+            self.match_scorer[i] = name
+            self.match_query[i] = key
+        return self
+
+    def top_per_site(self, k=1, min_score=0):
+        """
+        Up to `k` rows per site: the highest match scores at or above
+        `min_score`, grouped by site, best first within each site.
+        """
+        keep = np.flatnonzero(self.match_score >= min_score)
+        if not len(keep):
+            return self.take(keep)
+        # lexsort: last key is primary -> site, then score descending, then price
+        order = keep[np.lexsort((self.price_paise[keep], -self.match_score[keep], self.site_codes[keep]))]
+        _, first, counts = np.unique(self.site_codes[order], return_index=True, return_counts=True)
+        rank = np.arange(len(order)) - np.repeat(first, counts)
+        return self.take(order[rank < k])
+
+    def best_per_site(self, min_score=0):
+        """
+        One row per site: the highest match score at or above `min_score`.
+        """
+        return self.top_per_site(1, min_score)
+
+    def sort_by_price(self):
+        return self.take(np.argsort(self.price_paise, kind="stable"))
+
+    def mark_cheapest(self):
+        """
+        Recommends the cheapest row, skipping rows known to be out of stock
+        unless every row is.
+        """
+        self.recommended[:] = False
+        if len(self):
+            rows = np.flatnonzero(self.availability != "out_of_stock")
+            if not len(rows):
+                rows = np.arange(len(self))
+            self.recommended[rows[np.argmin(self.price_paise[rows])]] = True
+        return self
+
+    def to_products(self):
+        sites = self.site_column()
+        return [
+            Product(
+                title=self.title[i],
+                price_paise=None if self.price_paise[i] == PRICE_MISSING else int(self.price_paise[i]),
+                site=sites[i],
+                url=self.url[i],
+                image=self.image[i],
+                rating=self.rating[i],
+                mrp_paise=None if self.mrp_paise[i] == PRICE_MISSING else int(self.mrp_paise[i]),
+                recommended=bool(self.recommended[i]),
+                match_score=None if np.isnan(self.match_score[i]) else float(self.match_score[i]),
+                match_scorer=self.match_scorer[i],
+                match_query=self.match_query[i],
+                availability=self.availability[i],
+            )
+            for i in range(len(self))
+        ]
+
+    def price_strings(self, column=None):
+        """
+        Rupee strings ("113490.00") for a paise column, built array-wise.
+        """
+        col = self.price_paise if column is None else column
+        if not len(col):
+            return _object_array([])
+        missing = col == PRICE_MISSING
+        safe = np.where(missing, 0, col)
+        text = np.char.add(
+            np.char.add((safe // 100).astype(str), "."),
+            np.char.zfill((safe % 100).astype(str), 2),
+        )
+        out = text.astype(object)
+        out[missing] = None
+        return out
+
+    def to_dataframe(self):
+        import pandas as pd
+
+        def nullable(col):
+            return pd.Series(col, dtype="Int64").mask(col == PRICE_MISSING)
+
+        return pd.DataFrame(
+            {
+                "site": pd.Categorical.from_codes(self.site_codes, categories=self.sites),
+                "title": self.title,
+                "price": self.price_strings(),
+                "recommended": self.recommended,
+                "url": self.url,
+                "image": self.image,
+                "rating": self.rating,
+                "price_paise": nullable(self.price_paise),
+                "mrp_paise": nullable(self.mrp_paise),
+                "match_score": self.match_score,
+                "availability": self.availability,
+            }
+        )
@@ -0,0 +1,110 @@
+import time
+
+from . import matcher
+from .pricedb import PriceDB
+from .product import Product
+
+# Listings not seen for this long are treated as gone and searched for again
+MAX_AGE_SECONDS = 7 * 86400
+# Listings seen this recently are answered at their stored price, unfetched
+FRESH_SECONDS = 4 * 3600
+# Direct refreshes per site for one query (best match first)
+MAX_PER_SITE = 3
+# Full-text candidates per site handed to the matcher
+SEARCH_CANDIDATES = 10
+
+# Canonical product URLs rebuilt from the site-native ID, free of slugs and
+# tracking parameters. Sites missing here keep the stored (cleaned) URL.
+CANONICAL_URLS = {
+    "amazon": "https://www.amazon.in/dp/{id}",
+    "croma": "https://www.croma.com/p/{id}",
+}
+
+
+def canonical_url(site, native_id, fallback=None):
+    template = CANONICAL_URLS.get((site or "").lower())
+    if template and native_id and not native_id.startswith(("http", "title:")):
+        return template.format(id=native_id)
+    return fallback
+
+
+def stored_product(row):
+    """
+    Product of a catalog row (as returned by Catalog.lookup) at its last
+    stored price, with the image, MRP and availability last read.
+    """
+    return Product(
+        title=row["title"],
+        price_paise=row["price_paise"],
+        site=row["site"],
+        url=row["url"],
+        image=row.get("image") or "",
+        mrp_paise=row.get("mrp_paise"),
+        availability=row.get("availability"),
+        match_score=row["match_score"],
+        match_scorer=row["match_scorer"],
+        match_query=row.get("match_query"),
+    )
+
+
+class Catalog:
+    """
+    Known listings keyed by site-native ID and linked to canonical products
+    (the listings table of the price database), searchable through its FTS5
+    index. Once a query's product is in the catalog, its listings can be
+    refreshed from their product pages directly instead of searching,
+    scrolling and matching again.
+    """
+
+    def __init__(self, db=None):
+        self.db = db or PriceDB()
+
+    def close(self):
+        self.db.close()
+
+    def lookup(self, query, per_site=MAX_PER_SITE, max_age=MAX_AGE_SECONDS, now=None):
+        """
+        Known listings of the query's product, grouped by site:
+        {site: [{"site", "native_id", "url", "title", "price_paise", ...}]}.
+        Full-text search narrows the catalog to SEARCH_CANDIDATES per site; a
+        candidate is kept when it has the query's canonical product key (any
+        storage when the query names none) or is a confident matcher match.
+        """
+        key = matcher.product_key(query)
+        if not key:
+            return {}
+        cutoff = (now or time.time()) - max_age
+        by_site = {}
+        for row in self.db.search(query, per_site=SEARCH_CANDIDATES):
+            if row["last_seen"] < cutoff:
+                continue
+            matcher.score_products([row], query)
+            same_product = key in (row["product_key"], matcher.base_key(row["product_key"]))
+            if not same_product and row["match_score"] < matcher.confident_score(query):
+                continue
+            row["url"] = canonical_url(row["site"], row["native_id"], row["url"])
+            if row["url"] and row["url"] != "#":
+                by_site.setdefault(row["site"], []).append(row)
+        return {
+            site: sorted(rows, key=lambda r: (r["match_score"], r["last_seen"]), reverse=True)[:per_site]
+            for site, rows in by_site.items()
+        }
+
+    def searched_sites(self, query, max_age=FRESH_SECONDS, now=None):
+        """
+        Sites whose results for the query's model (or a model prefix of it)
+        were stored within `max_age`: the listings of those sites that the
+        search saw are in the catalog, fresh. A site with none of the query's
+        listings still needs a live search.
+        """
+        return self.db.searched_sites(query, since=(now or time.time()) - max_age)
+
+    def products(self, query, **kwargs):
+        """
+        The query's known listings as Products at their last stored price,
+        grouped by site: an instant answer without touching any site.
+        """
+        return {
+            site: [stored_product(r) for r in rows]
+            for site, rows in self.lookup(query, **kwargs).items()
+        }
@@ -1,37 +1,160 @@
-import pandas as pd
+import hashlib
+import io
 import json
 import os
+import shutil
+from collections import OrderedDict
+
+import pandas as pd
+
+from .batch import ProductBatch
+
+JSON_FILE = "combined_results.json"
+# Every matched listing of the last run, for the full comparison view
+LISTINGS_FILE = "all_listings.json"
+# Each run's exports also go to RUNS_DIR/<run_id>, so a session reads its own
+# run even when another session's search has replaced the files above
+RUNS_DIR = os.path.join("data", "runs")
+MAX_RUNS = 50
+
+# Tabular formats are rendered on demand from the canonical JSON
+EXPORT_FORMATS = {
+    "csv": ("results.csv", "text/csv"),
+    "xlsx": ("results.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
 
-def export_results(results, output_dir="data"):
+# Rendered exports keyed by (content hash, format); a rerun with unchanged
+# results is served from memory instead of being rendered again.
+_RENDER_CACHE = OrderedDict()
+_RENDER_CACHE_SIZE = 16
+
+
+def export_results(results, output_dir="data", formats=()):
     """
-    Exports the results to JSON, CSV, and Excel.
-    results: List of normalized product dictionaries.
+    Persists the canonical JSON export and, only if asked, CSV/XLSX files.
+    results: utils.batch.ProductBatch (or a list of utils.product.Product records).
     """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir, exist_ok=True)
 
     # JSON Export (The definitive source)
-    json_path = os.path.join(output_dir, "combined_results.json")
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(results, f, indent=2, ensure_ascii=False)
-
-    # Tabular Export (CSV/Excel)
-    if results:
-        df = pd.DataFrame(results)
-        
-        # Reorder columns if possible for better readability
-        preferred_order = ["site", "title", "price", "recommended", "url"]
-        columns = [c for c in preferred_order if c in df.columns] + [c for c in df.columns if c not in preferred_order]
-        df = df[columns]
-
-        csv_path = os.path.join(output_dir, "results.csv")
-        df.to_csv(csv_path, index=False)
-
-        xlsx_path = os.path.join(output_dir, "results.xlsx")
-        df.to_excel(xlsx_path, index=False)
-    else:
-        # Create empty files if no results
-        pd.DataFrame().to_csv(os.path.join(output_dir, "results.csv"))
-        pd.DataFrame().to_excel(os.path.join(output_dir, "results.xlsx"))
+    json_path = os.path.join(output_dir, JSON_FILE)
+    payload = _write_json(results, json_path)
+
+    for fmt in formats:
+        filename, _ = EXPORT_FORMATS[fmt]
+        with open(os.path.join(output_dir, filename), "wb") as f:
+            f.write(render_export(payload, fmt))
 
     return json_path
+
+
+def export_listings(listings, output_dir="data"):
+    """
+    Persists every matched listing of a run (all variants, storage sizes and
+    sites), not just the best per site. Same input types as export_results.
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, LISTINGS_FILE)
+    _write_json(listings, path)
+    return path
+
+
+def _write_json(results, path):
+    """
+    Writes the records JSON of a batch; the file is left untouched when its
+    content is identical. Returns the payload bytes.
+    """
+    if not isinstance(results, ProductBatch):
+        results = ProductBatch.from_products(results)
+
+    # Built straight from the batch columns
+    df = results.to_dataframe()
+    payload = df.to_json(orient="records", indent=2, force_ascii=False).encode("utf-8")
+    if _read_bytes(path) != payload:
+        with open(path, "wb") as f:
+            f.write(payload)
+    return payload
+
+
+def _read_bytes(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _to_dataframe(payload):
+    df = pd.DataFrame(json.loads(payload or b"[]"))
+
+    # Reorder columns if possible for better readability
+    preferred_order = ["site", "title", "price", "recommended", "url"]
+    columns = [c for c in preferred_order if c in df.columns] + [c for c in df.columns if c not in preferred_order]
+    return df[columns]
+
+
+def render_export(payload, fmt):
+    """
+    Renders JSON export bytes as `fmt` ("csv" or "xlsx"), memoized by content hash.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    key = (hashlib.sha256(payload).hexdigest(), fmt)
+    if key in _RENDER_CACHE:
+        _RENDER_CACHE.move_to_end(key)
+        return _RENDER_CACHE[key]
+
+    df = _to_dataframe(payload)
+    buffer = io.BytesIO()
+    if fmt == "csv":
+        df.to_csv(buffer, index=False)
+    else:
+        df.to_excel(buffer, index=False)
+    data = buffer.getvalue()
+
+    _RENDER_CACHE[key] = data
+    if len(_RENDER_CACHE) > _RENDER_CACHE_SIZE:
+        _RENDER_CACHE.popitem(last=False)
+    return data
+
+
+def run_dir(run_id, root=RUNS_DIR):
+    """
+    Export folder of one run.
+    """
+    return os.path.join(root, run_id)
+
+
+def prune_runs(keep=MAX_RUNS, root=RUNS_DIR):
+    """
+    Removes all but the `keep` most recent run folders. Returns the count removed.
+    """
+    if not os.path.isdir(root):
+        return 0
+    runs = sorted(
+        (entry for entry in os.scandir(root) if entry.is_dir()),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in runs[keep:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+    return len(runs[keep:])
+
+
+def export_stream(fmt, output_dir="data"):
+    """
+    In-memory export of the latest results, e.g. for st.download_button.
+    Returns (stream, filename, mime) or None when nothing has been exported yet.
+    """
+    payload = _read_bytes(os.path.join(output_dir, JSON_FILE))
+    if payload is None:
+        return None
+
+    if fmt == "json":
+        return io.BytesIO(payload), "results.json", "application/json"
+
+    filename, mime = EXPORT_FORMATS[fmt]
+    return io.BytesIO(render_export(payload, fmt)), filename, mime
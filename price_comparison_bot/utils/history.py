@@ -0,0 +1,193 @@
+import glob
+import gzip
+import json
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from . import matcher
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet compaction is optional; JSONL.gz is always available
+    pa = None
+    pq = None
+
+HISTORY_DIR = os.path.join("data", "history")
+
+
+def _arrow_schema():
+    return pa.schema(
+        [
+            ("observed_at", pa.string()),
+            ("run_id", pa.string()),
+            ("query", pa.string()),
+            ("site", pa.string()),
+            ("title", pa.string()),
+            ("model_key", pa.string()),
+            ("price_paise", pa.int64()),
+            ("mrp_paise", pa.int64()),
+            ("url", pa.string()),
+            ("match_score", pa.float64()),
+        ]
+    )
+
+
+def _partition_dir(root, day, site):
+    return os.path.join(root, f"date={day}", f"site={site}")
+
+
+def _parse_partition(path):
+    """
+    (date, site) from a ".../date=YYYY-MM-DD/site=<name>" directory.
+    """
+    site_part = os.path.basename(path)
+    date_part = os.path.basename(os.path.dirname(path))
+    return date_part.split("=", 1)[1], site_part.split("=", 1)[1]
+
+
+class HistoryStore:
+    """
+    Append-only observation log of listing changes, partitioned by
+    date and site. Each run writes small gzip JSONL parts (cheap on the hot
+    path); `compact` folds closed partitions into one Parquet file
+    (or one JSONL.gz file when pyarrow is not installed).
+    """
+
+    def __init__(self, root=HISTORY_DIR):
+        self.root = root
+
+    # ---------- write ----------
+    def append(self, products, query, observed_at=None, run_id=None):
+        """
+        Appends one observation per product. Returns the number of rows written.
+        """
+        observed_at = observed_at or datetime.now(timezone.utc)
+        run_id = run_id or uuid.uuid4().hex[:12]
+        stamp = observed_at.isoformat()
+        day = observed_at.strftime("%Y-%m-%d")
+
+        by_site = {}
+        for p in products:
+            by_site.setdefault(p.site, []).append(
+                {
+                    "observed_at": stamp,
+                    "run_id": run_id,
+                    "query": query,
+                    "site": p.site,
+                    "title": p.title,
+                    "model_key": matcher.model_key(p.title),
+                    "price_paise": p.price_paise,
+                    "mrp_paise": p.mrp_paise,
+                    "url": p.url,
+                    "match_score": p.match_score,
+                }
+            )
+
+        for site, rows in by_site.items():
+            directory = _partition_dir(self.root, day, site)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{run_id}.jsonl.gz")
+            with gzip.open(path, "at", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False))
+                    f.write("\n")
+
+        return sum(len(rows) for rows in by_site.values())
+
+    # ---------- compaction ----------
+    def compact(self, before=None):
+        """
+        Merges the part files of every partition dated before `before`
+        (default: today, UTC) into a single compressed file.
+        Returns the number of partitions compacted.
+        """
+        before = before or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        compacted = 0
+
+        for directory in self._partitions():
+            day, _ = _parse_partition(directory)
+            parts = sorted(glob.glob(os.path.join(directory, "part-*.jsonl.gz")))
+            if day >= before or not parts:
+                continue
+
+            rows = list(self._read_partition(directory))
+            if pq is not None:
+                table = pa.Table.from_pylist(rows, schema=_arrow_schema())
+                tmp = os.path.join(directory, "compacted.parquet.tmp")
+                pq.write_table(table, tmp, compression="zstd")
+                os.replace(tmp, os.path.join(directory, "compacted.parquet"))
+                stale = os.path.join(directory, "compacted.jsonl.gz")
+                if os.path.exists(stale):
+                    os.remove(stale)
+            else:
+                tmp = os.path.join(directory, "compacted.jsonl.gz.tmp")
+                with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                    for row in rows:
+                        f.write(json.dumps(row, ensure_ascii=False))
+                        f.write("\n")
+                os.replace(tmp, os.path.join(directory, "compacted.jsonl.gz"))
+
+            for part in parts:
+                os.remove(part)
+            compacted += 1
+
+        return compacted
+
+    # ---------- read ----------
+    def _partitions(self, site=None, since=None, until=None):
+        """
+        Partition directories surviving the date/site predicates (pruned by path).
+        """
+        for directory in sorted(glob.glob(os.path.join(self.root, "date=*", "site=*"))):
+            day, part_site = _parse_partition(directory)
+            if site is not None and part_site.lower() != site.lower():
+                continue
+            if since is not None and day < since:
+                continue
+            if until is not None and day > until:
+                continue
+            yield directory
+
+    def _read_partition(self, directory):
+        parquet = os.path.join(directory, "compacted.parquet")
+        if os.path.exists(parquet):
+            if pq is None:
+                raise RuntimeError(f"pyarrow is required to read {parquet}")
+            yield from pq.read_table(parquet).to_pylist()
+
+        files = [os.path.join(directory, "compacted.jsonl.gz")]
+        files += sorted(glob.glob(os.path.join(directory, "part-*.jsonl.gz")))
+        for path in files:
+            if not os.path.exists(path):
+                continue
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+    def query(self, site=None, text=None, days=None, since=None, until=None):
+        """
+        Observations matching the predicates, oldest first.
+
+        site:  exact site name (partition pruned)
+        text:  every normalized token must appear in the title, e.g. "iphone 16 pro"
+        days:  shorthand for `since` = today - days
+        since / until: "YYYY-MM-DD" bounds (partition pruned), inclusive
+        """
+        if days is not None:
+            since = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d")
+        tokens = matcher.normalize(text).split() if text else []
+
+        rows = []
+        for directory in self._partitions(site, since, until):
+            for row in self._read_partition(directory):
+                if tokens:
+                    title_tokens = matcher.normalize(row.get("title")).split()
+                    if not all(t in title_tokens for t in tokens):
+                        continue
+                rows.append(row)
+
+        rows.sort(key=lambda r: r["observed_at"])
+        return rows
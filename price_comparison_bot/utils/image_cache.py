@@ -0,0 +1,175 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+try:
+    from PIL import Image
+except ImportError:  # without Pillow images are cached at their original size
+    Image = None
+
+IMAGE_DIR = os.path.join("data", "images")
+MAX_CACHE_BYTES = 200 * 1024 * 1024
+# Longest side of a card thumbnail, in pixels
+THUMBNAIL_SIZE = 320
+TIMEOUT = 10
+# A URL that failed to download is not retried for this long
+RETRY_SECONDS = 600
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36"
+    ),
+}
+
+log = logging.getLogger("ImageCache")
+
+
+def make_thumbnail(content, size=THUMBNAIL_SIZE):
+    """
+    Downsizes image bytes to fit `size` x `size` and re-encodes them as WebP.
+    Returns the original bytes when Pillow is missing or cannot decode them.
+    """
+    if Image is None:
+        return content
+    try:
+        with Image.open(io.BytesIO(content)) as img:
+            img.thumbnail((size, size))
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGBA")
+            out = io.BytesIO()
+            img.save(out, format="WEBP", quality=80)
+    except Exception as e:
+        log.warning(f"Could not resize image: {e}")
+        return content
+    return out.getvalue() if out.tell() < len(content) else content
+
+
+class ImageCache:
+    """
+    Local image proxy for the dashboard: each remote product image is fetched
+    once, downsized to card size and stored content-addressed under
+    `blobs/` (identical images from different URLs share one file), with a
+    URL -> digest index under `urls/`. Blobs are evicted least-recently-used
+    first once they outgrow `max_bytes` (a hit refreshes the blob's mtime),
+    together with the index entries pointing at them.
+    """
+
+    def __init__(self, root=IMAGE_DIR, max_bytes=MAX_CACHE_BYTES, thumbnail_size=THUMBNAIL_SIZE, session=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.thumbnail_size = thumbnail_size
+        self.session = session or requests.Session()
+        self.session.headers.update(HEADERS)
+        self._lock = threading.Lock()
+        self._failed = {}  # url -> time of the failed fetch
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        os.makedirs(os.path.join(root, "urls"), exist_ok=True)
+        self._size = sum(os.path.getsize(p) for p in self._blobs())
+
+    def _blobs(self):
+        for directory, _, names in os.walk(os.path.join(self.root, "blobs")):
+            for name in names:
+                if not name.endswith(".tmp"):
+                    yield os.path.join(directory, name)
+
+    def _index_path(self, url):
+        return os.path.join(self.root, "urls", hashlib.sha256(url.encode("utf-8")).hexdigest())
+
+    def _blob_path(self, digest):
+        return os.path.join(self.root, "blobs", digest[:2], digest)
+
+    def _lookup(self, url):
+        try:
+            with open(self._index_path(url), "r", encoding="utf-8") as f:
+                path = self._blob_path(f.read().strip())
+        except OSError:
+            return None
+        return path if os.path.exists(path) else None
+
+    def get(self, url):
+        """
+        Local thumbnail path for the image at `url`, fetching it on a miss.
+        Returns None when the image cannot be fetched.
+        """
+        if not url or not url.startswith("http"):
+            return None
+        path = self._lookup(url)
+        if path is not None:
+            os.utime(path)
+            return path
+        if time.time() - self._failed.get(url, 0) < RETRY_SECONDS:
+            return None
+
+        try:
+            response = self.session.get(url, timeout=TIMEOUT)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            log.warning(f"Image fetch failed for {url}: {e}")
+            self._failed[url] = time.time()
+            return None
+        return self._store(url, make_thumbnail(response.content, self.thumbnail_size))
+
+    def _write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(content)
+        os.replace(tmp, path)
+
+    def _store(self, url, content):
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._blob_path(digest)
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            self._write(path, content)
+            with self._lock:
+                self._size += len(content)
+                if self._size > self.max_bytes:
+                    self._evict()
+        self._write(self._index_path(url), digest.encode("ascii"))
+        return path
+
+    def _evict(self):
+        # Oldest first, down to 90% of the budget so eviction is not run per write
+        files = sorted(self._blobs(), key=os.path.getmtime)
+        target = self.max_bytes * 0.9
+        for path in files:
+            if self._size <= target:
+                break
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+        self._prune_index()
+
+    def _prune_index(self):
+        # Index entries whose blob is gone (evicted now or earlier)
+        directory = os.path.join(self.root, "urls")
+        for name in os.listdir(directory):
+            if name.endswith(".tmp"):
+                continue  # being written
+            path = os.path.join(directory, name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    digest = f.read().strip()
+                if not os.path.exists(self._blob_path(digest)):
+                    os.remove(path)
+            except (OSError, ValueError):
+                continue
+
+    def prefetch(self, urls, workers=8):
+        """
+        Fetches the missing images concurrently. Returns {url: local path or None}.
+        """
+        urls = list(dict.fromkeys(u for u in urls if u))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return dict(zip(urls, pool.map(self.get, urls)))
@@ -0,0 +1,127 @@
+import dataclasses
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from . import matcher
+
+# Finished jobs kept for polling clients before the oldest are dropped
+MAX_FINISHED_JOBS = 50
+
+log = logging.getLogger("Jobs")
+
+
+@dataclass
+class Job:
+    """
+    One search running in the background. `sites` maps each site to its
+    latest status and `partial` holds the best match per finished site, so
+    a page can render results before the whole search completes.
+    """
+
+    id: str
+    query: str  # as typed; sent to the sites and the matcher
+    key: str = ""  # matcher.query_key, shared by every spelling of the query
+    status: str = "queued"  # queued | running | done | failed
+    sites: dict = field(default_factory=dict)
+    partial: dict = field(default_factory=dict)
+    results: list = field(default_factory=list)
+    error: str | None = None
+    submitted_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+
+    @property
+    def finished(self):
+        return self.status in ("done", "failed")
+
+
+class JobManager:
+    """
+    Runs searches off the caller's thread. `target(query, progress=..., run_id=..., **kwargs)`
+    is the orchestrator entry point; it reports (site, status, products) through
+    `progress` and writes its exports under the job's id. Searches run one at a time because the scrapers share their
+    output files; a query already queued or running (under any spelling with
+    the same matcher.query_key) is not submitted twice.
+    """
+
+    def __init__(self, target, sites=()):
+        self.target = target
+        self.sites = list(sites)
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search")
+
+    def submit(self, query, **kwargs):
+        key = matcher.query_key(query)
+        with self._lock:
+            for job in self.jobs.values():
+                if job.key == key and not job.finished:
+                    return job
+            self._prune()
+            job = Job(
+                id=uuid.uuid4().hex[:12],
+                query=" ".join(query.split()),
+                key=key,
+                sites={s: "pending" for s in self.sites},
+            )
+            self.jobs[job.id] = job
+        self._pool.submit(self._run, job, kwargs)
+        return job
+
+    @property
+    def idle(self):
+        """
+        True while no search is queued or running, i.e. the sites are free.
+        """
+        with self._lock:
+            return all(job.finished for job in self.jobs.values())
+
+    def snapshot(self, job_id):
+        """
+        Consistent copy of a job for rendering, or None when unknown.
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            return dataclasses.replace(job, sites=dict(job.sites), partial=dict(job.partial))
+
+    def _prune(self):
+        finished = sorted((j for j in self.jobs.values() if j.finished), key=lambda j: j.finished_at)
+        for job in finished[: max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self.jobs[job.id]
+
+    def _progress(self, job, site, status, products=()):
+        best = matcher.match_product(products, job.query) if products else None
+        with self._lock:
+            job.sites[site] = status
+            if best is not None:
+                job.partial[site] = best
+
+    def _run(self, job, kwargs):
+        with self._lock:
+            job.status = "running"
+        try:
+            results = self.target(
+                job.query,
+                progress=lambda *args: self._progress(job, *args),
+                run_id=job.id,
+                **kwargs,
+            )
+            with self._lock:
+                job.results = results
+                job.status = "done"
+        except Exception as e:
+            log.exception(f"Search '{job.query}' failed: {e}")
+            with self._lock:
+                job.error = str(e)
+                job.status = "failed"
+        finally:
+            with self._lock:
+                job.finished_at = time.time()
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -1,18 +1,190 @@
 import re
 
+from . import patterns
+
+# Variant words that distinguish models of one family ("iPhone 17" vs "iPhone 17 Pro").
+# A title carrying a variant the query did not ask for ranks below the base model.
+VARIANT_PRIORITY = ["pro", "plus", "max", "ultra", "mini"]
+
+DEFAULT_SCORER = "default"
+
+# Scoring functions by name, so alternatives can be compared offline
+SCORERS = {}
+
+
+def register_scorer(name):
+    """
+    Decorator registering a scoring function(product, query) -> number under `name`.
+    """
+    def wrap(fn):
+        SCORERS[name] = fn
+        return fn
+    return wrap
+
+
+def get_scorer(name=None):
+    name = name or DEFAULT_SCORER
+    if name not in SCORERS:
+        raise KeyError(f"Unknown scorer: {name}")
+    return SCORERS[name]
+
+
+def _field(product, name):
+    # Products may be plain dicts or utils.product.Product records
+    if isinstance(product, dict):
+        return product.get(name)
+    return getattr(product, name, None)
+
+
+def _set_field(product, name, value):
+    if isinstance(product, dict):
+        product[name] = value
+    else:
+        setattr(product, name, value)
+
+
 def normalize(text):
     if not text:
         return ""
     return re.sub(r"[^a-z0-9\s]", "", text.lower()).strip()
 
+
+def model_key(title):
+    """
+    Coarse model identifier from the part of a title before any spec list,
+    e.g. "Apple iPhone 17 Pro (256GB, Silver)" -> "apple_iphone_17_pro".
+    """
+    head = re.split(r"[(:,|]", title or "", maxsplit=1)[0]
+    return "_".join(normalize(head).split())
+
+
+def extract_storage(title):
+    """
+    Largest storage capacity mentioned in a title, normalized to "256gb" / "1tb".
+    The largest wins so "8GB RAM, 256GB" resolves to the storage size.
+    """
+    best = None
+    for amount, unit in re.findall(r"(\d+)\s*(gb|tb)\b", (title or "").lower()):
+        size = int(amount) * (1024 if unit == "tb" else 1)
+        if best is None or size > best[0]:
+            best = (size, f"{int(amount)}{unit}")
+    return best[1] if best else None
+
+
+def product_key(title):
+    """
+    Canonical product identifier shared across sites: brand and model tokens
+    without the spec list, colour or marketing words, plus storage when present,
+    e.g. "Apple iPhone 16 Pro (128GB, Desert Titanium)" -> "apple iphone 16 pro 128gb".
+    A title (or query) naming no brand gets the one its model line implies
+    in patterns.json ("iphone 17" -> "apple iphone 17").
+    """
+    config = patterns.load_config()
+    head = re.split(r"[(:,|]|\s[-–]\s|\swith\s", title or "", maxsplit=1, flags=re.I)[0]
+    tokens = normalize(head).split()
+    filler = set(config.get("colour_words", [])) | set(config.get("marketing_words", []))
+    # Drop storage tokens ("1 tb", "128gb"), colours and marketing words
+    cleaned = []
+    for i, tok in enumerate(tokens):
+        if re.fullmatch(r"\d+(gb|tb)", tok) or tok in ("gb", "tb") or tok in filler:
+            continue
+        if tok.isdigit() and i + 1 < len(tokens) and tokens[i + 1] in ("gb", "tb"):
+            continue
+        cleaned.append(tok)
+    model_brands = config.get("model_brands", {})
+    if not set(cleaned) & set(config.get("brands", [])):
+        implied = next((model_brands[tok] for tok in cleaned if tok in model_brands), None)
+        if implied:
+            cleaned.insert(0, implied)
+    storage = extract_storage(title)
+    return " ".join(cleaned + ([storage] if storage else []))
+
+
+def base_key(key):
+    """
+    Product key without its trailing storage token ("apple iphone 17 256gb" -> "apple iphone 17").
+    """
+    tokens = (key or "").split()
+    if len(tokens) > 1 and re.fullmatch(r"\d+(gb|tb)", tokens[-1]):
+        tokens = tokens[:-1]
+    return " ".join(tokens)
+
+
+def canonical_query(query):
+    """
+    One spelling per search, for cache keys and the query log only (sites and
+    the matcher get the text as typed): matcher normalization, then the phrase
+    synonyms and glued model numbers from patterns.json, storage joined to its
+    unit and a leading brand dropped when the model line implies it,
+    e.g. "Apple i Phone17 128 GB" -> "iphone 17 128gb".
+    """
+    config = patterns.load_config()
+    text = " ".join(normalize(query).split())
+    for phrase, replacement in config.get("query_synonyms", {}).items():
+        # A phrase may be glued to its model number: "i phone17"
+        text = re.sub(rf"\b{re.escape(phrase)}(?=\d|\b)", replacement, text)
+
+    brands = config.get("brands", [])
+    model_words = set(config.get("model_words", [])) | set(brands)
+    tokens = []
+    for tok in text.split():
+        # "iphone17" -> "iphone 17", "17pro" -> "17 pro"
+        glued = re.fullmatch(r"([a-z]+)(\d+)|(\d+)([a-z]+)", tok)
+        if glued and glued.group(1) in model_words:
+            tokens += [glued.group(1), glued.group(2)]
+        elif glued and glued.group(4) in VARIANT_PRIORITY:
+            tokens += [glued.group(3), glued.group(4)]
+        elif tok in ("gb", "tb") and tokens and tokens[-1].isdigit():
+            tokens[-1] += tok
+        else:
+            tokens.append(tok)
+
+    # "apple iphone 17" -> "iphone 17", but "nothing phone 2" and
+    # "hp victus 15" keep the brand their model line does not imply
+    model_brands = config.get("model_brands", {})
+    if len(tokens) > 1 and model_brands.get(tokens[1]) == tokens[0]:
+        tokens = tokens[1:]
+    return " ".join(tokens)
+
+
+def query_key(query):
+    """
+    Stable cache key of a query: its canonical token set, order-free, so
+    "17 pro iphone" and "iPhone 17 Pro" share every cache and job.
+    """
+    return " ".join(sorted(set(canonical_query(query).split())))
+
+
+def score_key(query):
+    """
+    The form of a query that match scores depend on (its normalized tokens),
+    stored with a cached score so a product ranked for another query is rescored.
+    """
+    return " ".join(normalize(query).split())
+
+
+def variant_score(norm_title, query_tokens):
+    """
+    Penalizes variant words present in the title but absent from the query,
+    so a plain "iphone 17" query prefers the base model over Pro / Pro Max.
+    """
+    title_tokens = norm_title.split()
+    score = 0
+    for i, variant in enumerate(VARIANT_PRIORITY):
+        if variant in title_tokens and variant not in query_tokens:
+            score -= 15 + i
+    return score
+
+
+@register_scorer(DEFAULT_SCORER)
 def get_match_score(product, query):
-    title = product.get("title", "")
+    title = _field(product, "title")
     if not title:
         return -1000
 
     norm_title = normalize(title)
     norm_query = normalize(query)
-    
+
     if not norm_query:
         return 0
 
@@ -37,45 +209,94 @@ def get_match_score(product, query):
     # Exact match bonus
     if norm_query == norm_title:
         score += 100
-    
+
     # Number match (Critical for things like '17' vs '16')
     numbers_in_query = re.findall(r"\d+", norm_query)
     numbers_in_title = re.findall(r"\d+", norm_title)
-    
+
     for num in numbers_in_query:
         if num in numbers_in_title:
             score += 30
         else:
             score -= 50  # Heavy penalty for missing model number
 
-    # Negative keywords (unrelated items)
-    negative_keywords = ["case", "cover", "guard", "glass", "protector"]
-    for kw in negative_keywords:
-        if kw in norm_title and kw not in norm_query:
-            score -= 100
+    # Variant preference (base model unless the query names a variant)
+    score += variant_score(norm_title, query_tokens)
+
+    # Negative keywords (unrelated items), one automaton pass per text;
+    # generic accessory words only count when they start the title
+    negative_keywords = patterns.negative_keywords()
+    for kw in negative_keywords.find_all(norm_title) - negative_keywords.find_all(norm_query):
+        score -= 100
+    leading = patterns.leading_negative(norm_title)
+    if leading and leading not in query_tokens:
+        score -= 100
 
     return score
 
-def match_product(products, query):
+
+def confident_score(query):
     """
-    Selects the single best matching product from a list.
+    Default-scorer score of a listing that contains every query token and model
+    number with no penalties. Once a listing reaches it, deeper results are not
+    worth fetching.
     """
-    if not products:
-        return None
+    norm_query = normalize(query)
+    return 10 * len(norm_query.split()) + 20 + 30 * len(re.findall(r"\d+", norm_query))
+
+
+def is_confident(product, query, scorer=None):
+    """
+    Scores `product` (attaching match_score) and reports whether it is a
+    high-confidence match, so scrapers can stop extracting early.
+    """
+    score_products([product], query, scorer)
+    return _field(product, "match_score") >= confident_score(query)
+
 
-    scored_products = []
+def score_products(products, query, scorer=None):
+    """
+    Attaches `match_score` (and the scorer name and score_key of the query)
+    to every product. Products already scored by the same scorer for the same
+    query are left untouched, so a listing scored inside a scraper is not
+    scored again by the orchestrator.
+    """
+    name = scorer or DEFAULT_SCORER
+    fn = get_scorer(name)
+    key = score_key(query)
     for p in products:
-        score = get_match_score(p, query)
-        scored_products.append((score, p))
+        if (
+            _field(p, "match_scorer") == name
+            and _field(p, "match_query") == key
+            and _field(p, "match_score") is not None
+        ):
+            continue
+        _set_field(p, "match_score", fn(p, query))
+        _set_field(p, "match_scorer", name)
+        _set_field(p, "match_query", key)
+    return products
+
 
-    # Sort by score descending
-    scored_products.sort(key=lambda x: x[0], reverse=True)
+def rank_products(products, query, scorer=None):
+    """
+    Returns the products ordered by match score (best first).
+    """
+    scored = score_products(list(products), query, scorer)
+    return sorted(scored, key=lambda p: _field(p, "match_score"), reverse=True)
+
+
+def match_product(products, query, scorer=None):
+    """
+    Selects the single best matching product from a list.
+    """
+    if not products:
+        return None
 
-    best_score, best_product = scored_products[0]
+    best_product = rank_products(products, query, scorer)[0]
 
     # Threshold for "unrelated"
     # If the score is very low (e.g. negative due to penalties), return None
-    if best_score < 0:
+    if _field(best_product, "match_score") < 0:
         return None
-        
+
     return best_product
@@ -0,0 +1,123 @@
+import json
+import os
+from collections import deque
+from functools import lru_cache
+
+CONFIG_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "patterns.json"
+)
+
+
+class PatternMatcher:
+    """
+    Aho-Corasick automaton over a fixed set of lowercase patterns.
+    Built once; every scan is a single pass over the text regardless of how
+    many patterns the dictionary holds. Only whole-word occurrences count:
+    "case" matches "phone case" but not "showcase" or "cased".
+    """
+
+    def __init__(self, patterns):
+        self.patterns = sorted({p.lower() for p in patterns if p})
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+        for pattern in self.patterns:
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = nxt
+            self._out[state] = self._out[state] + (pattern,)
+
+        # Breadth-first pass to wire failure links and merge outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def iter_matches(self, text):
+        """
+        Yields (end_index, pattern) for every whole-word occurrence in `text`.
+        `text` is expected to be lowercased by the caller.
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state] or (i + 1 < len(text) and text[i + 1].isalnum()):
+                continue
+            for pattern in out[state]:
+                start = i - len(pattern) + 1
+                if start == 0 or not text[start - 1].isalnum():
+                    yield i, pattern
+
+    def find_all(self, text):
+        """
+        Returns the set of distinct patterns occurring in `text`.
+        """
+        return {pattern for _, pattern in self.iter_matches(text)}
+
+    def search(self, text):
+        """
+        Returns the first pattern found in `text`, or None.
+        """
+        for _, pattern in self.iter_matches(text):
+            return pattern
+        return None
+
+
+@lru_cache(maxsize=1)
+def load_config(path=CONFIG_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def negative_keywords():
+    return PatternMatcher(load_config()["negative_keywords"])
+
+
+@lru_cache(maxsize=None)
+def leading_negative_keywords():
+    """
+    Generic accessory words ("glass", "adapter") that only mark an accessory
+    when they start the title; elsewhere they describe the product itself
+    ("Gorilla Glass Armor", "with USB-C Power Adapter").
+    """
+    return tuple(sorted(load_config().get("leading_negative_keywords", []), key=len, reverse=True))
+
+
+def leading_negative(text):
+    """
+    The leading negative keyword `text` (normalized) starts with, or None.
+    """
+    for keyword in leading_negative_keywords():
+        if text == keyword or text.startswith(keyword + " "):
+            return keyword
+    return None
+
+
+@lru_cache(maxsize=None)
+def risk_signals(site=None):
+    """
+    Matcher for captcha / block-page phrases: the common list plus the site's own.
+    """
+    signals = load_config()["risk_signals"]
+    return PatternMatcher(signals.get("common", []) + signals.get(site, []))
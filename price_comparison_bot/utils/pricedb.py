@@ -0,0 +1,755 @@
+import os
+import re
+import sqlite3
+import time
+import uuid
+from datetime import datetime, timezone
+
+from . import matcher, patterns
+
+DB_PATH = os.path.join("data", "prices.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sites (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    title TEXT
+);
+CREATE TABLE IF NOT EXISTS listings (
+    id INTEGER PRIMARY KEY,
+    site_id INTEGER NOT NULL REFERENCES sites(id),
+    native_id TEXT NOT NULL,
+    product_id INTEGER REFERENCES products(id),
+    url TEXT,
+    title TEXT,
+    first_seen INTEGER NOT NULL,
+    last_seen INTEGER NOT NULL,
+    fingerprint TEXT,
+    image TEXT,
+    mrp_paise INTEGER,
+    availability TEXT,
+    UNIQUE (site_id, native_id)
+);
+CREATE TABLE IF NOT EXISTS observations (
+    listing_id INTEGER NOT NULL REFERENCES listings(id),
+    observed_at INTEGER NOT NULL,
+    price_paise INTEGER,
+    mrp_paise INTEGER,
+    run_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_observations_listing_time ON observations (listing_id, observed_at);
+CREATE INDEX IF NOT EXISTS idx_listings_product ON listings (product_id);
+CREATE TABLE IF NOT EXISTS listing_rollups (
+    listing_id INTEGER NOT NULL REFERENCES listings(id),
+    resolution TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    min_paise INTEGER NOT NULL,
+    max_paise INTEGER NOT NULL,
+    last_paise INTEGER NOT NULL,
+    last_at INTEGER NOT NULL,
+    PRIMARY KEY (listing_id, resolution, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS product_rollups (
+    product_id INTEGER NOT NULL REFERENCES products(id),
+    resolution TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    min_paise INTEGER NOT NULL,
+    max_paise INTEGER NOT NULL,
+    last_paise INTEGER NOT NULL,
+    last_at INTEGER NOT NULL,
+    PRIMARY KEY (product_id, resolution, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS queries (
+    query TEXT PRIMARY KEY,
+    count INTEGER NOT NULL,
+    last_at INTEGER NOT NULL,
+    demand REAL NOT NULL DEFAULT 0,
+    text TEXT
+);
+CREATE TABLE IF NOT EXISTS site_searches (
+    key TEXT NOT NULL,
+    site_id INTEGER NOT NULL REFERENCES sites(id),
+    searched_at INTEGER NOT NULL,
+    PRIMARY KEY (key, site_id)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE IF NOT EXISTS listings_fts USING fts5(
+    title, attrs, prefix = '2 3', tokenize = 'unicode61'
+);
+"""
+
+# Rollup resolutions, finest first: (name, bucket seconds, bucket offset).
+# Weekly buckets start on Monday (the epoch was a Thursday).
+RESOLUTIONS = [
+    ("hour", 3600, 0),
+    ("day", 86400, 0),
+    ("week", 7 * 86400, 4 * 86400),
+]
+# Bumped whenever matcher.product_key changes; stored keys are recomputed on open
+PRODUCT_KEYS_VERSION = 2
+# An unchanged listing still gets an observation once this long after its
+# last one, so stats and charts over any window see the price it held
+OBSERVATION_HEARTBEAT = 86400
+# Most points a chart query returns before moving to a coarser resolution
+CHART_POINTS = 400
+
+# Relative BM25 weight of the (title, attrs) columns in catalog search
+SEARCH_WEIGHTS = (1.0, 2.0)
+# A search counts half as much towards a query's demand after this long
+DEMAND_HALF_LIFE = 3 * 86400
+
+# Statements are module constants so sqlite3's statement cache reuses the
+# compiled (prepared) form across executemany calls and runs.
+_UPSERT_SITE = "INSERT INTO sites (name) VALUES (?) ON CONFLICT (name) DO NOTHING"
+_UPSERT_PRODUCT = (
+    "INSERT INTO products (key, title) VALUES (?, ?) "
+    "ON CONFLICT (key) DO NOTHING"
+)
+_UPSERT_LISTING = """
+INSERT INTO listings (site_id, native_id, product_id, url, title, first_seen, last_seen, fingerprint,
+                      image, mrp_paise, availability)
+VALUES ((SELECT id FROM sites WHERE name = ?), ?, (SELECT id FROM products WHERE key = ?), ?, ?, ?, ?, ?,
+        NULLIF(?, ''), ?, ?)
+ON CONFLICT (site_id, native_id) DO UPDATE SET
+    product_id = excluded.product_id,
+    url = excluded.url,
+    title = excluded.title,
+    last_seen = excluded.last_seen,
+    fingerprint = excluded.fingerprint,
+    image = COALESCE(excluded.image, image),
+    mrp_paise = excluded.mrp_paise,
+    availability = excluded.availability
+"""
+# Unchanged listings keep their row; a newly read image still replaces the stored one
+_TOUCH_LISTING = """
+UPDATE listings SET last_seen = ?, image = COALESCE(NULLIF(?, ''), image)
+WHERE site_id = (SELECT id FROM sites WHERE name = ?) AND native_id = ?
+"""
+_SELECT_FINGERPRINTS = """
+SELECT l.native_id, l.fingerprint, l.mrp_paise, l.availability,
+       (SELECT MAX(o.observed_at) FROM observations o WHERE o.listing_id = l.id) AS observed_at
+FROM listings l JOIN sites s ON s.id = l.site_id
+WHERE s.name = ? AND l.native_id IN ({ids})
+"""
+# Listing IDs bound per fingerprint lookup (below SQLite's variable limit)
+FINGERPRINT_CHUNK = 500
+_INSERT_OBSERVATION = """
+INSERT INTO observations (listing_id, observed_at, price_paise, mrp_paise, run_id)
+VALUES (
+    (SELECT l.id FROM listings l JOIN sites s ON s.id = l.site_id WHERE s.name = ? AND l.native_id = ?),
+    ?, ?, ?, ?
+)
+"""
+_LOG_QUERY = """
+INSERT INTO queries (query, text, count, last_at, demand) VALUES (?, ?, 1, ?, 1)
+ON CONFLICT (query) DO UPDATE SET
+    text = excluded.text,
+    count = count + 1,
+    demand = decay(demand, excluded.last_at - last_at) + 1,
+    last_at = MAX(last_at, excluded.last_at)
+"""
+_LOG_SEARCH = """
+INSERT INTO site_searches (key, site_id, searched_at)
+VALUES (?, (SELECT id FROM sites WHERE name = ?), ?)
+ON CONFLICT (key, site_id) DO UPDATE SET searched_at = MAX(searched_at, excluded.searched_at)
+"""
+_ROLLUP_MERGE = """
+ON CONFLICT ({key}, resolution, bucket) DO UPDATE SET
+    min_paise = MIN(min_paise, excluded.min_paise),
+    max_paise = MAX(max_paise, excluded.max_paise),
+    last_paise = CASE
+        WHEN excluded.last_at > last_at THEN excluded.last_paise
+        WHEN excluded.last_at = last_at THEN MIN(last_paise, excluded.last_paise)
+        ELSE last_paise
+    END,
+    last_at = MAX(last_at, excluded.last_at)
+"""
+_UPSERT_LISTING_ROLLUP = """
+INSERT INTO listing_rollups (listing_id, resolution, bucket, min_paise, max_paise, last_paise, last_at)
+SELECT l.id, ?, ?, ?, ?, ?, ? FROM listings l JOIN sites s ON s.id = l.site_id
+WHERE s.name = ? AND l.native_id = ?
+""" + _ROLLUP_MERGE.format(key="listing_id")
+_UPSERT_PRODUCT_ROLLUP = """
+INSERT INTO product_rollups (product_id, resolution, bucket, min_paise, max_paise, last_paise, last_at)
+SELECT p.id, ?, ?, ?, ?, ?, ? FROM products p WHERE p.key = ?
+""" + _ROLLUP_MERGE.format(key="product_id")
+
+
+_DELETE_SEARCH_ROW = """
+DELETE FROM listings_fts WHERE rowid =
+    (SELECT l.id FROM listings l JOIN sites s ON s.id = l.site_id WHERE s.name = ? AND l.native_id = ?)
+"""
+_INSERT_SEARCH_ROW = """
+INSERT INTO listings_fts (rowid, title, attrs)
+SELECT l.id, ?, ? FROM listings l JOIN sites s ON s.id = l.site_id
+WHERE s.name = ? AND l.native_id = ?
+"""
+
+
+def _epoch(value):
+    if value is None:
+        return int(time.time())
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    return int(value)
+
+
+def decay(value, elapsed):
+    """
+    `value` after `elapsed` seconds of exponential decay at DEMAND_HALF_LIFE.
+    """
+    return value * 0.5 ** (max(elapsed or 0, 0) / DEMAND_HALF_LIFE)
+
+
+def _iso(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+def bucket_start(epoch, resolution):
+    """
+    Start (epoch seconds) of the `resolution` bucket containing `epoch`.
+    """
+    for name, seconds, offset in RESOLUTIONS:
+        if name == resolution:
+            return (epoch - offset) // seconds * seconds + offset
+    raise ValueError(f"Unknown resolution: {resolution}")
+
+
+def pick_resolution(window_seconds, max_points=CHART_POINTS):
+    """
+    Finest resolution that draws `window_seconds` in at most `max_points`
+    buckets (the coarsest one for very long windows).
+    """
+    for name, seconds, _ in RESOLUTIONS:
+        if window_seconds / seconds <= max_points:
+            return name
+    return RESOLUTIONS[-1][0]
+
+
+def search_document(title):
+    """
+    (title, attrs) indexed for a listing: the normalized title, and its model
+    numbers split out (digits of "128gb" too) plus the storage token, so numeric
+    query tokens can be required the way matcher.get_match_score requires them.
+    """
+    norm_title = matcher.normalize(title)
+    attrs = re.findall(r"\d+", norm_title)
+    storage = matcher.extract_storage(title)
+    if storage:
+        attrs.append(storage)
+    return norm_title, " ".join(attrs)
+
+
+def search_expression(query):
+    """
+    FTS5 MATCH expression for a query: every model number is required in
+    attrs (a missing number is disqualifying in the matcher too) and every
+    word must prefix-match the title, so "iph 16" finds "iPhone 16".
+    Returns None for a query without searchable tokens.
+    """
+    norm_query = matcher.normalize(query)
+    clauses = [f'attrs : "{n}"' for n in dict.fromkeys(re.findall(r"\d+", norm_query))]
+    clauses += [f'title : "{t}"*' for t in dict.fromkeys(norm_query.split()) if t.isalpha()]
+    return " AND ".join(clauses) or None
+
+
+def token_key(key):
+    """
+    Order-free form of a key ("17 pro iphone" and "iphone 17 pro" meet).
+    """
+    return " ".join(sorted(set(key.split())))
+
+
+def search_keys(query):
+    """
+    Model keys a site search for `query` covers (order-free, see token_key):
+    its product key without storage, and every shorter model prefix of it
+    ("apple iphone 17 pro" is covered by a search for "apple iphone 17",
+    whose results list every variant).
+    """
+    tokens = matcher.base_key(matcher.product_key(matcher.canonical_query(query))).split()
+    if not tokens:
+        return []
+    # Never a bare family like "apple iphone" (or "iphone" for a brand-less key)
+    family = 3 if tokens[0] in patterns.load_config().get("brands", []) else 2
+    shortest = min(len(tokens), family)
+    return [token_key(" ".join(tokens[:n])) for n in range(len(tokens), shortest - 1, -1)]
+
+
+def listing_key(product):
+    """
+    Native ID for a listing; falls back to the URL, then the normalized title,
+    so listings from sites without a recognizable ID still get a stable row.
+    """
+    return product.native_id or (product.url if product.url != "#" else None) or (
+        "title:" + matcher.normalize(product.title)
+    )
+
+
+class PriceDB:
+    """
+    Normalized SQLite price history: sites, canonical products, site listings
+    and price observations indexed by (listing, time). Runs in WAL mode so the
+    dashboard can read while the orchestrator writes.
+    """
+
+    def __init__(self, path=DB_PATH):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.create_function("decay", 2, decay, deterministic=True)
+        self.conn.executescript(SCHEMA)
+        self._ensure_column("listings", "fingerprint", "TEXT")
+        self._ensure_column("listings", "image", "TEXT")
+        self._ensure_column("listings", "mrp_paise", "INTEGER")
+        self._ensure_column("listings", "availability", "TEXT")
+        self._ensure_column("queries", "demand", "REAL NOT NULL DEFAULT 0")
+        self._ensure_column("queries", "text", "TEXT")
+        self._ensure_search_index()
+        self._ensure_product_keys()
+
+    def _ensure_column(self, table, column, decl):
+        # Databases created before a column was added get it on open
+        columns = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+        if column not in columns:
+            with self.conn:
+                self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+    def _ensure_search_index(self):
+        # Databases filled before the search index existed are indexed on open
+        indexed = self.conn.execute("SELECT EXISTS (SELECT 1 FROM listings_fts)").fetchone()[0]
+        listed = self.conn.execute("SELECT EXISTS (SELECT 1 FROM listings)").fetchone()[0]
+        if listed and not indexed:
+            self.rebuild_search_index()
+
+    def _ensure_product_keys(self):
+        # Databases keyed by an older matcher.product_key are re-keyed on open
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < PRODUCT_KEYS_VERSION:
+            self.rekey_products()
+            self.conn.execute(f"PRAGMA user_version = {PRODUCT_KEYS_VERSION}")
+
+    def rekey_products(self):
+        """
+        Recomputes every listing's product key from its title, drops products
+        no listing belongs to any more and rebuilds the rollups. Returns the
+        number of listings moved to another product.
+        """
+        rows = self.conn.execute(
+            "SELECT l.id, l.title, p.key FROM listings l LEFT JOIN products p ON p.id = l.product_id"
+        ).fetchall()
+        moved = []
+        for row in rows:
+            key = matcher.product_key(row["title"])
+            if key != row["key"]:
+                moved.append((key, row["title"], row["id"]))
+        if not moved:
+            return 0
+        with self.conn:
+            self.conn.executemany(_UPSERT_PRODUCT, [(key, title) for key, title, _ in moved if key])
+            self.conn.executemany(
+                "UPDATE listings SET product_id = (SELECT id FROM products WHERE key = ?) WHERE id = ?",
+                [(key, listing_id) for key, _, listing_id in moved],
+            )
+            self.conn.execute("DELETE FROM product_rollups")
+            self.conn.execute(
+                "DELETE FROM products WHERE id NOT IN "
+                "(SELECT product_id FROM listings WHERE product_id IS NOT NULL)"
+            )
+        self.rebuild_rollups()
+        return len(moved)
+
+    def rebuild_search_index(self):
+        """
+        Re-indexes every listing title for catalog search. Returns the count.
+        """
+        rows = self.conn.execute("SELECT id, title FROM listings").fetchall()
+        with self.conn:
+            self.conn.execute("DELETE FROM listings_fts")
+            self.conn.executemany(
+                "INSERT INTO listings_fts (rowid, title, attrs) VALUES (?, ?, ?)",
+                [(row["id"], *search_document(row["title"])) for row in rows],
+            )
+        return len(rows)
+
+    def close(self):
+        self.conn.close()
+
+    # ---------- write ----------
+    def record_run(self, products, observed_at=None, run_id=None):
+        """
+        Records a run in a single transaction. Listings whose fingerprint is
+        unchanged only get their last_seen bumped, plus one observation per
+        OBSERVATION_HEARTBEAT; new or changed listings are upserted and get a
+        price observation. A record without the MRP or availability (most
+        search cards) takes the stored ones, so it neither looks changed
+        against a product-page read nor drops them from the catalog.
+        Returns the changed products (the deltas worth propagating).
+        """
+        now = _epoch(observed_at)
+        run_id = run_id or uuid.uuid4().hex[:12]
+        listings = []
+        seen = set()
+        for p in products:
+            if not p.title:
+                continue
+            nid = listing_key(p)
+            # Search pages repeat sponsored cards; one observation per listing per run
+            if (p.site, nid) in seen:
+                continue
+            seen.add((p.site, nid))
+            listings.append((p, p.site, nid))
+
+        # Stored state of this run's listings only, a chunk of IDs per query
+        by_site = {}
+        for _, site, nid in listings:
+            by_site.setdefault(site, []).append(nid)
+        stored = {}
+        for site, nids in by_site.items():
+            for i in range(0, len(nids), FINGERPRINT_CHUNK):
+                chunk = nids[i:i + FINGERPRINT_CHUNK]
+                sql = _SELECT_FINGERPRINTS.format(ids=", ".join("?" * len(chunk)))
+                for row in self.conn.execute(sql, (site, *chunk)):
+                    stored[(site, row["native_id"])] = row
+
+        keys = []
+        for p, site, nid in listings:
+            row = stored.get((site, nid))
+            if row is not None:
+                if p.mrp_paise is None:
+                    p.mrp_paise = row["mrp_paise"]
+                if p.availability is None:
+                    p.availability = row["availability"]
+            keys.append((p, site, nid, p.fingerprint()))
+
+        changed, unchanged, heartbeat = [], [], []
+        for k in keys:
+            _, site, nid, fingerprint = k
+            row = stored.get((site, nid))
+            stored_fingerprint, observed_at = (row["fingerprint"], row["observed_at"]) if row else (None, None)
+            if stored_fingerprint != fingerprint:
+                changed.append(k)
+                continue
+            unchanged.append(k)
+            if observed_at is None or now - observed_at >= OBSERVATION_HEARTBEAT:
+                heartbeat.append(k)
+        observed = changed + heartbeat
+
+        with self.conn:
+            self.conn.executemany(_TOUCH_LISTING, [(now, p.image, site, nid) for p, site, nid, _ in unchanged])
+            self.conn.executemany(_UPSERT_SITE, {(site,) for _, site, _, _ in changed})
+            # `changed` leads `observed`, so zip(changed, pkeys) pairs up too
+            pkeys = [matcher.product_key(p.title) for p, _, _, _ in observed]
+            self.conn.executemany(
+                _UPSERT_PRODUCT, [(pkey, k[0].title) for k, pkey in zip(changed, pkeys) if pkey]
+            )
+            self.conn.executemany(
+                _UPSERT_LISTING,
+                [
+                    (site, nid, pkey, p.url, p.title, now, now, fingerprint, p.image, p.mrp_paise, p.availability)
+                    for (p, site, nid, fingerprint), pkey in zip(changed, pkeys)
+                ],
+            )
+            self.conn.executemany(
+                _INSERT_OBSERVATION,
+                [(site, nid, now, p.price_paise, p.mrp_paise, run_id) for p, site, nid, _ in observed],
+            )
+            self._update_rollups(
+                (site, nid, pkey, now, p.price_paise)
+                for (p, site, nid, _), pkey in zip(observed, pkeys)
+            )
+            self.conn.executemany(_DELETE_SEARCH_ROW, [(site, nid) for _, site, nid, _ in changed])
+            self.conn.executemany(
+                _INSERT_SEARCH_ROW,
+                [(*search_document(p.title), site, nid) for p, site, nid, _ in changed],
+            )
+        return [p for p, _, _, _ in changed]
+
+    def _update_rollups(self, observations):
+        """
+        Folds (site, native_id, product_key, epoch, price_paise) observations
+        into every rollup resolution. Runs inside the caller's transaction.
+        """
+        listing_rows, product_rows = [], []
+        for site, nid, pkey, at, price in observations:
+            if price is None:
+                continue
+            for resolution, _, _ in RESOLUTIONS:
+                bucket = bucket_start(at, resolution)
+                listing_rows.append((resolution, bucket, price, price, price, at, site, nid))
+                if pkey:
+                    product_rows.append((resolution, bucket, price, price, price, at, pkey))
+        self.conn.executemany(_UPSERT_LISTING_ROLLUP, listing_rows)
+        self.conn.executemany(_UPSERT_PRODUCT_ROLLUP, product_rows)
+
+    def rebuild_rollups(self):
+        """
+        Recomputes every rollup from the raw observations (for databases that
+        predate the rollup tables). Returns the number of observations folded.
+        """
+        sql = """
+            SELECT s.name, l.native_id, p.key, o.observed_at, o.price_paise
+            FROM observations o
+            JOIN listings l ON l.id = o.listing_id
+            JOIN sites s ON s.id = l.site_id
+            LEFT JOIN products p ON p.id = l.product_id
+            WHERE o.price_paise IS NOT NULL
+            ORDER BY o.observed_at
+        """
+        rows = self.conn.execute(sql).fetchall()
+        with self.conn:
+            self.conn.execute("DELETE FROM listing_rollups")
+            self.conn.execute("DELETE FROM product_rollups")
+            self._update_rollups(tuple(row) for row in rows)
+        return len(rows)
+
+    def log_query(self, query, observed_at=None):
+        """
+        Counts a user search for autocomplete popularity and adds it to the
+        query's decaying demand. Searches are keyed by matcher.query_key, so
+        every spelling and word order counts towards one entry, shown and
+        warmed under its latest canonical spelling.
+        """
+        key = matcher.query_key(query)
+        if key:
+            with self.conn:
+                self.conn.execute(_LOG_QUERY, (key, matcher.canonical_query(query), _epoch(observed_at)))
+
+    def log_search(self, query, sites, observed_at=None):
+        """
+        Records that `sites` were searched for the query's model just now, so
+        follow-up variant queries can be answered from that search's listings.
+        """
+        key = token_key(matcher.base_key(matcher.product_key(matcher.canonical_query(query))))
+        if key and sites:
+            with self.conn:
+                self.conn.executemany(_UPSERT_SITE, [(site,) for site in sites])
+                self.conn.executemany(_LOG_SEARCH, [(key, site, _epoch(observed_at)) for site in sites])
+
+    # ---------- query ----------
+    def searched_sites(self, query, since):
+        """
+        Sites searched since `since` (epoch) for the query's model or a
+        model prefix of it (see search_keys).
+        """
+        keys = search_keys(query)
+        if not keys:
+            return set()
+        sql = f"""
+            SELECT DISTINCT s.name FROM site_searches ss JOIN sites s ON s.id = ss.site_id
+            WHERE ss.key IN ({", ".join("?" * len(keys))}) AND ss.searched_at >= ?
+        """
+        return {row[0] for row in self.conn.execute(sql, (*keys, _epoch(since)))}
+
+    def price_stats(self, product_key, days=30, site=None):
+        """
+        Min / max / avg price (paise) and observation count over the last `days`.
+        """
+        since = int(time.time()) - days * 86400
+        sql = """
+            SELECT MIN(o.price_paise) AS min_paise, MAX(o.price_paise) AS max_paise,
+                   AVG(o.price_paise) AS avg_paise, COUNT(o.price_paise) AS observations
+            FROM observations o
+            JOIN listings l ON l.id = o.listing_id
+            JOIN products p ON p.id = l.product_id
+            JOIN sites s ON s.id = l.site_id
+            WHERE p.key = ? AND o.observed_at >= ? AND (? IS NULL OR s.name = ?)
+        """
+        row = self.conn.execute(sql, (product_key, since, site, site)).fetchone()
+        return dict(row)
+
+    def latest_prices(self, product_key):
+        """
+        Latest observed price per site (cheapest listing when a site has several).
+        """
+        sql = """
+            WITH latest AS (
+                SELECT l.id AS listing_id, s.name AS site, l.url, l.title,
+                       o.price_paise, o.observed_at,
+                       ROW_NUMBER() OVER (PARTITION BY l.id ORDER BY o.observed_at DESC) AS rn
+                FROM observations o
+                JOIN listings l ON l.id = o.listing_id
+                JOIN products p ON p.id = l.product_id
+                JOIN sites s ON s.id = l.site_id
+                WHERE p.key = ? AND o.price_paise IS NOT NULL
+            ),
+            ranked AS (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY site ORDER BY price_paise) AS site_rn
+                FROM latest WHERE rn = 1
+            )
+            SELECT site, url, title, price_paise, observed_at FROM ranked
+            WHERE site_rn = 1 ORDER BY price_paise
+        """
+        return [
+            {**dict(row), "observed_at": _iso(row["observed_at"])}
+            for row in self.conn.execute(sql, (product_key,))
+        ]
+
+    def price_changes(self, product_key=None, days=30):
+        """
+        Price-change events: observations whose price differs from the previous
+        observation of the same listing.
+        """
+        since = int(time.time()) - days * 86400
+        sql = """
+            WITH seq AS (
+                SELECT l.id AS listing_id, s.name AS site, p.key AS product_key, l.url,
+                       o.observed_at, o.price_paise,
+                       LAG(o.price_paise) OVER (PARTITION BY o.listing_id ORDER BY o.observed_at) AS prev_paise
+                FROM observations o
+                JOIN listings l ON l.id = o.listing_id
+                JOIN sites s ON s.id = l.site_id
+                LEFT JOIN products p ON p.id = l.product_id
+                WHERE (? IS NULL OR p.key = ?) AND o.price_paise IS NOT NULL
+            )
+            SELECT * FROM seq
+            WHERE prev_paise IS NOT NULL AND price_paise != prev_paise AND observed_at >= ?
+            ORDER BY observed_at
+        """
+        return [
+            {**dict(row), "observed_at": _iso(row["observed_at"])}
+            for row in self.conn.execute(sql, (product_key, product_key, since))
+        ]
+
+    def price_chart(self, product_key, days=365, per_site=False, resolution=None):
+        """
+        Price series for a chart from the pre-computed rollups, at the finest
+        resolution that fits `days` in CHART_POINTS buckets. Each point has
+        bucket (ISO start), min/max/last paise, and the site when `per_site`.
+        Buckets are written when a price changed and at least once a day
+        (OBSERVATION_HEARTBEAT), so at hourly resolution the series is a step
+        line: a missing bucket means the previous price still held.
+        """
+        resolution = resolution or pick_resolution(days * 86400)
+        since = bucket_start(int(time.time()) - days * 86400, resolution)
+        if per_site:
+            sql = """
+                SELECT r.bucket, s.name AS site, MIN(r.min_paise) AS min_paise,
+                       MAX(r.max_paise) AS max_paise, MIN(r.last_paise) AS last_paise
+                FROM listing_rollups r
+                JOIN listings l ON l.id = r.listing_id
+                JOIN products p ON p.id = l.product_id
+                JOIN sites s ON s.id = l.site_id
+                WHERE p.key = ? AND r.resolution = ? AND r.bucket >= ?
+                GROUP BY r.bucket, s.name
+                ORDER BY r.bucket, s.name
+            """
+        else:
+            sql = """
+                SELECT r.bucket, r.min_paise, r.max_paise, r.last_paise
+                FROM product_rollups r
+                JOIN products p ON p.id = r.product_id
+                WHERE p.key = ? AND r.resolution = ? AND r.bucket >= ?
+                ORDER BY r.bucket
+            """
+        points = [
+            {**dict(row), "bucket": _iso(row["bucket"])}
+            for row in self.conn.execute(sql, (product_key, resolution, since))
+        ]
+        return {"resolution": resolution, "points": points}
+
+    def search(self, query, per_site=10):
+        """
+        Full-text catalog search: the `per_site` best BM25 matches per site,
+        with their latest price, image, MRP and availability, best first.
+        Candidates still go through the matcher; this only narrows a large
+        catalog to a handful of rows.
+        """
+        expression = search_expression(query)
+        if expression is None:
+            return []
+        sql = f"""
+            WITH hits AS (
+                SELECT rowid AS listing_id, bm25(listings_fts, {SEARCH_WEIGHTS[0]}, {SEARCH_WEIGHTS[1]}) AS bm25
+                FROM listings_fts WHERE listings_fts MATCH ?
+            ),
+            ranked AS (
+                SELECT h.listing_id, h.bm25, l.site_id,
+                       ROW_NUMBER() OVER (PARTITION BY l.site_id ORDER BY h.bm25) AS site_rn
+                FROM hits h JOIN listings l ON l.id = h.listing_id
+            )
+            SELECT l.id AS listing_id, s.name AS site, l.native_id, l.url, l.title,
+                   p.key AS product_key, l.last_seen, l.image, l.mrp_paise, l.availability, r.bm25,
+                   (SELECT o.price_paise FROM observations o WHERE o.listing_id = l.id
+                    ORDER BY o.observed_at DESC LIMIT 1) AS price_paise
+            FROM ranked r
+            JOIN listings l ON l.id = r.listing_id
+            JOIN sites s ON s.id = l.site_id
+            LEFT JOIN products p ON p.id = l.product_id
+            WHERE r.site_rn <= ?
+            ORDER BY s.name, r.bm25
+        """
+        return [dict(row) for row in self.conn.execute(sql, (expression, per_site))]
+
+    def listings(self, product_keys=None):
+        """
+        Known listings with their canonical product key, latest price, image,
+        MRP and availability (one index probe per listing). With `product_keys`,
+        only listings whose key (or key without storage) is in that set.
+        """
+        sql = """
+            SELECT l.id AS listing_id, s.name AS site, l.native_id, l.url, l.title,
+                   p.key AS product_key, l.last_seen, l.image, l.mrp_paise, l.availability,
+                   (SELECT o.price_paise FROM observations o WHERE o.listing_id = l.id
+                    ORDER BY o.observed_at DESC LIMIT 1) AS price_paise
+            FROM listings l
+            JOIN sites s ON s.id = l.site_id
+            LEFT JOIN products p ON p.id = l.product_id
+        """
+        rows = [dict(row) for row in self.conn.execute(sql)]
+        if product_keys is None:
+            return rows
+        keys = set(product_keys)
+        return [
+            r for r in rows
+            if r["product_key"] in keys or matcher.base_key(r["product_key"]) in keys
+        ]
+
+    def product_keys(self):
+        """
+        (canonical product key, number of listings) for every catalog product.
+        """
+        sql = """
+            SELECT p.key, COUNT(l.id) FROM products p
+            LEFT JOIN listings l ON l.product_id = p.id
+            GROUP BY p.id
+        """
+        return [tuple(row) for row in self.conn.execute(sql)]
+
+    def query_counts(self):
+        """
+        (canonical query, times searched) for every past search.
+        """
+        return [tuple(row) for row in self.conn.execute("SELECT COALESCE(text, query), count FROM queries")]
+
+    def trending_queries(self, limit=20, now=None):
+        """
+        (canonical query, current demand) of the `limit` most in-demand past
+        searches: each search decays with DEMAND_HALF_LIFE, so recent bursts
+        (launches, sale days) outrank old totals.
+        """
+        now = _epoch(now)
+        sql = """
+            SELECT COALESCE(text, query), decay(demand, ? - last_at) AS current FROM queries
+            WHERE demand > 0 ORDER BY current DESC LIMIT ?
+        """
+        return [tuple(row) for row in self.conn.execute(sql, (now, limit))]
+
+    def recent_prices(self, listing_id, limit=20):
+        """
+        Most recent prices (paise) of one listing, oldest first.
+        """
+        sql = """
+            SELECT price_paise FROM observations
+            WHERE listing_id = ? AND price_paise IS NOT NULL
+            ORDER BY observed_at DESC LIMIT ?
+        """
+        return [row[0] for row in self.conn.execute(sql, (listing_id, limit))][::-1]
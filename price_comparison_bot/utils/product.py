@@ -0,0 +1,257 @@
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+
+_NON_PRICE = re.compile(r"[^\d.]")
+# Currency markers, removed first so the "." of "Rs." is not read as a decimal point
+_CURRENCY = re.compile(r"₹|\b(?:rs|inr)\b\.?", re.I)
+
+# Site-native listing identifiers, recoverable from the cleaned product URLs,
+# most specific first: Flipkart's pid names one colour / storage variant,
+# while the itm id in the path is shared by all variants of the item
+_NATIVE_ID = {
+    "amazon": [re.compile(r"/dp/([A-Z0-9]{10})")],
+    "flipkart": [re.compile(r"[?&]pid=([A-Za-z0-9]+)"), re.compile(r"/p/([A-Za-z0-9]+)")],
+    "croma": [re.compile(r"/p/(\d+)")],
+    "reliance": [re.compile(r"(?:/p/|-)(\d{6,})(?:[/?#]|$)")],
+}
+
+
+def parse_price(value):
+    """
+    Parses an Indian-format price ("₹1,74,900.00", "Rs. 1,999", "54900",
+    113490.0) into integer paise. Returns None when no amount can be read.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value * 100
+    if isinstance(value, float):
+        return round(value * 100)
+
+    digits = _NON_PRICE.sub("", _CURRENCY.sub("", value))
+    if not digits:
+        return None
+    whole, _, fraction = digits.partition(".")
+    fraction = fraction.replace(".", "")[:2].ljust(2, "0")
+    if not whole and fraction == "00":
+        return None
+    return int(whole or 0) * 100 + int(fraction)
+
+
+# Stock states as read from product pages, most specific phrase first
+_AVAILABILITY = (
+    ("preorder", "preorder"),
+    ("pre-order", "preorder"),
+    ("outofstock", "out_of_stock"),
+    ("out of stock", "out_of_stock"),
+    ("soldout", "out_of_stock"),
+    ("sold out", "out_of_stock"),
+    ("discontinued", "out_of_stock"),
+    ("unavailable", "out_of_stock"),
+    ("instock", "in_stock"),
+    ("in stock", "in_stock"),
+    ("limitedavailability", "in_stock"),
+)
+
+
+def parse_availability(value):
+    """
+    Normalizes a stock text or schema.org availability URL ("In stock",
+    "Currently unavailable.", "https://schema.org/OutOfStock") into
+    "in_stock" / "out_of_stock" / "preorder". Returns None when unknown.
+    """
+    text = (value or "").lower()
+    for phrase, state in _AVAILABILITY:
+        if phrase in text:
+            return state
+    return None
+
+
+def format_price(paise):
+    """
+    Formats paise back into the plain rupee string used in exports ("113490.00").
+    A missing price stays None, written as null.
+    """
+    if paise is None:
+        return None
+    return f"{paise // 100}.{paise % 100:02d}"
+
+
+def price_label(paise):
+    """
+    Display form of a price: "₹113490.00", or "N/A" when it is missing.
+    """
+    if paise is None:
+        return "N/A"
+    return f"₹{format_price(paise)}"
+
+
+def native_id(site, url):
+    """
+    Site-native listing ID (ASIN, Flipkart pid or item id, Croma / Reliance
+    SKU) parsed from a product URL, or None when the URL carries none.
+    """
+    if not url or url == "#":
+        return None
+    for pattern in _NATIVE_ID.get((site or "").lower(), ()):
+        match = pattern.search(url)
+        if match:
+            return match.group(1)
+    return None
+
+
+_JSONLD = re.compile(
+    r'<script[^>]+type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.S | re.I
+)
+
+
+def _jsonld_nodes(html):
+    for block in _JSONLD.findall(html or ""):
+        try:
+            data = json.loads(block.strip())
+        except ValueError:
+            continue
+        stack = data if isinstance(data, list) else [data]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                stack.extend(node)
+            elif isinstance(node, dict):
+                stack.extend(node.get("@graph", []))
+                yield node
+
+
+def product_from_jsonld(html, site, url):
+    """
+    Builds a Product from the schema.org Product markup of a product page,
+    which every supported retailer embeds. Returns None when there is none.
+    """
+    for node in _jsonld_nodes(html):
+        types = node.get("@type")
+        if "Product" not in (types if isinstance(types, list) else [types]):
+            continue
+
+        offers = node.get("offers") or {}
+        if isinstance(offers, list):
+            offers = offers[0] if offers else {}
+        price = offers.get("price", offers.get("lowPrice"))
+        image = node.get("image")
+        if isinstance(image, list):
+            image = image[0] if image else ""
+        # The MRP, when published, is a ListPrice price specification
+        specs = offers.get("priceSpecification") or []
+        mrp = next(
+            (
+                s.get("price")
+                for s in (specs if isinstance(specs, list) else [specs])
+                if isinstance(s, dict) and "ListPrice" in str(s.get("priceType", ""))
+            ),
+            None,
+        )
+
+        return Product(
+            title=(node.get("name") or "").strip() or "Unknown Product",
+            price_paise=parse_price(price),
+            site=site,
+            url=url,
+            image=image or "",
+            mrp_paise=parse_price(mrp),
+            availability=parse_availability(offers.get("availability")),
+        )
+    return None
+
+
+@dataclass(slots=True)
+class Product:
+    """
+    A single listing as it travels from the scrapers to the exporter.
+    Prices are held as integer paise so sorting never re-parses strings.
+    """
+
+    title: str
+    price_paise: int | None = None
+    site: str = ""
+    url: str = "#"
+    image: str = ""
+    rating: str | None = None
+    mrp_paise: int | None = None
+    recommended: bool = False
+    match_score: float | None = None
+    match_scorer: str | None = None
+    match_query: str | None = None  # matcher.score_key of the query match_score is for
+    availability: str | None = None  # in_stock | out_of_stock | preorder, from a product page
+
+    @property
+    def price(self):
+        return format_price(self.price_paise)
+
+    @property
+    def native_id(self):
+        return native_id(self.site, self.url)
+
+    def fingerprint(self):
+        """
+        Stable hash of the offer (title, prices, availability); equal
+        fingerprints mean nothing worth recording has changed. The URL and
+        image are left out: a search card and the product page name the same
+        listing (native_id) with different ones.
+        """
+        parts = (
+            " ".join((self.title or "").lower().split()),
+            str(self.price_paise),
+            str(self.mrp_paise),
+            str(self.availability),
+        )
+        return hashlib.blake2b("\x1f".join(parts).encode("utf-8"), digest_size=8).hexdigest()
+
+    def sort_price(self):
+        return self.price_paise if self.price_paise is not None else float("inf")
+
+    @classmethod
+    def from_raw(cls, record, site=""):
+        """
+        Builds a Product from a scraper record, accepting the legacy key
+        variants (title/name, url/link, image/plpImage, string prices).
+        """
+        if "price_paise" in record:
+            price = record["price_paise"]
+        else:
+            price = parse_price(record.get("price"))
+        if "mrp_paise" in record:
+            mrp = record["mrp_paise"]
+        else:
+            mrp = parse_price(record.get("mrp"))
+
+        return cls(
+            title=record.get("title") or record.get("name") or "Unknown Product",
+            price_paise=price,
+            site=site or record.get("site") or "",
+            url=record.get("url") or record.get("link") or "#",
+            image=record.get("image") or record.get("plpImage") or "",
+            rating=record.get("rating"),
+            mrp_paise=mrp,
+            recommended=bool(record.get("recommended", False)),
+            match_score=record.get("match_score"),
+            match_scorer=record.get("match_scorer"),
+            match_query=record.get("match_query"),
+            availability=record.get("availability"),
+        )
+
+    def to_dict(self):
+        return {
+            "title": self.title,
+            "price": self.price,
+            "price_paise": self.price_paise,
+            "mrp_paise": self.mrp_paise,
+            "url": self.url,
+            "image": self.image,
+            "site": self.site,
+            "rating": self.rating,
+            "recommended": self.recommended,
+            "match_score": self.match_score,
+            "match_scorer": self.match_scorer,
+            "match_query": self.match_query,
+            "availability": self.availability,
+        }
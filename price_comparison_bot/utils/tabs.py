@@ -0,0 +1,133 @@
+import logging
+import time
+from collections import deque
+
+# Tabs open at once in one browser, unless a site's TAB_LIMITS say otherwise
+MAX_TABS = 3
+# Seconds a page may take to load before its tab is given up on
+PAGE_TIMEOUT = 30
+POLL_SECONDS = 0.25
+
+log = logging.getLogger("Tabs")
+
+# Navigates without waiting for the load; the marker lives on the old
+# document only, so its absence means the new page has replaced it.
+_NAVIGATE = "window.__tabPoolOld = true; window.location.href = arguments[0];"
+_LOADED = "return !window.__tabPoolOld && document.readyState === 'complete';"
+
+
+class TabPool:
+    """
+    Multiplexes page loads over up to `tabs` tabs of one WebDriver, so one
+    Chrome process loads several pages at once instead of one after another.
+    Pacing: navigations start at least `gap` seconds apart, and each tab
+    opens at most one page per `tab_gap` seconds (the site's min_gap), so
+    the pool loads up to `tabs` pages per tab_gap. `on_start` is called on
+    every navigation (SiteLimiter.note_start). The driver is switched to
+    each tab only to navigate, poll it and read the page once it has loaded.
+    A WebDriver is not thread-safe, so a pool is driven from one thread.
+    """
+
+    def __init__(self, driver, tabs=MAX_TABS, gap=0, tab_gap=0, timeout=PAGE_TIMEOUT, on_start=None):
+        self.driver = driver
+        self.tabs = max(tabs, 1)
+        self.gap = gap
+        self.tab_gap = tab_gap
+        self.timeout = timeout
+        self.on_start = on_start
+        self.home = driver.current_window_handle
+        self._handles = [self.home]
+        self._next_start = 0.0
+        self._ready = {}  # tab handle -> monotonic time it may navigate again
+
+    def _free_tab(self, busy):
+        # A rested tab, else a new one while under the limit, else the free
+        # tab that rests the shortest
+        now = time.monotonic()
+        free = [h for h in self._handles if h not in busy]
+        for handle in free:
+            if self._ready.get(handle, 0.0) <= now:
+                return handle
+        if len(self._handles) < self.tabs:
+            self.driver.switch_to.new_window("tab")
+            handle = self.driver.current_window_handle
+            self._handles.append(handle)
+            return handle
+        return min(free, key=lambda h: self._ready.get(h, 0.0))
+
+    def _start(self, handle, url):
+        now = time.monotonic()
+        self._next_start = now + self.gap
+        self._ready[handle] = now + self.tab_gap
+        if self.on_start is not None:
+            self.on_start()
+        self.driver.switch_to.window(handle)
+        self.driver.execute_script(_NAVIGATE, url)
+        return now
+
+    def map(self, read, urls, deadline=None):
+        """
+        Loads every URL and yields (url, read(driver, url) or the exception
+        raised) as pages finish, in completion order; `read` runs with the
+        driver switched to the loaded tab. Stops starting pages once the
+        monotonic `deadline` has passed (or the next start would come after
+        it) and drops pages still loading then.
+        """
+        pending = deque(dict.fromkeys(urls))
+        loading = {}  # tab handle -> (url, started)
+        while pending or loading:
+            expired = deadline is not None and time.monotonic() >= deadline
+            while pending and len(loading) < self.tabs and not expired:
+                handle = self._free_tab(loading)
+                start_at = max(self._next_start, self._ready.get(handle, 0.0))
+                wait = start_at - time.monotonic()
+                if wait > 0:
+                    if loading:
+                        break  # poll the loading tabs meanwhile
+                    if deadline is not None and start_at >= deadline:
+                        expired = True
+                        break
+                    time.sleep(wait)
+                url = pending.popleft()
+                try:
+                    loading[handle] = (url, self._start(handle, url))
+                except Exception as e:
+                    yield url, e
+            if expired:
+                for url, _ in loading.values():
+                    log.warning(f"Deadline passed while loading {url}")
+                return
+
+            for handle, (url, started) in list(loading.items()):
+                self.driver.switch_to.window(handle)
+                try:
+                    loaded = self.driver.execute_script(_LOADED)
+                except Exception:
+                    loaded = False  # mid-navigation; poll again
+                if loaded:
+                    del loading[handle]
+                    try:
+                        yield url, read(self.driver, url)
+                    except Exception as e:
+                        yield url, e
+                elif time.monotonic() - started > self.timeout:
+                    del loading[handle]
+                    yield url, TimeoutError(f"Page did not load within {self.timeout}s: {url}")
+            if loading:
+                time.sleep(POLL_SECONDS)
+
+    def close(self):
+        """
+        Closes the extra tabs and returns the driver to its original tab.
+        """
+        for handle in self._handles[1:]:
+            try:
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+            except Exception:
+                pass
+        self._handles = [self.home]
+        try:
+            self.driver.switch_to.window(self.home)
+        except Exception:
+            pass  # the browser is gone; its owner replaces the driver